@@ -0,0 +1,280 @@
+"""
+Подбор показателя программы тангажа toLKO (ascentProfileConstant) методом Монте-Карло.
+
+Для каждого класса корабля (стартовая масса x тяговооружённость) разыгрываются вариации
+корабля (масса и TWR внутри класса, площадь сопротивления, ISP, доля топлива) и
+для каждого кандидата показателя c моделируется подъём пакетом NumPy:
+
+- закон тангажа toLKO: 90 - 90 * (апогей / TARGET_APOAPSIS) ** c, полная тяга,
+  выключение двигателя на TARGET_APOAPSIS - SHUTDOWN_MARGIN;
+- пассивный полёт до выхода из атмосферы, затем циркуляризация по vis-viva в апогее
+  (как режим 'visviva'); успех — круговая орбита не ниже TARGET_PERIAPSIS
+  и хватает топлива на циркуляризацию;
+- физика та же, что в simKrpc: плоскость экватора, вращение Кербина,
+  экспоненциальная атмосфера, сопротивление 0.5 * rho * v^2 * CdA, ISP линейно по давлению.
+
+Классы распределяются по процессам пула; итог — лучший c (минимум средней дельты V
+при доле успешных подъёмов не ниже MIN_SUCCESS) для каждого класса. Для сравнения
+печатаются дельта V и доля успеха значений REFERENCE_CONSTANTS; при успехе ниже
+MIN_SUCCESS вместо дельты V — «—».
+
+    python ascentOptimizer.py --workers 4 --samples 64 --out ascent_constants.json
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import simKrpc
+from toLKO import TARGET_APOAPSIS, SHUTDOWN_MARGIN, TARGET_PERIAPSIS
+
+DT = 0.05              # с, шаг интегрирования
+MAX_TIME = 900.0       # с, дольше подъём не моделируется (неудача)
+MIN_SUCCESS = 0.9      # минимальная доля успешных подъёмов для выбора c
+
+MASS_CLASSES = (10.0, 20.0, 40.0)               # т, стартовая масса
+TWR_CLASSES = (1.3, 1.7, 2.2)                   # тяговооружённость у поверхности
+CONSTANTS = tuple(np.round(np.arange(0.3, 1.51, 0.1), 2))   # кандидаты c
+REFERENCE_CONSTANTS = (0.5, 1.25)               # значения из driver.py и по умолчанию в toLKO
+
+# Вариации внутри класса и параметры по образцу ускорителя simKrpc.DEFAULT_CRAFT
+CLASS_SPREAD = 0.1          # ± доля для массы и TWR внутри класса
+CD_AREA_PER_TON = 2.0 / 27.04 ** (2 / 3)         # CdA растёт как масса^(2/3): 2 м² на 27 т
+CD_AREA_SPREAD = 0.2
+ISP_SPREAD = 0.05
+FUEL_FRACTION = (0.7, 0.8)
+
+
+def kerbin_model():
+    """Параметры Кербина из модели simKrpc (без запуска её потока)"""
+    kerbin = simKrpc.Simulation().bodies['Kerbin']
+    return {
+        'mu': kerbin.gravitational_parameter,
+        'radius': kerbin.equatorial_radius,
+        'omega': kerbin.angular_velocity,
+        'atmosphere_depth': kerbin.atmosphere_depth,
+        'scale_height': kerbin.scale_height,
+        'surface_gravity': kerbin.surface_gravity,
+    }
+
+
+def sample_crafts(rng, count, mass_t, twr, body):
+    """count вариаций корабля класса (mass_t, twr) — словарь массивов"""
+    engine = simKrpc.DEFAULT_CRAFT['sections'][0]['engines'][0]
+    mass = mass_t * 1000 * rng.uniform(1 - CLASS_SPREAD, 1 + CLASS_SPREAD, count)
+    thrust_to_weight = twr * rng.uniform(1 - CLASS_SPREAD, 1 + CLASS_SPREAD, count)
+    isp_scale = rng.uniform(1 - ISP_SPREAD, 1 + ISP_SPREAD, count)
+    isp_vacuum = engine['vacuum_isp'] * isp_scale
+    isp_sea_level = engine['sea_level_isp'] * isp_scale
+    sea_level_thrust = thrust_to_weight * mass * body['surface_gravity']
+    return {
+        'mass': mass,
+        'fuel': mass * rng.uniform(*FUEL_FRACTION, count),
+        'mass_flow': sea_level_thrust / (isp_sea_level * simKrpc.G0),
+        'isp_vacuum': isp_vacuum,
+        'isp_sea_level': isp_sea_level,
+        'cd_area': CD_AREA_PER_TON * (mass / 1000) ** (2 / 3) * rng.uniform(1 - CD_AREA_SPREAD, 1 + CD_AREA_SPREAD, count),
+    }
+
+
+def _orbit(x, y, vx, vy, mu):
+    """Большая полуось и эксцентриситет (для незамкнутых орбит a = inf)"""
+    r = np.hypot(x, y)
+    energy = (vx * vx + vy * vy) / 2 - mu / r
+    h = x * vy - y * vx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(energy < 0, -mu / (2 * energy), np.inf)
+    e = np.sqrt(np.maximum(0.0, 1 + 2 * energy * h * h / (mu * mu)))
+    return a, e
+
+
+def simulate_ascent(crafts, constants, body, dt=DT, max_time=MAX_TIME):
+    """
+    Подъём пакета кораблей crafts (словарь массивов) с показателями constants (массив той же длины).
+    Возвращает словарь массивов: success, dv_ascent, dv_circularization, dv_total, apoapsis, time.
+    """
+    mu, radius, omega = body['mu'], body['radius'], body['omega']
+    count = len(constants)
+    result = {
+        'success': np.zeros(count, bool),
+        'dv_ascent': np.full(count, np.nan),
+        'dv_circularization': np.full(count, np.nan),
+        'apoapsis': np.full(count, np.nan),
+        'time': np.full(count, np.nan),
+    }
+
+    # Состояние только активных кораблей; завершившиеся выбрасываются из массивов
+    ids = np.arange(count)
+    x = np.full(count, radius + 70.0)
+    y = np.zeros(count)
+    vx = np.zeros(count)
+    vy = np.full(count, omega * (radius + 70.0))    # старт с вращающейся поверхности
+    mass = crafts['mass'].astype(float).copy()
+    fuel = crafts['fuel'].astype(float).copy()
+    flow = crafts['mass_flow'].astype(float).copy()
+    isp_vacuum = crafts['isp_vacuum'].astype(float).copy()
+    isp_sea_level = crafts['isp_sea_level'].astype(float).copy()
+    cd_area = crafts['cd_area'].astype(float).copy()
+    exponent = np.asarray(constants, float).copy()
+    burning = np.ones(count, bool)
+    dv = np.zeros(count)
+    shutdown = TARGET_APOAPSIS - SHUTDOWN_MARGIN
+
+    t = 0.0
+    while ids.size and t < max_time:
+        r = np.hypot(x, y)
+        altitude = r - radius
+        ux, uy = x / r, y / r
+        a, e = _orbit(x, y, vx, vy, mu)
+        apoapsis = a * (1 + e) - radius
+
+        # Закон тангажа toLKO и тяга с ISP по давлению
+        pitch = np.radians(90 - 90 * np.clip(apoapsis / TARGET_APOAPSIS, 0.0, 1.0) ** exponent)
+        dir_x = ux * np.sin(pitch) - uy * np.cos(pitch)
+        dir_y = uy * np.sin(pitch) + ux * np.cos(pitch)
+        pressure = np.where(altitude < body['atmosphere_depth'],
+                            np.exp(-np.maximum(altitude, 0.0) / body['scale_height']), 0.0)
+        isp = isp_vacuum - (isp_vacuum - isp_sea_level) * pressure
+        thrust = np.where(burning, flow * isp * simKrpc.G0, 0.0)
+
+        # Сопротивление по скорости относительно вращающейся атмосферы
+        air_x, air_y = vx + omega * y, vy - omega * x
+        air_speed = np.hypot(air_x, air_y)
+        drag = 0.5 * 1.225 * pressure * air_speed * cd_area
+
+        gravity = -mu / r ** 3
+        ax = gravity * x + (thrust * dir_x - drag * air_x) / mass
+        ay = gravity * y + (thrust * dir_y - drag * air_y) / mass
+        vx += ax * dt
+        vy += ay * dt
+        x += vx * dt
+        y += vy * dt
+        burned = np.where(burning, flow * dt, 0.0)
+        dv += thrust / mass * dt
+        mass -= burned
+        fuel -= burned
+        t += dt
+
+        # Выключение двигателя по апогею (как в toLKO) или по топливу
+        a, e = _orbit(x, y, vx, vy, mu)
+        apoapsis = a * (1 + e) - radius
+        burning &= (apoapsis < shutdown) & (fuel > 0)
+
+        # Пассивный полёт окончен: вышли из атмосферы или уже снижаемся
+        r = np.hypot(x, y)
+        radial_speed = (x * vx + y * vy) / r
+        coasting = ~burning
+        out = coasting & (r - radius >= body['atmosphere_depth'])
+        failed = (coasting & ~out & (radial_speed < 0)) | (r < radius)
+        done = out | failed
+        if not done.any():
+            continue
+
+        # Циркуляризация по vis-viva в апогее
+        r_ap = a[out] * (1 + e[out])
+        v_ap = np.sqrt(mu * (2 / r_ap - 1 / a[out]))
+        circularization = np.sqrt(mu / r_ap) - v_ap
+        available = isp_vacuum[out] * simKrpc.G0 * np.log(mass[out] / np.maximum(mass[out] - fuel[out], 1e-9))
+        finished = ids[out]
+        result['success'][finished] = (r_ap - radius >= TARGET_PERIAPSIS) & (available >= circularization)
+        result['dv_ascent'][finished] = dv[out]
+        result['dv_circularization'][finished] = circularization
+        result['apoapsis'][finished] = r_ap - radius
+        result['time'][finished] = t
+
+        keep = ~done
+        ids = ids[keep]
+        x, y, vx, vy = x[keep], y[keep], vx[keep], vy[keep]
+        mass, fuel, flow = mass[keep], fuel[keep], flow[keep]
+        isp_vacuum, isp_sea_level, cd_area = isp_vacuum[keep], isp_sea_level[keep], cd_area[keep]
+        exponent, burning, dv = exponent[keep], burning[keep], dv[keep]
+
+    result['dv_total'] = result['dv_ascent'] + result['dv_circularization']
+    return result
+
+
+def evaluate_class(mass_t, twr, samples, seed):
+    """Все кандидаты c на samples вариациях одного класса (одни и те же корабли для каждого c)"""
+    body = kerbin_model()
+    rng = np.random.default_rng(seed)
+    crafts = sample_crafts(rng, samples, mass_t, twr, body)
+    candidates = tuple(CONSTANTS) + tuple(c for c in REFERENCE_CONSTANTS if c not in CONSTANTS)
+    batch = {name: np.tile(values, len(candidates)) for name, values in crafts.items()}
+    constants = np.repeat(candidates, samples)
+    result = simulate_ascent(batch, constants, body)
+
+    by_constant = {}
+    for i, c in enumerate(candidates):
+        part = slice(i * samples, (i + 1) * samples)
+        success = result['success'][part]
+        dv = result['dv_total'][part][success]
+        by_constant[float(c)] = {
+            'success': float(success.mean()),
+            'dv_mean': float(dv.mean()) if dv.size else None,
+            'dv_p90': float(np.percentile(dv, 90)) if dv.size else None,
+        }
+    eligible = [c for c in CONSTANTS if by_constant[float(c)]['success'] >= MIN_SUCCESS]
+    best = min(eligible, key=lambda c: by_constant[float(c)]['dv_mean']) if eligible else None
+    return {
+        'mass_t': mass_t,
+        'twr': twr,
+        'samples': samples,
+        'best_constant': float(best) if best is not None else None,
+        'dv_best': by_constant[float(best)]['dv_mean'] if best is not None else None,
+        'constants': by_constant,
+    }
+
+
+def optimize(mass_classes=MASS_CLASSES, twr_classes=TWR_CLASSES, samples=64, workers=None, seed=0):
+    """Лучший c по каждому классу; классы считаются параллельно в пуле процессов"""
+    classes = [(mass_t, twr) for mass_t in mass_classes for twr in twr_classes]
+    seeds = np.random.SeedSequence(seed).spawn(len(classes))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_class, mass_t, twr, samples, child)
+                   for (mass_t, twr), child in zip(classes, seeds)]
+        return [future.result() for future in futures]
+
+
+def report(results):
+    print(f"   {'масса, т':>9}{'TWR':>6}{'лучший c':>10}{'ΔV, м/с':>10}{'успех':>8}"
+          + "".join(f"{'ΔV (успех) при ' + str(c):>22}" for c in REFERENCE_CONSTANTS))
+    for row in results:
+        best = row['best_constant']
+        line = f"   {row['mass_t']:>9.0f}{row['twr']:>6.1f}"
+        if best is None:
+            line += f"{'—':>10}{'—':>10}{'—':>8}"
+        else:
+            line += f"{best:>10.2f}{row['dv_best']:>10.0f}{row['constants'][best]['success']:>8.0%}"
+        for c in REFERENCE_CONSTANTS:
+            # ΔV усреднён только по успешным подъёмам — при редком успехе он ниже лучшего c и вводит в заблуждение
+            reference = row['constants'][float(c)]
+            usable = reference['dv_mean'] is not None and reference['success'] >= MIN_SUCCESS
+            dv = f"{reference['dv_mean']:.0f}" if usable else "—"
+            line += f"{dv + ' (' + format(reference['success'], '.0%') + ')':>22}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Подбор ascentProfileConstant для toLKO методом Монте-Карло")
+    parser.add_argument('--samples', type=int, default=64, help="вариаций корабля на класс")
+    parser.add_argument('--workers', type=int, default=None, help="процессов в пуле (по умолчанию — по числу ядер)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = optimize(samples=args.samples, workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"🚀 Подбор показателя тангажа: {len(results)} классов x {len(CONSTANTS)} значений c x "
+          f"{args.samples} вариаций за {elapsed:.1f} с")
+    report(results)
+    if args.out is not None:
+        with open(args.out, 'w') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        print(f"💾 Результаты сохранены в '{args.out}'")
+
+
+if __name__ == '__main__':
+    main()
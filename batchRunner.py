@@ -0,0 +1,191 @@
+"""
+Пакетный запуск миссий: сетка параметров -> пул процессов -> одна таблица результатов.
+
+Каждая комбинация параметров сетки — отдельная миссия driver.run_mission.
+Процессов в пуле столько же, сколько экземпляров: у каждого процесса своё
+соединение — с копией KSP (--ksp) или с локальной моделью simKrpc (--sim).
+Вывод каждой миссии пишется в свой журнал, телеметрия — в свой .ktlm,
+а сводка (параметры, длительности этапов, ступени, метрики телеметрии и,
+для модели, итог полёта) — строкой в results.csv.
+
+    python batchRunner.py --sim 10 --workers 4 ascent_profile=0.4,0.5,0.6 circularization=visviva,heuristic
+    python batchRunner.py --ksp 127.0.0.1:50000:50001 --ksp 10.0.0.2:50000:50001 ascent_profile=0.5,0.6
+
+Значения в сетке разбираются как JSON (числа, строки в кавычках, списки),
+иначе берутся как строки: phases='["подъём"]' — только выход на орбиту.
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+RESULTS_NAME = "results.csv"
+
+_instance = None  # экземпляр (KSP или модель), закреплённый за процессом пула
+
+
+def parameter_grid(grid):
+    """Все комбинации сетки {имя: [значения]} в виде списка словарей"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_grid(items):
+    """['имя=a,b,c', ...] -> {имя: [a, b, c]}; список в JSON ('[...]') — одно значение"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        if values.startswith('['):
+            grid[name] = [parse_value(values)]
+        else:
+            grid[name] = [parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def parse_ksp(text):
+    """'адрес:rpc_port:stream_port[:корабль]' -> описание экземпляра KSP"""
+    address, rpc_port, stream_port, *craft = text.split(':')
+    return {'address': address, 'rpc_port': int(rpc_port), 'stream_port': int(stream_port),
+            'craft': craft[0] if craft else None}
+
+
+def _init_worker(instances):
+    global _instance
+    _instance = instances.get()
+
+
+def _connect(instance, name):
+    if 'sim' in instance:
+        import simKrpc
+        return simKrpc.connect(name, time_scale=instance['sim'])
+    import krpc
+    connection = krpc.connect(name, address=instance['address'], rpc_port=instance['rpc_port'],
+                              stream_port=instance['stream_port'])
+    if instance.get('craft'):
+        # Каждая миссия — с новым запуском корабля со стартового стола
+        connection.space_center.launch_vessel_from_vab(instance['craft'])
+    return connection
+
+
+def _run(index, params, out_dir):
+    """Одна миссия в процессе пула; возвращает строку таблицы результатов"""
+    import driver
+
+    run = "run_{:03d}".format(index)
+    params = dict(params, log_path=os.path.join(out_dir, run + ".ktlm"), plot_path=None, show_plot=False)
+    row = {'run': run, 'instance': _instance.get('address') or 'sim-{}'.format(os.getpid())}
+    started = time.perf_counter()
+    with open(os.path.join(out_dir, run + ".log"), 'w') as log, contextlib.redirect_stdout(log):
+        connection = None
+        try:
+            # Неудачное подключение прерывает только эту миссию, а не весь пакет
+            connection = _connect(_instance, run)
+            result = driver.run_mission(connection, params)
+            outcome = connection.sim.outcome() if 'sim' in _instance else {}
+        except Exception as error:
+            result, outcome = {'aborted': repr(error)}, {}
+            print("🛑 Ошибка миссии:", repr(error))
+        finally:
+            if connection is not None:
+                connection.close()
+    row['wall_s'] = time.perf_counter() - started
+    row.update(flatten(result, outcome))
+    return row
+
+
+def flatten(result, outcome):
+    """Итог run_mission (и модели) -> плоская строка таблицы"""
+    row = {'aborted': result.get('aborted') or ''}
+    for name, duration in result.get('phases', {}).items():
+        row['phase_{}_s'.format(name)] = duration
+    row['staged'] = ' '.join(str(stage) for stage in result.get('staged', ()))
+    for key, value in result.get('telemetry', {}).items():
+        row['tlm_' + key] = value
+    for key, value in outcome.items():
+        row['sim_' + key] = value
+    return row
+
+
+def run_batch(grid, instances, out_dir, base_params=None):
+    """
+    Выполнить все комбинации сетки на экземплярах instances (по процессу на экземпляр),
+    записать out_dir/results.csv; возвращает список строк в порядке сетки.
+    """
+    import driver
+
+    unknown = [name for name in list(grid) + list(base_params or {}) if name not in driver.DEFAULT_PARAMS]
+    if unknown:
+        raise ValueError("Неизвестные параметры миссии: {}".format(", ".join(unknown)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    runs = [dict(base_params or {}, **params) for params in parameter_grid(grid)]
+    print("🚀 {} миссий на {} экземплярах".format(len(runs), len(instances)))
+
+    # spawn: у каждого процесса свои сокеты kRPC и потоки модели, ничего не наследуется
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager()
+    queue = manager.Queue()
+    for instance in instances:
+        queue.put(instance)
+
+    rows = [None] * len(runs)
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=len(instances), mp_context=context,
+                                 initializer=_init_worker, initargs=(queue,)) as pool:
+            futures = {pool.submit(_run, index, params, out_dir): index for index, params in enumerate(runs)}
+            for future in as_completed(futures):
+                index = futures[future]
+                row = dict(runs[index], **future.result())
+                rows[index] = row
+                status = row['aborted'] or 'ok'
+                print("✅ {} ({:.0f} с): {}".format(row['run'], row['wall_s'], status))
+    finally:
+        manager.shutdown()
+
+    columns = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    path = os.path.join(out_dir, RESULTS_NAME)
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: json.dumps(value, ensure_ascii=False) if isinstance(value, (list, tuple, dict))
+                             else value for key, value in row.items()})
+    print("💾 {} миссий за {:.0f} с, таблица результатов: '{}'".format(len(rows), time.perf_counter() - started, path))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный запуск миссий по сетке параметров")
+    parser.add_argument('grid', nargs='+', help="параметр=значение1,значение2,... (см. driver.DEFAULT_PARAMS)")
+    parser.add_argument('--sim', type=float, metavar='SCALE', help="локальная модель simKrpc с ускорением времени SCALE (не больше 50)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="число процессов с моделью (--sim)")
+    parser.add_argument('--ksp', action='append', default=[], metavar='ADDR:RPC:STREAM[:CRAFT]',
+                        help="экземпляр KSP с kRPC (можно повторять)")
+    parser.add_argument('--out', default='batch_results', help="каталог журналов и таблицы результатов")
+    args = parser.parse_args()
+
+    instances = [parse_ksp(text) for text in args.ksp]
+    if args.sim:
+        instances += [{'sim': args.sim} for _ in range(args.workers)]
+    if not instances:
+        parser.error("нужен хотя бы один экземпляр: --sim или --ksp")
+    run_batch(parse_grid(args.grid), instances, args.out)
+
+
+if __name__ == '__main__':
+    main()
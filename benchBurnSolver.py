@@ -0,0 +1,97 @@
+"""
+Микробенчмарк решателя времени посадочного импульса.
+
+Сравнивает прежнюю бисекцию из startLanding.velocity_intercept (интервал [0, 92] с)
+с решателем Галлея из landingMath по числу итераций, времени на вызов и сходимости.
+Запуск: python benchBurnSolver.py
+"""
+import math
+import time
+from landingMath import solve_burn_time, burn_velocity, CONVERGED
+
+
+def legacy_bisection(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, tolerance=0.01):
+    """Копия прежнего алгоритма velocity_intercept со счётчиком итераций"""
+    if initial_velocity > 0:
+        initial_velocity *= -1
+    if mass_burn_rate <= 0:
+        return float('inf'), 0
+
+    upper_bound = 92
+    lower_bound = 0
+    time = 10
+    velocity = 1
+    iterations = 0
+
+    while abs(velocity) > tolerance and time > 0.0001 and time < 91.99:
+        iterations += 1
+        try:
+            if mass - mass_burn_rate * time <= 0:
+                lower_bound = time
+                time = (time + upper_bound) / 2
+                continue
+            velocity = (-thrust / mass_burn_rate) * math.log(mass - mass_burn_rate * time) \
+                       - gravity_accel * time + initial_velocity + (thrust / mass_burn_rate) * math.log(mass)
+        except (ValueError, ZeroDivisionError):
+            upper_bound = time
+            time = (time + lower_bound) / 2
+            continue
+
+        if velocity < 0:
+            lower_bound = time
+            time = (time + upper_bound) / 2
+        else:
+            upper_bound = time
+            time = (time + lower_bound) / 2
+
+    return time, iterations
+
+
+def cases():
+    """Сетка посадочных сценариев: Муна, Terrier/Reliant, разные массы и скорости"""
+    for thrust, mass_burn_rate in ((60.0, 0.017734), (240.0, 0.078926)):
+        for mass in (2.0, 4.0, 8.0, 16.0):
+            for velocity in (5.0, 20.0, 80.0, 200.0, 400.0):
+                yield thrust, mass, mass_burn_rate, 1.63, velocity
+
+
+def run(solver, repeat=200):
+    scenarios = list(cases())
+    iterations = []
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for scenario in scenarios:
+            result = solver(*scenario)
+            iterations.append(result[1])
+    elapsed = time.perf_counter() - start
+
+    for scenario in scenarios:
+        burn_time = solver(*scenario)[0]
+        thrust, mass, mass_burn_rate, gravity_accel, velocity = scenario
+        if not 0 <= burn_time < mass / mass_burn_rate or \
+                abs(burn_velocity(thrust, mass, mass_burn_rate, gravity_accel, -velocity, burn_time)) > 0.01:
+            failures += 1
+
+    calls = repeat * len(scenarios)
+    return {
+        'calls': calls,
+        'mean_iterations': sum(iterations) / len(iterations),
+        'max_iterations': max(iterations),
+        'us_per_call': elapsed / calls * 1e6,
+        'not_converged': failures,
+        'scenarios': len(scenarios),
+    }
+
+
+def halley(*scenario):
+    solution = solve_burn_time(*scenario)
+    return solution.time, solution.iterations, solution.status == CONVERGED
+
+
+if __name__ == '__main__':
+    print(f"{'решатель':<12}{'итер. ср.':>10}{'итер. макс':>12}{'мкс/вызов':>12}{'не сошлось':>12}")
+    for name, solver in (('bisection', legacy_bisection), ('halley', halley)):
+        r = run(solver)
+        print(f"{name:<12}{r['mean_iterations']:>10.1f}{r['max_iterations']:>12d}"
+              f"{r['us_per_call']:>12.2f}{r['not_converged']:>7d}/{r['scenarios']}")
@@ -0,0 +1,87 @@
+"""
+Бенчмарк времени импорта управляющих модулей.
+
+Каждый модуль импортируется в свежем процессе интерпретатора (как при запуске
+миссии или в процессе пула batchRunner): время импорта, прирост памяти (max RSS)
+и какие тяжёлые пакеты подтянулись. Управляющий путь (CONTROL_PATH) не должен
+загружать пакеты из FORBIDDEN — графики строятся лениво (telemetryPlot),
+а krpc импортируется только при подключении. При нарушении скрипт завершается с кодом 1.
+
+Запуск: python benchImport.py [--repeats 5] [модуль ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Модули, которые загружаются до подключения к игре
+CONTROL_PATH = ('driver', 'batchRunner', 'toLKO', 'munTransfer', 'orbitMun', 'startLanding',
+                'stageMonitor', 'telemetry', 'streamHub', 'controlLoop')
+REFERENCE = ('telemetryPlot',)   # для сравнения: сюда matplotlib загружается намеренно
+FORBIDDEN = ('matplotlib', 'msgpack', 'krpc')
+HEAVY = FORBIDDEN + ('numpy', 'google.protobuf')
+
+# Выполняется в дочернем процессе: время и память только самого импорта
+_PROBE = """
+import json, resource, sys, time
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'rss_kb': after - before,
+                  'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def probe(module, directory):
+    """Один импорт module в новом процессе"""
+    output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY)],
+                            cwd=directory, capture_output=True, text=True)
+    if output.returncode != 0:
+        return {'error': output.stderr.strip().splitlines()[-1]}
+    return json.loads(output.stdout)
+
+
+def measure(module, repeats, directory):
+    runs = [probe(module, directory) for _ in range(repeats)]
+    errors = [run['error'] for run in runs if 'error' in run]
+    if errors:
+        return {'error': errors[0]}
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'rss_kb': statistics.median(run['rss_kb'] for run in runs),
+        'loaded': runs[0]['loaded'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', help="модули (по умолчанию — управляющий путь и telemetryPlot)")
+    parser.add_argument('--repeats', type=int, default=5, help="запусков на модуль (берётся медиана)")
+    args = parser.parse_args()
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    modules = args.modules or CONTROL_PATH + REFERENCE
+    violations = []
+    print(f"{'модуль':<16}{'импорт, мс':>12}{'RSS, МБ':>10}  тяжёлые пакеты")
+    for module in modules:
+        result = measure(module, args.repeats, directory)
+        if 'error' in result:
+            print(f"{module:<16}{'—':>12}{'—':>10}  ❌ {result['error']}")
+            violations.append(f"{module}: {result['error']}")
+            continue
+        print(f"{module:<16}{result['seconds'] * 1000:>12.0f}{result['rss_kb'] / 1024:>10.1f}  "
+              f"{', '.join(result['loaded']) or '—'}")
+        forbidden = [name for name in result['loaded'] if name in FORBIDDEN]
+        if module in CONTROL_PATH and forbidden:
+            violations.append(f"{module}: загружает {', '.join(forbidden)}")
+
+    if violations:
+        print("\n❌ Управляющий путь загружает лишнее:")
+        for violation in violations:
+            print("   " + violation)
+        sys.exit(1)
+    print("\n✅ Управляющий путь не загружает " + ", ".join(FORBIDDEN))
@@ -0,0 +1,292 @@
+"""
+Бенчмарк прогнозатора и функций наведения посадки (startLanding).
+
+Функции прогоняются на модельном корабле из simKrpc (без потока физики) по сетке
+масс, вертикальных скоростей и высот. Соединение обёрнуто rpcProfiler.RpcProfiler, поэтому
+для каждой функции видно, сколько RPC она делает за вызов; чтение потоков RPC не считается.
+Скорость замеряется на исходных объектах модели: накладные расходы профилировщика
+к функции не относятся.
+Отчёт: вызовов в секунду, итераций решателя, RPC на вызов — и сравнение с сохранённой
+базой benchLanding_baseline.json. При регрессии скрипт завершается с кодом 1.
+RPC и итерации детерминированы и сравниваются строго; скорость шумит, поэтому она
+нормируется эталонной нагрузкой (calibrate) и допускает падение до --tolerance.
+
+Запуск: python benchLanding.py [--update-baseline] [--tolerance 0.5] [--baseline путь]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import simKrpc
+import startLanding
+from rpcProfiler import RpcProfiler, unwrap
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchLanding_baseline.json')
+
+MASSES = (2.0, 2.8, 3.7)                 # т, посадочная ступень с разным остатком топлива
+VELOCITIES = (10.0, 40.0, 100.0, 250.0)  # м/с, скорость снижения
+HEIGHTS = (250.0, 1000.0, 4000.0, 10000.0)
+
+# Посадочная ступень DEFAULT_CRAFT отдельно: двигатель включается первой же активацией
+LANDER_CRAFT = {
+    'name': 'Lander (bench)',
+    'initial_stage': 1,
+    'launch_altitude': 0.0,
+    'sections': [dict(simKrpc.DEFAULT_CRAFT['sections'][-1], decouple_stage=-1)],
+}
+
+
+# =============================================================================
+# Сценарии
+# =============================================================================
+
+def make_lander(body_name):
+    """Модель с посадочной ступенью у поверхности тела body_name; поток физики не запускается"""
+    simulation = simKrpc.Simulation(LANDER_CRAFT)
+    vessel = simulation.vessel
+    vessel.control.activate_next_stage()
+    vessel.body = simulation.bodies[body_name]
+    vessel.landed = False
+    return simulation
+
+
+def place(simulation, mass, velocity, height):
+    """Поставить корабль на высоту height, снижающимся со скоростью velocity, с массой mass (т)"""
+    vessel = simulation.vessel
+    section = vessel.sections[0]
+    section['fuel'] = max(0.0, mass * 1000 - section['dry_mass'])
+    body = vessel.body
+    # Корабль на оси x: «вверх» — (1, 0), восток — (0, 1); к скорости снижения добавляем вращение поверхности
+    vessel.r = (body.equatorial_radius + height, 0.0)
+    vessel.v = (-velocity, body.angular_velocity * vessel.r[0])
+    vessel.pointing = (1.0, 0.0)
+
+
+def scenarios():
+    for mass in MASSES:
+        for velocity in VELOCITIES:
+            for height in HEIGHTS:
+                yield mass, velocity, height
+
+
+# =============================================================================
+# Измерение
+# =============================================================================
+
+def rpc_count(profiler):
+    """Всего RPC, засчитанных профилировщиком"""
+    return sum(profiler.counts.values())
+
+
+def unwrap_args(args):
+    """Аргументы без обёрток профилировщика (списки — поэлементно)"""
+    return tuple([unwrap(item) for item in arg] if isinstance(arg, list) else unwrap(arg) for arg in args)
+
+
+def measure(setup, call, profiler, repeats=5, min_time=0.05):
+    """
+    setup(scenario) готовит модель и возвращает аргументы call; замер — только call.
+    Возвращает вызовы/с (лучший из repeats прогонов — он меньше зависит от фона),
+    RPC на вызов и итерации решателя (если call их возвращает).
+    RPC считаются на обёрнутых аргументах, скорость — на исходных.
+    """
+    prepared = [setup(scenario) for scenario in scenarios()]
+
+    before = rpc_count(profiler)
+    iterations = []
+    for args in prepared:
+        result = call(*args)
+        if hasattr(result, 'iterations'):
+            iterations.append(result.iterations)
+    rpc_per_call = (rpc_count(profiler) - before) / len(prepared)
+
+    prepared = [unwrap_args(args) for args in prepared]
+    rate = 0
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for args in prepared:
+                call(*args)
+            calls += len(prepared)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = max(rate, calls / elapsed)
+
+    return {
+        'calls_per_sec': rate,
+        'rpc_per_call': rpc_per_call,
+        'iterations': sum(iterations) / len(iterations) if iterations else None,
+    }
+
+
+def calibrate(repeats=5, min_time=0.05):
+    """Скорость эталонной чисто питоновской нагрузки: ею нормируется сравнение с базой с другой загрузкой машины"""
+    rate = 0
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_time:
+            sum(math.log1p(i * 1e-3) for i in range(200))
+            calls += 1
+        rate = max(rate, calls / (time.perf_counter() - start))
+    return rate
+
+
+def run():
+    results = {}
+    profiler = RpcProfiler()
+
+    simulation = make_lander('Mun')
+    connection = profiler.wrap_connection(simKrpc.SimConnection(simulation))
+    vessel = connection.space_center.active_vessel
+    state = startLanding.VesselState(vessel, connection.space_center, connection)
+
+    def prepare(scenario):
+        mass, velocity, height = scenario
+        place(simulation, mass, velocity, height)
+        return state.refresh()
+
+    def snapshot(scenario):
+        """Независимая копия снимка состояния для сценария"""
+        copy = object.__new__(startLanding.VesselState)
+        copy.__dict__.update(prepare(scenario).__dict__)
+        return copy
+
+    def intercept_args(scenario):
+        """Снимок, время импульса, скорость снижения и высота — как их передаёт begin_landing"""
+        copy = snapshot(scenario)
+        velocity = -copy.vertical_speed
+        return copy, startLanding.velocity_intercept(copy, velocity), velocity, copy.surface_altitude
+
+    def refresh_args(scenario):
+        return prepare(scenario),
+
+    def solver_args(scenario):
+        copy = snapshot(scenario)
+        return copy, -copy.vertical_speed
+
+    def velocity_function_args(scenario):
+        copy, burn_time, velocity, _ = intercept_args(scenario)
+        return copy, velocity, burn_time, startLanding.predictor_inputs(copy)[0]
+
+    def height_function_args(scenario):
+        copy, burn_time, velocity, height = intercept_args(scenario)
+        return copy, burn_time, velocity, height, startLanding.predictor_inputs(copy)[0]
+
+    def throttle_args(scenario):
+        copy = snapshot(scenario)
+        return copy, -copy.vertical_speed, copy.surface_altitude
+
+    def vessel_args(scenario):
+        prepare(scenario)
+        return vessel,
+
+    def isp_args(scenario):
+        prepare(scenario)
+        return state.body, state.flight, state.engine_cache.engines
+
+    benchmarks = (
+        ('VesselState.refresh', refresh_args, startLanding.VesselState.refresh),
+        ('burn_solution', solver_args, startLanding.burn_solution),
+        ('velocity_intercept', solver_args, startLanding.velocity_intercept),
+        ('height_intercept', intercept_args, startLanding.height_intercept),
+        ('velocity_function', velocity_function_args, startLanding.velocity_function),
+        ('height_function', height_function_args, startLanding.height_function),
+        ('choose_throttle', throttle_args, startLanding.choose_throttle),
+        ('approximate_mass_burn_rate', vessel_args, startLanding.approximate_mass_burn_rate),
+        ('determine_surface_isp_ratio[Mun]', isp_args, startLanding.determine_surface_isp_ratio),
+    )
+    for name, setup, call in benchmarks:
+        results[name] = measure(setup, call, profiler)
+    state.close()
+
+    # Отношение ISP в атмосфере — та же ступень над Кербином
+    kerbin = make_lander('Kerbin')
+    kerbin_connection = profiler.wrap_connection(simKrpc.SimConnection(kerbin))
+    kerbin_vessel = kerbin_connection.space_center.active_vessel
+    body = kerbin_vessel.orbit.body
+    flight = kerbin_vessel.flight()
+    engines = [e for e in kerbin_vessel.parts.engines if e.active]
+
+    def kerbin_prepare(scenario):
+        place(kerbin, *scenario)
+        return body, flight, engines
+
+    results['determine_surface_isp_ratio[Kerbin]'] = measure(
+        kerbin_prepare, startLanding.determine_surface_isp_ratio, profiler)
+    return results
+
+
+# =============================================================================
+# Сравнение с базой
+# =============================================================================
+
+def compare(results, baseline, tolerance, speed_factor=1.0):
+    """
+    Список регрессий: RPC — любой рост, итерации — рост >10%, скорость — падение > tolerance.
+    speed_factor — во сколько раз эталонная нагрузка сейчас быстрее, чем при записи базы.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current['rpc_per_call'] > base['rpc_per_call'] + 1e-9:
+            regressions.append(f"{name}: RPC на вызов {base['rpc_per_call']:.2f} -> {current['rpc_per_call']:.2f}")
+        if current['iterations'] is not None and base.get('iterations') is not None \
+                and current['iterations'] > base['iterations'] * 1.1 + 1e-9:
+            regressions.append(f"{name}: итераций {base['iterations']:.2f} -> {current['iterations']:.2f}")
+        if current['calls_per_sec'] < base['calls_per_sec'] * speed_factor * (1 - tolerance):
+            regressions.append(f"{name}: вызовов/с {base['calls_per_sec']:.0f} -> {current['calls_per_sec']:.0f}")
+    return regressions
+
+
+def print_table(results, baseline, speed_factor=1.0):
+    print(f"{'функция':<38}{'вызовов/с':>12}{'к базе':>9}{'итер.':>8}{'RPC/вызов':>11}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        ratio = f"{r['calls_per_sec'] / (base['calls_per_sec'] * speed_factor):>8.2f}x" if base else f"{'—':>9}"
+        iterations = f"{r['iterations']:>8.2f}" if r['iterations'] is not None else f"{'—':>8}"
+        print(f"{name:<38}{r['calls_per_sec']:>12.0f}{ratio}{iterations}{r['rpc_per_call']:>11.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="файл базы (JSON)")
+    parser.add_argument('--update-baseline', action='store_true', help="записать текущие результаты как базу")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="допустимое падение вызовов/с относительно базы (доля)")
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = run()
+    baseline, speed_factor = {}, 1.0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            stored = json.load(file)
+        baseline = stored['functions']
+        speed_factor = calibration / stored['calibration']
+        print(f"Эталонная нагрузка: {speed_factor:.2f}x от скорости при записи базы (к ней нормированы сравнения)")
+    print_table(results, baseline, speed_factor)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'scenarios': len(list(scenarios())),
+                       'calibration': calibration, 'functions': results}, file, indent=2, ensure_ascii=False)
+        print(f"\n💾 База записана в '{args.baseline}'")
+        sys.exit(0)
+
+    if not baseline:
+        print("\n⚠️ База не найдена — запустите с --update-baseline")
+        sys.exit(0)
+    regressions = compare(results, baseline, args.tolerance, speed_factor)
+    if regressions:
+        print("\n❌ Регрессии:")
+        for line in regressions:
+            print("   " + line)
+        sys.exit(1)
+    print("\n✅ Регрессий нет")
@@ -0,0 +1,63 @@
+"""
+Бенчмарк построения графиков телеметрии в зависимости от числа отсчётов.
+
+Для синтетической миссии разной длины сравнивает plot_telemetry без прореживания
+и с прореживанием minmax / lttb: время построения с сохранением (dpi=150) и размер PNG.
+Запуск: python benchPlot.py [число_отсчётов ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from telemetryPlot import plot_telemetry
+
+
+def synthetic_mission(samples, seed=0):
+    """Правдоподобные ряды: подъём, орбита, посадка, с шумом датчиков"""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 20000, samples)
+    phase = t / t[-1]
+    noise = lambda scale: rng.normal(0, scale, samples)
+    altitude = 75000 * np.sin(np.pi * phase) ** 0.5 + noise(50)
+    return {
+        'time': t,
+        'altitude': altitude,
+        'vertical_speed': np.gradient(altitude, t) + noise(2),
+        'speed': 2200 * np.sin(np.pi * phase) + noise(5),
+        'mass': 30000 - 25000 * np.minimum(phase * 4, 1) + noise(10),
+        'throttle': (np.sin(40 * phase) > 0.6).astype(float),
+        'apoapsis': 80000 * np.minimum(phase * 10, 1) + noise(100),
+        'periapsis': -600000 + 670000 * np.minimum(phase * 8, 1) + noise(100),
+        'dynamic_pressure': 20000 * np.exp(-((phase - 0.02) / 0.01) ** 2) + np.abs(noise(5)),
+        'mach': np.abs(6 * np.sin(np.pi * phase) + noise(0.05)),
+        'acceleration': np.abs(15 * (np.sin(40 * phase) > 0.6) + noise(0.3)),
+    }
+
+
+def measure(data, max_points, method, directory):
+    path = os.path.join(directory, 'plot.png')
+    start = time.perf_counter()
+    plot_telemetry(data, show=False, save_path=path, max_points=max_points, method=method)
+    return time.perf_counter() - start, os.path.getsize(path) / 1024
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore', message='Glyph')  # эмодзи в заголовке нет в шрифте по умолчанию
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    variants = (('все точки', None, 'minmax'), ('minmax 2000', 2000, 'minmax'), ('lttb 2000', 2000, 'lttb'))
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for samples in sizes:
+            data = synthetic_mission(samples)
+            for name, max_points, method in variants:
+                seconds, kilobytes = measure(data, max_points, method, directory)
+                rows.append((samples, name, seconds, kilobytes))
+
+    print()
+    print(f"{'отсчётов':>10}  {'вариант':<14}{'время, с':>10}{'PNG, КБ':>10}")
+    for samples, name, seconds, kilobytes in rows:
+        print(f"{samples:>10}  {name:<14}{seconds:>10.2f}{kilobytes:>10.0f}")
@@ -0,0 +1,171 @@
+"""
+Предсказывающая отсечка двигателя для импульсных манёвров.
+
+Вместо проверки набранной дельты V раз в такт (с перелётом до одного такта на полной тяге)
+BurnCutoff читает потоки орбиты, тяги и массы, оценивает оставшееся время импульса
+и за handoff секунд до конца переходит на отсечку по времени: дроссель снижается так,
+чтобы остаток занял final_duration секунд, и двигатель выключается по потоку UT.
+"""
+import math
+import time
+from controlLoop import ControlLoop, wait_until
+from enginePerformance import G0
+
+STREAM_RATE = 50    # Гц, частота потоков, по которым считается остаток
+CUTOFF_RATE = 500   # Гц игрового времени, опрос UT при отсечке по времени
+
+
+def burn_time(vessel, delta_v):
+    """
+    Длительность импульса delta_v (м/с) на полной тяге по уравнению Циолковского:
+    m1 = m0 / exp(dv / (Isp * g0)), расход топлива F / (Isp * g0).
+    Без тяги или Isp (двигатель не включён) возвращает 0.
+    """
+    thrust = vessel.available_thrust
+    isp = vessel.specific_impulse
+    if thrust <= 0 or isp <= 0:
+        return 0.0
+    exhaust_velocity = isp * G0
+    initial_mass = vessel.mass
+    final_mass = initial_mass / math.exp(delta_v / exhaust_velocity)
+    return (initial_mass - final_mass) * exhaust_velocity / thrust
+
+
+def energy_remaining(mu, target_semi_major_axis, retrograde=False):
+    """
+    Остаток дельты V (м/с) до орбиты с большой полуосью target_semi_major_axis
+    по удельной энергии: dE = v * dv, поэтому dv = (E_цель - E) / v.
+    retrograde=True — торможение: остаток положителен, пока энергия выше целевой.
+    Возвращает функцию от (радиус, большая полуось).
+    """
+    target_energy = -mu / (2 * target_semi_major_axis)
+    sign = -1 if retrograde else 1
+
+    def remaining(radius, semi_major_axis):
+        speed = math.sqrt(mu * (2 / radius - 1 / semi_major_axis))
+        return sign * (target_energy + mu / (2 * semi_major_axis)) / speed
+
+    return remaining
+
+
+def periapsis_remaining(mu, target_periapsis, apoapsis):
+    """
+    Остаток дельты V (м/с) вдоль скорости до орбиты с радиусом перицентра target_periapsis.
+    Тяга по скорости меняет только её модуль, угол траектории gamma сохраняется:
+    h = r * v' * cos(gamma), E = v'^2 / 2 - mu / r, откуда
+    v'^2 = 2 * mu * rp * (r - rp) / (r * (r^2 * cos^2(gamma) - rp^2)).
+    apoapsis — функция текущего радиуса апоцентра (например, по потоку): по нему и большой
+    полуоси находятся эксцентриситет и cos(gamma). Если такого перицентра из текущей точки
+    не достичь, остаток считается до энергии круговой орбиты текущего радиуса.
+    Возвращает функцию от (радиус, большая полуось).
+    """
+    rp = target_periapsis
+
+    def remaining(radius, semi_major_axis):
+        speed = math.sqrt(mu * (2 / radius - 1 / semi_major_axis))
+        eccentricity = apoapsis() / semi_major_axis - 1
+        momentum = math.sqrt(max(0.0, mu * semi_major_axis * (1 - eccentricity ** 2)))
+        cos_gamma = min(1.0, momentum / (radius * speed))
+        reach = (radius * cos_gamma) ** 2 - rp ** 2
+        if radius <= rp or reach <= 0:
+            return energy_remaining(mu, radius)(radius, semi_major_axis)
+        return math.sqrt(2 * mu * rp * (radius - rp) / (radius * reach)) - speed
+
+    return remaining
+
+
+class BurnCutoff:
+    """
+    Импульс до нулевого остатка remaining(radius, semi_major_axis) с отсечкой по времени.
+
+    rate           — частота цикла на полной тяге (Гц игрового времени: часы цикла — поток UT)
+    handoff        — за сколько секунд до конца переходить на отсечку по времени
+    final_duration — сколько должен длиться остаток после снижения дросселя (с)
+    min_throttle   — нижняя граница дросселя на остатке
+    no_thrust_timeout — сколько секунд без тяги (кончилось топливо) ждать, прежде чем прекратить импульс
+    """
+
+    def __init__(self, vessel, space_center, connection, rate=20, handoff=0.5, final_duration=1.0,
+                 min_throttle=0.05, no_thrust_timeout=10.0):
+        self.vessel = vessel
+        self.space_center = space_center
+        self.connection = connection
+        self.rate = rate
+        self.handoff = handoff
+        self.final_duration = final_duration
+        self.min_throttle = min_throttle
+        self.no_thrust_timeout = no_thrust_timeout
+
+    def _open_streams(self):
+        vessel, orbit = self.vessel, self.vessel.orbit
+        add_stream = self.connection.add_stream
+        self._streams = {
+            'radius': add_stream(getattr, orbit, 'radius'),
+            'semi_major_axis': add_stream(getattr, orbit, 'semi_major_axis'),
+            'available_thrust': add_stream(getattr, vessel, 'available_thrust'),
+            'mass': add_stream(getattr, vessel, 'mass'),
+            'ut': add_stream(getattr, self.space_center, 'ut'),
+        }
+        for stream in self._streams.values():
+            stream.rate = STREAM_RATE
+
+    def _close_streams(self):
+        for stream in self._streams.values():
+            stream.remove()
+
+    def _remaining(self, remaining):
+        streams = self._streams
+        return remaining(streams['radius'](), streams['semi_major_axis']())
+
+    def _full_acceleration(self):
+        return self._streams['available_thrust']() / self._streams['mass']()
+
+    def run(self, remaining, name="Импульс", done=None):
+        """
+        Выполнить импульс; возвращает словарь с остатком после отсечки и длительностью отсечки по времени.
+        done — необязательное дополнительное условие отсечки (например, по потоку перицентра):
+        проверяется в каждом такте и в ожидании отсечки по времени.
+        При Cancelled или ошибке двигатель всё равно выключается, а потоки закрываются.
+        """
+        self._open_streams()
+        control = self.vessel.control
+        done = done or (lambda: False)
+        try:
+            control.throttle = 1.0
+            last_thrust = time.monotonic()
+
+            def full_thrust_step():
+                nonlocal last_thrust
+                dv = self._remaining(remaining)
+                if dv <= 0 or done():
+                    return True
+                acceleration = self._full_acceleration()
+                if acceleration > 0:
+                    last_thrust = time.monotonic()
+                    return dv / acceleration <= self.handoff
+                # Без тяги (например, между ступенями) оценку не делаем — ждём следующего такта
+                if time.monotonic() - last_thrust > self.no_thrust_timeout:
+                    print("⚠️ {}: нет тяги {:.0f} с — импульс прекращён".format(name, self.no_thrust_timeout))
+                    return True
+
+            loop = ControlLoop(self.rate, name, clock=self._streams['ut'])
+            loop.run(full_thrust_step)
+            loop.report()
+
+            # ---- Отсечка по времени ----
+            dv = self._remaining(remaining)
+            acceleration = self._full_acceleration()
+            timed = 0.0
+            if dv > 0 and acceleration > 0 and not done():
+                throttle = max(self.min_throttle, min(1.0, dv / (acceleration * self.final_duration)))
+                timed = dv / (acceleration * throttle)
+                control.throttle = throttle
+                ut = self._streams['ut']
+                cutoff_ut = ut() + timed
+                wait_until(lambda: ut() >= cutoff_ut or done(), CUTOFF_RATE, name + ": отсечка", clock=ut)
+            residual = self._remaining(remaining)
+        finally:
+            control.throttle = 0.0
+            self._close_streams()
+        print("🎯 {}: отсечка по времени {:.2f} с, остаток {:+.2f} м/с".format(name, timed, residual))
+        return {'timed_cutoff_s': timed, 'residual_dv': residual}
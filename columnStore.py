@@ -0,0 +1,78 @@
+"""
+Колоночное хранилище телеметрии на NumPy.
+
+Каждый канал — строка заранее выделенного массива float64. Без ограничения массив
+начинается с chunk_size отсчётов и при заполнении удваивается (копирование при росте
+в сумме O(n)); с max_samples работает как кольцевой буфер и хранит только последние
+max_samples отсчётов.
+
+Писатель один (поток сбора данных), читатели не берут блокировок:
+- без ограничения snapshot() отдаёт представления (view) без копирования —
+  уже записанные строки больше никогда не меняются;
+- в кольцевом режиме snapshot() копирует данные по схеме seqlock
+  и повторяет копию, если писатель успел записать во время чтения.
+"""
+import time
+import numpy as np
+
+
+class ColumnStore:
+
+    def __init__(self, columns, chunk_size=4096, max_samples=None):
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.max_samples = max_samples
+        capacity = max_samples if max_samples else chunk_size
+        self._data = np.empty((len(self.columns), capacity))
+        self._count = 0     # сколько отсчётов записано за всё время
+        self._version = 0   # счётчик seqlock: нечётный — идёт запись (только кольцевой режим)
+
+    def __len__(self):
+        if self.max_samples:
+            return min(self._count, self.max_samples)
+        return self._count
+
+    @property
+    def total_samples(self):
+        """Число отсчётов за всё время, включая вытесненные из кольца"""
+        return self._count
+
+    def append(self, row):
+        """Добавить один отсчёт; row — значения каналов в порядке self.columns"""
+        data = self._data
+        if self.max_samples:
+            self._version += 1
+            data[:, self._count % self.max_samples] = row
+            self._count += 1
+            self._version += 1
+            return
+
+        if self._count == data.shape[1]:
+            # Удваиваем ёмкость: старый массив остаётся целым для уже выданных представлений
+            grown = np.empty((len(self.columns), 2 * data.shape[1]))
+            grown[:, :self._count] = data
+            self._data = data = grown
+        data[:, self._count] = row
+        self._count += 1  # публикуем отсчёт только после записи
+
+    def snapshot(self):
+        """Словарь канал -> массив отсчётов в хронологическом порядке"""
+        if not self.max_samples:
+            count = self._count
+            data = self._data
+            return {name: data[i, :count] for i, name in enumerate(self.columns)}
+
+        while True:
+            version = self._version
+            if version % 2:
+                time.sleep(0)  # отдаём GIL писателю
+                continue
+            count = self._count
+            data = self._data
+            if count <= self.max_samples:
+                copy = data[:, :count].copy()
+            else:
+                start = count % self.max_samples
+                copy = np.concatenate((data[:, start:], data[:, :start]), axis=1)
+            if self._version == version:
+                return {name: copy[i] for i, name in enumerate(self.columns)}
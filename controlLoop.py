@@ -0,0 +1,161 @@
+"""
+Планировщик циклов управления с фиксированной частотой.
+
+Шаг цикла вызывается с заданной частотой по игровому (UT) или настенному времени,
+вместо опроса без пауз или произвольных sleep(). Для каждого цикла собирается
+статистика: задержка шага, дрожание начала такта, перегрузки и пропущенные такты.
+
+cancel() прерывает все циклы процесса: ближайший такт (или ожидание такта)
+бросает Cancelled — так оркестратор миссии останавливает этап, работающий
+в другом потоке. reset_cancel() снимает отмену перед следующей миссией.
+"""
+import threading
+import time
+from collections import deque
+
+
+class Cancelled(Exception):
+    """Цикл управления прерван через cancel()"""
+
+
+_cancel_event = threading.Event()
+
+
+def cancel():
+    """Прервать все работающие и будущие циклы (до reset_cancel())"""
+    _cancel_event.set()
+
+
+def reset_cancel():
+    _cancel_event.clear()
+
+
+def percentile(values, q):
+    """Перцентиль q (0..100) по отсортированной копии values (линейная интерполяция)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LoopStats:
+    """Метрики одного цикла управления (последние history тактов для перцентилей)"""
+
+    def __init__(self, period, history=1000):
+        self.period = period
+        self.ticks = 0
+        self.overruns = 0            # шаг выполнялся дольше периода
+        self.missed_deadlines = 0    # такты, пропущенные из-за опоздания
+        self.latencies = deque(maxlen=history)  # длительность шага (с, настенное время)
+        self.jitters = deque(maxlen=history)    # опоздание начала такта от расписания (с, по часам цикла)
+
+    def record(self, latency, jitter):
+        self.ticks += 1
+        self.latencies.append(latency)
+        self.jitters.append(jitter)
+        if latency > self.period:
+            self.overruns += 1
+
+    def summary(self):
+        """Сводка метрик в виде словаря (задержки в миллисекундах)"""
+        return {
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed_deadlines': self.missed_deadlines,
+            'latency_p50_ms': percentile(self.latencies, 50) * 1000,
+            'latency_p90_ms': percentile(self.latencies, 90) * 1000,
+            'latency_p99_ms': percentile(self.latencies, 99) * 1000,
+            'jitter_p99_ms': percentile(self.jitters, 99) * 1000,
+        }
+
+    def report(self, name):
+        s = self.summary()
+        print(f"⏱️ {name}: {s['ticks']} тактов по {self.period * 1000:.0f} мс, "
+              f"шаг p50/p90/p99 {s['latency_p50_ms']:.1f}/{s['latency_p90_ms']:.1f}/{s['latency_p99_ms']:.1f} мс, "
+              f"дрожание p99 {s['jitter_p99_ms']:.1f} мс, перегрузок {s['overruns']}, "
+              f"пропущено тактов {s['missed_deadlines']}")
+
+
+class ControlLoop:
+    """
+    Вызывает step() с частотой rate (Гц), пока step не вернёт True.
+
+    clock — источник времени цикла: по умолчанию time.monotonic; для привязки к игре
+    передаётся поток UT (например, connection.add_stream(getattr, space_center, 'ut')) —
+    тогда rate и timeout считаются в игровых секундах при любом ускорении времени.
+    Скорость часов относительно настенного времени оценивается по самим часам;
+    warp_rate — необязательная функция множителя варпа, нижняя граница этой оценки
+    (варп включился во время ожидания).
+    После cancel() run() бросает Cancelled на ближайшем такте.
+    """
+
+    def __init__(self, rate, name='цикл', clock=None, warp_rate=None, history=1000):
+        self.period = 1.0 / rate
+        self.name = name
+        self.clock = clock or time.monotonic
+        self.warp_rate = warp_rate
+        self.stats = LoopStats(self.period, history)
+        self._clock_speed = 1.0  # секунд часов цикла за настенную секунду (для часов UT)
+
+    def run(self, step, timeout=None):
+        """Выполнять шаги до True от step(); возвращает False, если истёк timeout (по часам цикла)"""
+        clock = self.clock
+        start = deadline = clock()
+
+        while True:
+            if _cancel_event.is_set():
+                raise Cancelled(self.name)
+            tick_start = clock()
+            wall_start = time.perf_counter()
+            done = step()
+            self.stats.record(time.perf_counter() - wall_start, max(0.0, tick_start - deadline))
+            if done:
+                return True
+
+            now = clock()
+            if timeout is not None and now - start >= timeout:
+                return False
+
+            deadline += self.period
+            if now > deadline:
+                # Опоздали: пропускаем прошедшие такты, а не пытаемся их догнать
+                missed = int((now - deadline) / self.period) + 1
+                self.stats.missed_deadlines += missed
+                deadline += missed * self.period
+            self._wait_until(deadline)
+
+    def _wait_until(self, deadline):
+        # Ожидание по событию отмены, а не sleep(): cancel() будит цикл сразу
+        if self.warp_rate is None and self.clock is time.monotonic:
+            _cancel_event.wait(max(0.0, deadline - time.monotonic()))
+            return
+        # Игровые часы могут стоять (пауза) или идти быстрее (варп, ускоренная модель) —
+        # спим порциями по оценке их скорости, не дольше настенного периода цикла
+        last_clock, last_wall = self.clock(), time.perf_counter()
+        while True:
+            remaining = deadline - last_clock
+            if remaining <= 0 or _cancel_event.is_set():
+                return
+            speed = self._clock_speed
+            if self.warp_rate is not None:
+                speed = max(speed, self.warp_rate())
+            _cancel_event.wait(min(remaining / max(speed, 1e-3), self.period))
+            now_clock, now_wall = self.clock(), time.perf_counter()
+            if now_wall > last_wall and now_clock > last_clock:
+                self._clock_speed = (now_clock - last_clock) / (now_wall - last_wall)
+            last_clock, last_wall = now_clock, now_wall
+
+    def report(self):
+        self.stats.report(self.name)
+
+
+def wait_until(condition, rate=10, name='ожидание', timeout=None, clock=None, warp_rate=None):
+    """
+    Опрашивать condition() с частотой rate, пока оно не станет истинным.
+    clock и warp_rate — как у ControlLoop: для условий в игровом времени передаётся поток UT.
+    """
+    loop = ControlLoop(rate, name, clock, warp_rate)
+    return loop.run(lambda: bool(condition()), timeout)
@@ -0,0 +1,357 @@
+"""
+Проверка прогноза посадочного импульса пакетным интегрированием траекторий (NumPy, RK4).
+
+Прогноз begin_landing (height_intercept / landingMath.batch_height) считает полёт чисто
+вертикальным: постоянная surface_gravity и тяга, умноженная на вертикальную составляющую
+ориентации direction[0] в момент прогноза. Здесь те же начальные состояния
+(высота, вертикальная и горизонтальная скорость, масса, тяга, расход) интегрируются
+честно, тысячами сразу:
+
+- плоское движение над сферической Муной: g(r) = mu / r^2, центробежный член vx^2 / r;
+- тяга на полном дросселе против скорости относительно поверхности (ретроград,
+  как держит автопилот на этапе посадки), расход постоянный, до сухой массы;
+- конец траектории — обнуление вертикальной скорости (высота остановки);
+  поверхность не ограничивает интегрирование, поэтому «остановка под землёй»
+  даёт отрицательную высоту — так же, как у прогноза.
+
+Ошибка прогноза = прогноз - истинная высота остановки (положительная — прогноз
+оптимистичен, корабль остановится ниже). Из неё выводятся запасы для порогов
+begin_landing:
+- прогноз < 30 м: состояния ставятся на высоту, на которой прогноз равен порогу,
+  и находится порог, при котором истинная остановка не ниже --clearance для доли --quantile;
+- высота < 500 м и |v| > 20 м/с: состояния ставятся на 500 м, находится высота
+  аварийного включения, на которой тормозного пути хватает для той же доли.
+
+Начальные состояния разыгрываются вокруг посадочной ступени simKrpc.DEFAULT_CRAFT
+или берутся из журнала телеметрии (.ktlm: altitude, vertical_speed, speed, mass).
+
+    python descentPropagator.py --samples 20000
+    python descentPropagator.py --log my_mission.ktlm --out descent_margins.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import simKrpc
+from landingMath import batch_burn_time, batch_height
+
+DT = 0.05               # с, шаг RK4
+MAX_TIME = 600.0        # с, дольше импульс не моделируется
+STOP_SPEED = 0.05       # м/с, скорость, ниже которой корабль считается остановленным
+
+TRIGGER_HEIGHT = 30.0       # м, порог прогноза в begin_landing
+EMERGENCY_ALTITUDE = 500.0  # м, аварийное включение в begin_landing ...
+EMERGENCY_SPEED = 20.0      # м/с, ... при такой вертикальной скорости
+
+# Диапазоны розыгрыша (единицы landingMath: кН, т, т/с)
+VERTICAL_SPEED = (20.0, 250.0)      # м/с, скорость снижения
+HORIZONTAL_SPEED = (0.0, 200.0)     # м/с
+HEIGHT = (200.0, 15000.0)           # м
+THRUST_SPREAD = 0.2                 # ± доля тяги двигателя
+HORIZONTAL_BINS = (0.0, 25.0, 50.0, 100.0, 150.0, np.inf)
+
+
+def mun_model():
+    """Параметры Муны из модели simKrpc (без запуска её потока)"""
+    mun = simKrpc.Simulation().bodies['Mun']
+    return {'mu': mun.gravitational_parameter, 'radius': mun.equatorial_radius,
+            'surface_gravity': mun.surface_gravity}
+
+
+def lander_model():
+    """Масса (т), тяга (кН) и расход (т/с) посадочной ступени simKrpc.DEFAULT_CRAFT"""
+    section = simKrpc.DEFAULT_CRAFT['sections'][-1]
+    engine = section['engines'][0]
+    return {
+        'dry_mass': section['dry_mass'] / 1000,
+        'wet_mass': (section['dry_mass'] + section['fuel_mass']) / 1000,
+        'thrust': engine['max_vacuum_thrust'] / 1000,
+        'mass_flow': engine['max_vacuum_thrust'] / (engine['vacuum_isp'] * simKrpc.G0) / 1000,
+    }
+
+
+def sample_states(rng, count, lander):
+    """count начальных состояний вокруг посадочной ступени — словарь массивов"""
+    thrust_scale = rng.uniform(1 - THRUST_SPREAD, 1 + THRUST_SPREAD, count)
+    return {
+        'height': rng.uniform(*HEIGHT, count),
+        'vertical_speed': -rng.uniform(*VERTICAL_SPEED, count),
+        'horizontal_speed': rng.uniform(*HORIZONTAL_SPEED, count),
+        'mass': rng.uniform(lander['dry_mass'] + 0.25 * (lander['wet_mass'] - lander['dry_mass']),
+                            lander['wet_mass'], count),
+        'thrust': lander['thrust'] * thrust_scale,
+        'mass_flow': lander['mass_flow'] * thrust_scale,
+        'dry_mass': np.full(count, lander['dry_mass']),
+    }
+
+
+def load_states(path, lander, max_height=HEIGHT[1]):
+    """
+    Состояния снижения из журнала телеметрии: отсчёты ниже max_height с отрицательной
+    вертикальной скоростью. Тяга и расход в журнале не пишутся — берутся у lander.
+    """
+    from telemetryLog import TelemetryLog
+
+    with TelemetryLog(path) as log:
+        data = log.get_data(['altitude', 'vertical_speed', 'speed', 'mass'])
+    descending = (data['vertical_speed'] < 0) & (data['altitude'] > 0) & (data['altitude'] < max_height)
+    count = int(descending.sum())
+    vertical = data['vertical_speed'][descending]
+    return {
+        'height': data['altitude'][descending],
+        'vertical_speed': vertical,
+        'horizontal_speed': np.sqrt(np.maximum(data['speed'][descending] ** 2 - vertical ** 2, 0.0)),
+        'mass': data['mass'][descending] / 1000,
+        'thrust': np.full(count, lander['thrust']),
+        'mass_flow': np.full(count, lander['mass_flow']),
+        'dry_mass': np.full(count, lander['dry_mass']),
+    }
+
+
+def predict(states, body):
+    """
+    Прогноз begin_landing для пакета состояний: время импульса и высота остановки.
+    Тяга умножается на |direction[0]| — вертикальную составляющую ретроградной ориентации.
+    """
+    vertical = states['vertical_speed']
+    speed = np.hypot(vertical, states['horizontal_speed'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        thrust = states['thrust'] * np.where(speed > 0, np.abs(vertical) / speed, 1.0)
+        burn = batch_burn_time(thrust, states['mass'], states['mass_flow'], body['surface_gravity'], vertical)
+        height = batch_height(burn, thrust, states['mass'], states['mass_flow'], body['surface_gravity'],
+                              vertical, states['height'])
+    return burn, np.where(np.isfinite(height), height, -np.inf)
+
+
+def _derivatives(h, vz, vx, m, thrust, flow, dry, mu, radius):
+    r = radius + h
+    speed = np.hypot(vz, vx)
+    burning = (m > dry) & (speed > 0)
+    accel = np.where(burning, thrust / m, 0.0) / np.where(speed > 0, speed, 1.0)
+    return (vz,
+            -mu / r ** 2 + vx * vx / r - accel * vz,
+            -vz * vx / r - accel * vx,
+            np.where(burning, -flow, 0.0))
+
+
+def propagate(states, body, dt=DT, max_time=MAX_TIME):
+    """
+    Импульс на полной тяге для пакета состояний (RK4 с шагом dt).
+    Возвращает словарь массивов: stop_height (высота, где вертикальная скорость обнулилась),
+    time, horizontal_speed (остаток в этот момент), final_mass и stopped
+    (False — не остановился за max_time или кончилось топливо при снижении).
+    """
+    mu, radius = body['mu'], body['radius']
+    count = len(states['height'])
+    result = {
+        'stop_height': np.full(count, -np.inf),
+        'time': np.full(count, np.nan),
+        'horizontal_speed': np.full(count, np.nan),
+        'final_mass': np.full(count, np.nan),
+        'stopped': np.zeros(count, bool),
+    }
+
+    # Состояние только активных траекторий; завершившиеся выбрасываются из массивов
+    ids = np.arange(count)
+    h = states['height'].astype(float).copy()
+    vz = states['vertical_speed'].astype(float).copy()
+    vx = states['horizontal_speed'].astype(float).copy()
+    m = states['mass'].astype(float).copy()
+    thrust = states['thrust'].astype(float).copy()
+    flow = states['mass_flow'].astype(float).copy()
+    dry = states['dry_mass'].astype(float).copy()
+
+    t = 0.0
+    while ids.size and t < max_time:
+        args = (thrust, flow, dry, mu, radius)
+        k1 = _derivatives(h, vz, vx, m, *args)
+        k2 = _derivatives(*(y + 0.5 * dt * k for y, k in zip((h, vz, vx, m), k1)), *args)
+        k3 = _derivatives(*(y + 0.5 * dt * k for y, k in zip((h, vz, vx, m), k2)), *args)
+        k4 = _derivatives(*(y + dt * k for y, k in zip((h, vz, vx, m), k3)), *args)
+        previous_h, previous_vz = h, vz
+        h, vz, vx, m = (y + dt / 6 * (a + 2 * b + 2 * c + d)
+                        for y, a, b, c, d in zip((h, vz, vx, m), k1, k2, k3, k4))
+        m = np.maximum(m, dry)
+        t += dt
+
+        stopped = (vz >= 0) | (np.hypot(vz, vx) < STOP_SPEED)
+        out_of_fuel = ~stopped & (m <= dry)
+        done = stopped | out_of_fuel
+        if not done.any():
+            continue
+
+        # Момент обнуления вертикальной скорости — линейная интерполяция внутри шага
+        fraction = np.clip(-previous_vz[stopped] / np.maximum(vz[stopped] - previous_vz[stopped], 1e-12), 0.0, 1.0)
+        finished = ids[stopped]
+        result['stop_height'][finished] = previous_h[stopped] + fraction * (h[stopped] - previous_h[stopped])
+        result['time'][finished] = t - dt * (1 - fraction)
+        result['horizontal_speed'][finished] = vx[stopped]
+        result['final_mass'][finished] = m[stopped]
+        result['stopped'][finished] = True
+        result['time'][ids[out_of_fuel]] = t
+        result['final_mass'][ids[out_of_fuel]] = m[out_of_fuel]
+
+        keep = ~done
+        ids = ids[keep]
+        h, vz, vx, m = h[keep], vz[keep], vx[keep], m[keep]
+        thrust, flow, dry = thrust[keep], flow[keep], dry[keep]
+
+    return result
+
+
+def _percentile(values, quantile):
+    return float(np.percentile(values, quantile * 100)) if values.size else None
+
+
+def _quantiles(values, quantile):
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return None
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p{:g}'.format(quantile * 100): float(np.percentile(values, quantile * 100)),
+            'max': float(values.max())}
+
+
+def validate(states, body, quantile=0.99, clearance=0.0):
+    """
+    Ошибка прогноза на состояниях states и запасы для порогов begin_landing.
+    Возвращает словарь: error (статистика ошибки высоты остановки, м), burn_time_error,
+    by_horizontal_speed (p-квантиль ошибки по диапазонам горизонтальной скорости),
+    trigger и emergency — рекомендуемые пороги.
+    """
+    count = len(states['height'])
+    burn, predicted = predict(states, body)
+    truth = propagate(states, body)
+    valid = truth['stopped'] & np.isfinite(predicted)
+    error = predicted - truth['stop_height']
+
+    by_horizontal = []
+    for low, high in zip(HORIZONTAL_BINS[:-1], HORIZONTAL_BINS[1:]):
+        selected = valid & (states['horizontal_speed'] >= low) & (states['horizontal_speed'] < high)
+        by_horizontal.append({'from': low, 'to': None if np.isinf(high) else high, 'samples': int(selected.sum()),
+                              'error': _quantiles(error[selected], quantile)})
+
+    # Порог прогноза: прогноз ставится ровно на TRIGGER_HEIGHT (он линеен по начальной высоте)
+    placed = {name: values[valid] for name, values in states.items()}
+    placed['height'] = placed['height'] + TRIGGER_HEIGHT - predicted[valid]
+    placed_truth = propagate(placed, body)
+    trigger_error = TRIGGER_HEIGHT - placed_truth['stop_height'][placed_truth['stopped']]
+    trigger_p = _percentile(trigger_error, quantile)
+
+    # Аварийное включение: те же состояния на EMERGENCY_ALTITUDE, только быстрее EMERGENCY_SPEED
+    fast = np.abs(states['vertical_speed']) > EMERGENCY_SPEED
+    emergency = {name: values[fast] for name, values in states.items()}
+    emergency['height'] = np.full(int(fast.sum()), EMERGENCY_ALTITUDE)
+    emergency_truth = propagate(emergency, body)
+    distance = EMERGENCY_ALTITUDE - emergency_truth['stop_height'][emergency_truth['stopped']]
+    distance_p = _percentile(distance, quantile)
+    crashed = emergency_truth['stop_height'] < clearance
+    # Наибольшая скорость, до которой разбивается не больше доли 1 - quantile включившихся на этой высоте
+    order = np.argsort(np.abs(emergency['vertical_speed']))
+    crash_rate = np.cumsum(crashed[order]) / np.arange(1, order.size + 1)
+    safe = np.nonzero(crash_rate <= 1 - quantile)[0]
+    safe_speed = float(np.abs(emergency['vertical_speed'][order[safe[-1]]])) if safe.size else None
+
+    return {
+        'samples': count,
+        'validated': int(valid.sum()),
+        'not_stopped': int((~truth['stopped']).sum()),
+        'quantile': quantile,
+        'clearance': clearance,
+        'error': _quantiles(error[valid], quantile),
+        'burn_time_error': _quantiles((burn - truth['time'])[valid], quantile),
+        'by_horizontal_speed': by_horizontal,
+        'trigger': {
+            'threshold': TRIGGER_HEIGHT,
+            'error': _quantiles(trigger_error, quantile),
+            'not_stopped': int((~placed_truth['stopped']).sum()),
+            'recommended': round(clearance + trigger_p, 1) + 0.0 if trigger_p is not None else None,
+        },
+        'emergency': {
+            'altitude': EMERGENCY_ALTITUDE,
+            'speed': EMERGENCY_SPEED,
+            'samples': int(fast.sum()),
+            'crash_fraction': float(crashed.mean()) if crashed.size else None,
+            'stopping_distance': _quantiles(distance, quantile),
+            'not_stopped': int((~emergency_truth['stopped']).sum()),
+            'recommended_altitude': clearance + distance_p if distance_p is not None else None,
+            'safe_speed': safe_speed,
+        },
+    }
+
+
+def report(result):
+    p = 'p{:g}'.format(result['quantile'] * 100)
+
+    def row(title, stats, unit):
+        if stats is None:
+            print(f"   {title:<34}{'—':>10}")
+            return
+        print(f"   {title:<34}{stats['mean']:>10.1f}{stats['p50']:>10.1f}{stats[p]:>10.1f}{stats['max']:>10.1f}  {unit}")
+
+    print(f"   {'':<34}{'среднее':>10}{'p50':>10}{p:>10}{'макс':>10}")
+    row("Ошибка высоты остановки", result['error'], "м")
+    row("Ошибка времени импульса", result['burn_time_error'], "с")
+    for part in result['by_horizontal_speed']:
+        upper = "∞" if part['to'] is None else f"{part['to']:.0f}"
+        row(f"  |vx| {part['from']:.0f}–{upper} м/с ({part['samples']})", part['error'], "м")
+
+    trigger = result['trigger']
+    row(f"Ошибка при прогнозе {trigger['threshold']:.0f} м", trigger['error'], "м")
+    emergency = result['emergency']
+    row(f"Тормозной путь с {emergency['altitude']:.0f} м", emergency['stopping_distance'], "м")
+
+    if result['not_stopped']:
+        print(f"⛽ Не хватает топлива на остановку: {result['not_stopped']} состояний (в запасах не учтены)")
+    if trigger['recommended'] is not None:
+        print(f"🎯 Порог прогноза: {trigger['threshold']:.0f} м -> {trigger['recommended']:.0f} м "
+              f"({p} при запасе {result['clearance']:.0f} м)")
+    if emergency['recommended_altitude'] is not None:
+        safe_speed = "—" if emergency['safe_speed'] is None else f"{emergency['safe_speed']:.0f} м/с"
+        print(f"🚨 Аварийное включение на {emergency['altitude']:.0f} м: не успевают остановиться "
+              f"{emergency['crash_fraction']:.1%}; нужная высота {emergency['recommended_altitude']:.0f} м ({p}), "
+              f"с {emergency['altitude']:.0f} м успевают до {safe_speed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка прогноза посадочного импульса пакетным RK4")
+    parser.add_argument('--samples', type=int, default=20000, help="разыгрываемых начальных состояний")
+    parser.add_argument('--log', default=None, help="взять состояния из журнала телеметрии (.ktlm)")
+    parser.add_argument('--thrust', type=float, default=None, help="тяга, кН (по умолчанию — посадочная ступень simKrpc)")
+    parser.add_argument('--mass-flow', type=float, default=None, help="расход, т/с")
+    parser.add_argument('--dry-mass', type=float, default=None, help="сухая масса, т")
+    parser.add_argument('--quantile', type=float, default=0.99, help="доля траекторий, для которой считаются запасы")
+    parser.add_argument('--clearance', type=float, default=0.0, help="м, допустимая высота остановки над поверхностью")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    body = mun_model()
+    lander = lander_model()
+    for name in ('thrust', 'mass_flow', 'dry_mass'):
+        if getattr(args, name) is not None:
+            lander[name] = getattr(args, name)
+
+    if args.log is not None:
+        states = load_states(args.log, lander)
+        source = f"журнал '{args.log}'"
+    else:
+        states = sample_states(np.random.default_rng(args.seed), args.samples, lander)
+        source = "розыгрыш"
+
+    started = time.perf_counter()
+    result = validate(states, body, args.quantile, args.clearance)
+    elapsed = time.perf_counter() - started
+    print(f"🚀 Проверка прогноза посадки: {result['samples']} состояний ({source}), "
+          f"остановились {result['validated']}, за {elapsed:.1f} с")
+    report(result)
+    if args.out is not None:
+        with open(args.out, 'w') as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+        print(f"💾 Результаты сохранены в '{args.out}'")
+
+
+if __name__ == '__main__':
+    main()
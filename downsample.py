@@ -0,0 +1,68 @@
+"""
+Прореживание рядов телеметрии перед построением графиков.
+
+minmax — для каждого «пикселя» (равного отрезка отсчётов) оставляет минимум и максимум
+в исходном порядке: огибающая ряда сохраняется точно, полностью векторизовано.
+lttb — Largest-Triangle-Three-Buckets: сохраняет форму кривой меньшим числом точек.
+"""
+import numpy as np
+
+
+def minmax(x, y, max_points):
+    """Оставить не более max_points точек: минимум и максимум в каждом из max_points // 2 отрезков"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= max_points or max_points < 4:
+        return x, y
+    if np.isnan(y).all():
+        return x[[0, -1]], y[[0, -1]]
+
+    bins = max_points // 2
+    size = -(-n // bins)  # ceil
+    # Дополняем последним значением до целого числа отрезков и берём argmin/argmax по строкам
+    padded = np.pad(np.where(np.isnan(y), np.nanmean(y), y), (0, bins * size - n), mode='edge').reshape(bins, size)
+    offsets = np.arange(bins) * size
+    low = offsets + padded.argmin(axis=1)
+    high = offsets + padded.argmax(axis=1)
+    index = np.sort(np.stack((low, high), axis=1), axis=1).ravel()
+    index = np.unique(np.concatenate(([0], np.minimum(index, n - 1), [n - 1])))
+    return x[index], y[index]
+
+
+def lttb(x, y, max_points):
+    """Largest-Triangle-Three-Buckets: max_points точек, первая и последняя сохраняются"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    index = np.empty(max_points, dtype=int)
+    index[0] = 0
+    index[-1] = n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Третья вершина — среднее следующего отрезка (для последнего — последняя точка)
+        if i + 2 < len(edges):
+            next_x = x[stop:edges[i + 2]].mean()
+            next_y = y[stop:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        index[i + 1] = previous
+    return x[index], y[index]
+
+
+METHODS = {'minmax': minmax, 'lttb': lttb}
+
+
+def decimate(x, y, max_points, method='minmax'):
+    """Прорядить ряд выбранным методом; max_points=None — без прореживания"""
+    if max_points is None:
+        return np.asarray(x), np.asarray(y)
+    return METHODS[method](x, y, max_points)
@@ -1,55 +1,268 @@
-import krpc
+import os
+import asyncio
 import time
-import _thread as thread
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import startLanding
 import toLKO
 import munTransfer
 import stageMonitor
 import orbitMun
-from telemetry import DataRecorder
+import controlLoop
+import flightAnalytics
+from telemetry import DataRecorder, DEFAULT_CHANNELS
+from rpcProfiler import RpcProfiler
+from streamHub import StreamHub
+
 # =============================================================================
-# 1. ПОДКЛЮЧЕНИЕ К ИГРЕ И ЗАПУСК МОНИТОРИНГА СТУПЕНЕЙ
+# ПАРАМЕТРЫ МИССИИ
 # =============================================================================
-connection = krpc.connect("Connection")
-space_center = connection.space_center
-vessel = space_center.active_vessel
+# run_mission(connection, params) переопределяет любые из них
+DEFAULT_PARAMS = {
+    'ascent_profile': 0.5,              # показатель программы тангажа (toLKO)
+    'circularization': 'visviva',       # режим циркуляризации (toLKO)
+    'recorder_interval': 0.5,           # с, период отсчётов телеметрии
+    'log_path': "my_mission.ktlm",      # журнал телеметрии (None — без журнала)
+    'plot_path': "my_mission.png",      # графики телеметрии (None — не строить и не загружать matplotlib)
+    'show_plot': True,
+    'phases': ('подъём', 'перелёт', 'захват', 'посадка'),  # какие этапы выполнять (по порядку)
+    # с настенного времени на этап; по истечении этап отменяется и миссия прерывается
+    'phase_timeouts': {'подъём': 900, 'перелёт': 1800, 'захват': 1200, 'посадка': 300},
+}
 
-recorder = DataRecorder(vessel, space_center, interval=0.5)
-recorder.start()
+WATCHDOG_PERIOD = 1.0       # с, период сторожа
+CLOCK_STALL_TIMEOUT = 15    # с, столько UT может не меняться, прежде чем сторож предупредит
+SOI_TIMEOUT = 60            # с, ожидание входа в сферу влияния Муны после перелёта
+STABILIZE_ERROR = 1.0       # °, ошибка ориентации, при которой корабль считается стабилизированным
+STABILIZE_TIMEOUT = 30      # с, дольше стабилизацию не ждём
 
-args = [vessel]
-thread.start_new_thread(stageMonitor.monitor, tuple(args))
 
-# =============================================================================
-# 2. ВЗЛЁТ И ВЫХОД НА ОРБИТУ КЕРБИНА
-# =============================================================================
-print("Этап 1: Взлёт и выход на орбиту Кербина")
-toLKO.engage(vessel, space_center, connection, 0.5)
+class MissionAborted(Exception):
+    """Этап не уложился в отведённое время, отменён или завершился ошибкой"""
 
-# =============================================================================
-# 3. ПЕРЕЛЁТ К МУНЕ (ГОМАНОВСКАЯ ТРАЕКТОРИЯ)
-# =============================================================================
-print("Этап 2: Перелёт к Муне")
-munTransfer.engage(vessel, space_center, connection)
-
-# Вычисляем время до входа в сферу влияния Муны и до её перицентра
-time_to_warp = vessel.orbit.next_orbit.time_to_periapsis + vessel.orbit.time_to_soi_change
-# Варпим до момента за 5 минут до перицентра (чтобы успеть подготовиться)
-space_center.warp_to(space_center.ut + time_to_warp - 300)
-
-# Get ready for landing
-orbitMun.engage(vessel, space_center, connection)
-
-# Engage Landing (vertical)
-vessel.auto_pilot.engage()
-vessel.auto_pilot.reference_frame = vessel.surface_velocity_reference_frame
-vessel.auto_pilot.target_direction = (0.0, -1.0, 0.0)  # Point retro-grade surface
-print("Stabilizing...")
-time.sleep(10)
-vessel.auto_pilot.disengage()
-vessel.control.sas = True
-
-# Останавливаем сбор данных и строим графики телеметрии
-recorder.stop()
-recorder.plot(show=True, save_path="my_mission.png")
-print("Графики готовы. Программа завершена.")
\ No newline at end of file
+
+class Mission:
+    """
+    Оркестратор миссии на asyncio: регистратор телеметрии, монитор ступеней и сторож —
+    задачи одного цикла событий, этапы идут друг за другом и передаются по событиям
+    потоков (StreamHub.wait_for), а не по sleep(). Все задачи делят один StreamHub.
+
+    Контроллеры этапов (toLKO, munTransfer, orbitMun) блокирующие — они выполняются
+    в отдельном рабочем потоке "phase"; при таймауте этапа controlLoop.cancel()
+    прерывает их циклы на ближайшем такте. Блокирующий RPC (например, warp_to)
+    прервать нельзя — оркестратор дожидается его завершения.
+    """
+
+    def __init__(self, connection, params=None, profiler=None):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.hub = StreamHub(connection)
+        self.space_center = connection.space_center
+        self.vessel = self.space_center.active_vessel
+        self.profiler = profiler
+        self.result = {'phases': {}, 'aborted': None, 'staged': [], 'streams': {}, 'telemetry': {}}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phase")
+        self._background = []
+
+    # ---- Этапы ----
+    def ascent(self):
+        params = self.params
+        toLKO.engage(self.vessel, self.space_center, self.hub, params['ascent_profile'], params['circularization'])
+
+    def transfer(self):
+        vessel, space_center = self.vessel, self.space_center
+        munTransfer.engage(vessel, space_center, self.hub)
+        # Вычисляем время до входа в сферу влияния Муны и до её перицентра
+        time_to_warp = vessel.orbit.next_orbit.time_to_periapsis + vessel.orbit.time_to_soi_change
+        # Варпим до момента за 5 минут до перицентра (чтобы успеть подготовиться)
+        space_center.warp_to(space_center.ut + time_to_warp - 300)
+
+    async def capture(self):
+        # Захват начинается по событию входа в сферу влияния Муны
+        mun = self.space_center.bodies["Mun"]
+        try:
+            await self.hub.wait_for(lambda body: body == mun, getattr, self.vessel.orbit, 'body', timeout=SOI_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise MissionAborted("корабль не вошёл в сферу влияния Муны")
+        await self._in_thread(orbitMun.engage, self.vessel, self.space_center, self.hub)
+
+    async def landing(self):
+        auto_pilot = self.vessel.auto_pilot
+        auto_pilot.engage()
+        auto_pilot.reference_frame = self.vessel.surface_velocity_reference_frame
+        auto_pilot.target_direction = (0.0, -1.0, 0.0)  # Point retro-grade surface
+        print("Stabilizing...")
+        try:
+            await self.hub.wait_for(lambda error: error < STABILIZE_ERROR, getattr, auto_pilot, 'error',
+                                    timeout=STABILIZE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Стабилизация не завершилась за {STABILIZE_TIMEOUT} с")
+        auto_pilot.disengage()
+        self.vessel.control.sas = True
+
+    # ---- Планирование ----
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _run_phase(self, name, work):
+        """
+        Этап с таймаутом: work — корутина или блокирующая функция (выполняется в потоке "phase").
+        Таймаут, отмена и любое исключение этапа превращаются в MissionAborted.
+        """
+        timeout = self.params['phase_timeouts'].get(name)
+        if asyncio.iscoroutinefunction(work):
+            future = asyncio.ensure_future(work())
+        else:
+            future = asyncio.ensure_future(self._in_thread(work))
+        context = self.profiler.phase(name) if self.profiler is not None else nullcontext()
+        started = time.perf_counter()
+        with context:
+            try:
+                done, _ = await asyncio.wait({future}, timeout=timeout)
+                if not done:
+                    print(f"⏰ Этап «{name}» не уложился в {timeout} с — отмена")
+                    controlLoop.cancel()  # циклы в потоке этапа выходят на ближайшем такте
+                    future.cancel()
+                    await asyncio.wait({future})
+                    raise MissionAborted(f"таймаут этапа «{name}»")
+                future.result()
+            except MissionAborted:
+                raise
+            except controlLoop.Cancelled:
+                raise MissionAborted(f"этап «{name}» отменён")
+            except Exception as error:
+                # Любая ошибка этапа прерывает миссию: корабль переводится в безопасное состояние в run()
+                raise MissionAborted(f"этап «{name}» завершился ошибкой: {error!r}") from error
+            finally:
+                self.result['phases'][name] = time.perf_counter() - started
+
+    async def _watchdog(self):
+        """Предупреждает, если игровое время встало или фоновая задача упала"""
+        ut = self.hub.add_stream(getattr, self.space_center, 'ut')
+        last, changed, warned = ut(), time.monotonic(), set()
+        try:
+            while True:
+                await asyncio.sleep(WATCHDOG_PERIOD)
+                now = ut()
+                if now != last:
+                    last, changed = now, time.monotonic()
+                    warned.discard('clock')
+                elif time.monotonic() - changed > CLOCK_STALL_TIMEOUT and 'clock' not in warned:
+                    warned.add('clock')
+                    print(f"⚠️ Игровое время не меняется {CLOCK_STALL_TIMEOUT} с (пауза или потеря связи?)")
+                for task in self._background:
+                    if task.done() and not task.cancelled() and task.exception() and task not in warned:
+                        warned.add(task)
+                        print(f"⚠️ Задача «{task.get_name()}» упала: {task.exception()!r}")
+        finally:
+            ut.remove()
+
+    async def run(self):
+        params = self.params
+        controlLoop.reset_cancel()
+        recorder = DataRecorder(self.vessel, self.space_center, interval=params['recorder_interval'],
+                                connection=self.hub, log_path=params['log_path'],
+                                channels=DEFAULT_CHANNELS + flightAnalytics.CHANNELS)
+        stage_monitor = stageMonitor.StageMonitor(self.vessel, self.hub)
+        self._background = [
+            asyncio.create_task(recorder.run_async(), name="DataRecorder"),
+            asyncio.create_task(stage_monitor.run_async(), name="stageMonitor"),
+            asyncio.create_task(self._watchdog(), name="watchdog"),
+        ]
+
+        phases = (
+            ("Этап 1: Взлёт и выход на орбиту Кербина", "подъём", self.ascent),
+            ("Этап 2: Перелёт к Муне", "перелёт", self.transfer),
+            ("Этап 3: Выход на орбиту Муны", "захват", self.capture),
+            ("Этап 4: Посадка", "посадка", self.landing),
+        )
+        try:
+            for title, name, work in phases:
+                if name not in params['phases']:
+                    continue
+                print(title)
+                await self._run_phase(name, work)
+        except MissionAborted as error:
+            self.result['aborted'] = str(error)
+            print(f"🛑 Миссия прервана: {error}")
+        finally:
+            controlLoop.cancel()
+            for task in self._background:
+                task.cancel()
+            await asyncio.gather(*self._background, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+            if self.result['aborted'] is not None:
+                # Безопасное состояние — когда поток этапа уже завершился и не перезапишет его
+                self.vessel.control.throttle = 0
+                self.vessel.auto_pilot.disengage()
+            recorder.stop()
+            self.hub.close()
+            controlLoop.reset_cancel()
+
+        self.result['staged'] = [stage for stage, _ in stage_monitor.staged]
+        self.result['streams'] = {'created': self.hub.created, 'shared': self.hub.shared}
+        self.result['telemetry'] = telemetry_summary(recorder.get_data())
+        if params['plot_path'] is not None:
+            recorder.plot(show=params['show_plot'], save_path=params['plot_path'])
+        return self.result
+
+
+def telemetry_summary(data):
+    """
+    Сводные метрики записанной телеметрии: длительность, пиковые нагрузки, конечное состояние
+    и разбор полёта flightAnalytics (число ступеней, дельта V по импульсам, потери, max Q)
+    """
+    if not len(data['time']):
+        return {}
+    summary = {'samples': len(data['time']), 'duration_s': float(data['time'][-1])}
+    for name, key in (('dynamic_pressure', 'max_dynamic_pressure'), ('acceleration', 'max_acceleration')):
+        if name in data:
+            summary[key] = float(data[name].max())
+    for name in ('apoapsis', 'periapsis', 'mass'):
+        if name in data:
+            summary['final_' + name] = float(data[name][-1])
+    summary.update(flightAnalytics.summary(data))
+    return summary
+
+
+def run_mission(connection, params=None, profiler=None):
+    """Выполнить миссию целиком; возвращает словарь с длительностями этапов, ступенями и итогом"""
+    return asyncio.run(Mission(connection, params, profiler).run())
+
+
+if __name__ == '__main__':
+    # =========================================================================
+    # ПОДКЛЮЧЕНИЕ К ИГРЕ
+    # =========================================================================
+    # KSP_SIM=<ускорение времени> — вместо игры запустить локальную модель (simKrpc), без окон;
+    # ускорение не больше simKrpc.MAX_TIME_SCALE (50), большее урезается
+    SIMULATION = os.environ.get("KSP_SIM")
+    if SIMULATION:
+        import simKrpc
+        connection = simKrpc.connect("Connection", time_scale=float(SIMULATION))
+    else:
+        import krpc
+        connection = krpc.connect("Connection")
+
+    # KSP_HEADLESS=1 — без графиков: matplotlib не загружается, отчёт строится позже по журналу
+    HEADLESS = os.environ.get("KSP_HEADLESS")
+    params = {'show_plot': not SIMULATION}
+    if HEADLESS:
+        params.update(plot_path=None, show_plot=False)
+
+    # KSP_PROFILE_RPC=<файл.json> — считать RPC по этапам и потокам (см. rpcProfiler), итог — в конце миссии
+    PROFILE_PATH = os.environ.get("KSP_PROFILE_RPC")
+    profiler = RpcProfiler() if PROFILE_PATH else None
+    if profiler is not None:
+        connection = profiler.wrap_connection(connection)
+
+    result = run_mission(connection, params, profiler)
+    print("Итог миссии:", result)
+    if profiler is not None:
+        profiler.report(PROFILE_PATH)
+    if SIMULATION:
+        print("Итог моделирования:", connection.sim.outcome())
+        connection.close()
+    if HEADLESS:
+        print(f"Графики: python telemetryPlot.py {DEFAULT_PARAMS['log_path']}. Программа завершена.")
+    else:
+        print("Графики готовы. Программа завершена.")
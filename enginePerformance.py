@@ -0,0 +1,140 @@
+"""
+Кэш характеристик двигателей текущей ступени.
+
+Расход массы считается по тяге и удельному импульсу каждого двигателя,
+поэтому работает для любого двигателя, а не только для известных по имени.
+
+ISP в зависимости от давления снимается таблицей через engine.specific_impulse_at
+один раз на тип двигателя (part.name) и дальше интерполируется без RPC.
+Отношение ISP к вакуумному для ступени — среднее по двигателям, взвешенное
+по вакуумной тяге: при постоянном расходе тяга двигателя пропорциональна его ISP.
+"""
+from collections import namedtuple
+
+G0 = 9.80665  # стандартное ускорение свободного падения для пересчёта ISP (м/с²)
+ATM = 101325  # Па в одной атмосфере
+
+PRESSURE_STEP = 0.1     # атм, шаг таблицы ISP
+MAX_PRESSURE = 5.0      # атм, выше таблица не строится (Ева у поверхности ~5 атм), значение берётся крайнее
+VACUUM_ISP_RATIO = 0.99  # без атмосферы ISP вакуумный; 1 % запаса на посадку
+
+# Характеристики типа двигателя: вакуумная тяга (Н), вакуумный ISP и ISP по сетке давлений
+EngineType = namedtuple('EngineType', ['max_vacuum_thrust', 'vacuum_isp', 'isp_table'])
+
+_engine_types = {}  # part.name -> EngineType, общий для всех кораблей и ступеней
+_engine_names = {}  # двигатель -> part.name (два RPC на двигатель только при первой встрече)
+_ratio_tables = {}  # кортеж part.name двигателей -> таблица isp_ratio_table
+
+
+def engine_mass_flow(engine):
+    """Расход массы двигателя на полной тяге (т/с): F_vac / (Isp_vac * g0)"""
+    isp = engine.vacuum_specific_impulse
+    if isp <= 0:
+        return 0
+    return engine.max_vacuum_thrust / (isp * G0) / 1000
+
+
+def engine_name(engine):
+    """Имя детали двигателя (тип), запомненное для этого двигателя"""
+    name = _engine_names.get(engine)
+    if name is None:
+        name = _engine_names[engine] = engine.part.name
+    return name
+
+
+def engine_type(engine, name=None):
+    """Характеристики типа двигателя; таблица ISP снимается при первой встрече типа"""
+    if name is None:
+        name = engine_name(engine)
+    cached = _engine_types.get(name)
+    if cached is None:
+        steps = int(round(MAX_PRESSURE / PRESSURE_STEP))
+        table = tuple(engine.specific_impulse_at(i * PRESSURE_STEP) for i in range(steps + 1))
+        cached = _engine_types[name] = EngineType(engine.max_vacuum_thrust, engine.vacuum_specific_impulse, table)
+    return cached
+
+
+def isp_ratio_table(engines):
+    """
+    Отношение ISP к вакуумному по сетке давлений для набора двигателей, взвешенное по вакуумной тяге;
+    None — если ни один двигатель не даёт тяги. Таблица запоминается для того же набора типов.
+    """
+    named = sorted(((engine_name(e), e) for e in engines), key=lambda pair: pair[0])
+    names = tuple(name for name, _ in named)
+    if names not in _ratio_tables:
+        types = [engine_type(e, name) for name, e in named]
+        types = [t for t in types if t.vacuum_isp > 0 and t.max_vacuum_thrust > 0]
+        total = sum(t.max_vacuum_thrust for t in types)
+        _ratio_tables[names] = tuple(
+            sum(t.max_vacuum_thrust * t.isp_table[i] / t.vacuum_isp for t in types) / total
+            for i in range(len(types[0].isp_table))) if total else None
+    return _ratio_tables[names]
+
+
+def interpolate_isp_ratio(table, static_pressure):
+    """Значение таблицы isp_ratio_table при статическом давлении static_pressure (Па)"""
+    position = static_pressure / ATM / PRESSURE_STEP
+    index = int(position)
+    if index >= len(table) - 1:
+        return table[-1]
+    fraction = position - index
+    return table[index] + (table[index + 1] - table[index]) * fraction
+
+
+class EngineCache:
+    """
+    Активные двигатели с топливом и их суммарный расход, привязанные к текущей ступени.
+
+    Список двигателей перестраивается только при смене vessel.control.current_stage
+    или когда у одного из двигателей заканчивается топливо (поток has_fuel).
+    В остальное время update() читает лишь локальные значения потоков.
+    """
+
+    def __init__(self, vessel, connection):
+        self.vessel = vessel
+        self.connection = connection
+        self._stage_stream = connection.add_stream(getattr, vessel.control, 'current_stage')
+        self._fuel_streams = []
+
+        self.stage = None
+        self.engines = []
+        self.mass_flows = []
+        self.mass_burn_rate = 0
+        self._isp_table = None
+
+    def update(self):
+        """Проверить актуальность кэша; возвращает True, если он был перестроен"""
+        stage = self._stage_stream()
+        if stage == self.stage and all(has_fuel() for has_fuel in self._fuel_streams):
+            return False
+        self._rebuild(stage)
+        return True
+
+    def _rebuild(self, stage):
+        for stream in self._fuel_streams:
+            stream.remove()
+
+        self.stage = stage
+        self.engines = [e for e in self.vessel.parts.engines if e.active and e.has_fuel]
+        self.mass_flows = [engine_mass_flow(e) for e in self.engines]
+        self.mass_burn_rate = sum(self.mass_flows)
+        self._isp_table = None  # снимается при первом запросе в атмосфере
+        self._fuel_streams = [self.connection.add_stream(getattr, e, 'has_fuel') for e in self.engines]
+
+        if not self.engines:
+            print("❌ Нет активных двигателей с топливом!")
+
+    def isp_ratio(self, static_pressure):
+        """Отношение ISP ступени к вакуумному при статическом давлении static_pressure (Па)"""
+        if static_pressure <= 0:
+            return VACUUM_ISP_RATIO
+        if self._isp_table is None:
+            self._isp_table = isp_ratio_table(self.engines) or (0.0,)
+        return interpolate_isp_ratio(self._isp_table, static_pressure)
+
+    def close(self):
+        """Удалить потоки кэша"""
+        for stream in self._fuel_streams:
+            stream.remove()
+        self._stage_stream.remove()
+        self._fuel_streams = []
@@ -0,0 +1,273 @@
+"""
+Разбор записанной телеметрии после полёта: дельта V по ступеням, потери, max Q.
+
+Все величины считаются по столбцам DataRecorder.get_data / TelemetryLog.get_data
+векторно: поинтервальные приращения (трапеции между соседними отсчётами) суммируются
+по отрезкам через np.add.reduceat, поэтому многочасовая запись разбирается за миллисекунды.
+Интервалы длиннее MAX_GAP_FACTOR медианных (варп, пропуски записи) и скачки массы
+в интегралы не входят.
+
+- Ступени — отрезки между разрывами массы: за один отсчёт масса падает сильнее
+  STAGE_MIN_DROP и быстрее, чем в STAGE_RATE_FACTOR раз расход на соседних отсчётах
+  (STAGE_WINDOW с каждой стороны), а с каналом 'thrust' — и быстрее, чем могла бы
+  сжечь записанная тяга при ISP STAGE_MIN_ISP. Сравнение с соседями, а не со всем
+  полётом: расход разгонной и посадочной ступеней отличается на порядок.
+- Импульсы (фазы) — отрезки, где двигатель работает: тяга больше нуля, а без канала
+  'thrust' — дроссель выше BURN_THROTTLE и масса убывает (на стартовом столе
+  дроссель бывает открыт до запуска двигателя).
+- Дельта V импульса — интеграл thrust / mass, если записан канал 'thrust';
+  иначе — интеграл показаний акселерометра ('acceleration'), то есть уже без сопротивления.
+- Потери сопротивления — интеграл (thrust / mass - acceleration) там, где есть
+  динамическое давление (только с каналом 'thrust').
+- Полезная часть импульса — изменение скорости |Δspeed| за импульс; остаток
+  (акселерометр минус полезная часть) — гравитационные потери вместе с потерями
+  на управление (тяга не вдоль скорости). Скорость 'speed' — относительно поверхности.
+- КПД импульса — полезная часть / дельта V.
+
+    python flightAnalytics.py my_mission.ktlm [ещё.ktlm ...] [--out analytics.json]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from enginePerformance import G0
+
+STAGE_MIN_DROP = 10.0       # кг, меньшие скачки массы — не отделение
+STAGE_RATE_FACTOR = 5.0     # во сколько раз скачок быстрее расхода топлива на соседних отсчётах
+STAGE_WINDOW = 5            # соседних интервалов с каждой стороны для сравнения расхода
+STAGE_MIN_ISP = 50.0        # с, ISP, ниже которого не бывает: быстрее тяга топливо не сожжёт
+BURN_THROTTLE = 0.01        # дроссель, выше которого двигатель считается работающим
+MAX_GAP_FACTOR = 10.0       # интервал длиннее стольких медианных — пропуск в записи
+
+# Каналы сверх telemetry.DEFAULT_CHANNELS, с которыми разбор полнее (дельта V по тяге, сопротивление)
+CHANNELS = ('thrust',)
+
+
+def _segments(mask):
+    """Начала и концы (не включая) отрезков подряд идущих True"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _sums(values, starts, ends):
+    """Суммы values по отрезкам [start, end) без цикла Python"""
+    if not len(starts):
+        return np.zeros(0)
+    totals = np.add.reduceat(values, starts)
+    return np.where(ends > starts, totals, 0.0)
+
+
+def mass_jumps(time_s, mass, thrust=None):
+    """
+    Интервалы (между отсчётами k и k + 1), на которых масса скачком падает — отделение.
+    thrust (Н) — если записана, скачок должен быть и быстрее расхода этой тяги при STAGE_MIN_ISP.
+    """
+    drop = -np.diff(mass)
+    dt = np.diff(time_s)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(dt > 0, drop / dt, np.inf)
+    # Наибольший расход на соседних интервалах слева и справа (сам интервал не входит)
+    flow = np.pad(np.where(np.isfinite(rate) & (rate > 0), rate, 0.0), STAGE_WINDOW)
+    count = len(rate)
+    neighbours = np.zeros(count)
+    for shift in range(1, STAGE_WINDOW + 1):
+        neighbours = np.maximum(neighbours, flow[STAGE_WINDOW - shift:STAGE_WINDOW - shift + count])
+        neighbours = np.maximum(neighbours, flow[STAGE_WINDOW + shift:STAGE_WINDOW + shift + count])
+    limit = STAGE_RATE_FACTOR * neighbours
+    if thrust is not None:
+        limit = np.maximum(limit, np.maximum(thrust[:-1], thrust[1:]) / (STAGE_MIN_ISP * G0))
+    return (drop > STAGE_MIN_DROP) & (rate > limit)
+
+
+def stage_boundaries(time_s, mass, thrust=None):
+    """Индексы отсчётов, с которых начинается каждая ступень (первый — 0)"""
+    return np.concatenate(([0], np.flatnonzero(mass_jumps(time_s, mass, thrust)) + 1))
+
+
+def analyze(data):
+    """
+    Полный разбор: словарь с 'stages' и 'burns' (списки словарей по отрезкам),
+    'max_q' и итогами по полёту. data — словарь канал -> массив.
+    """
+    time_s = np.asarray(data['time'], dtype=float)
+    count = len(time_s)
+    if count < 2:
+        return {'samples': count, 'stages': [], 'burns': [], 'max_q': None}
+
+    mass = np.asarray(data['mass'], dtype=float)
+    speed = np.asarray(data['speed'], dtype=float)
+    acceleration = np.asarray(data['acceleration'], dtype=float)
+    throttle = np.asarray(data['throttle'], dtype=float)
+    has_thrust = 'thrust' in data
+    dynamic_pressure = np.asarray(data['dynamic_pressure'], dtype=float) if 'dynamic_pressure' in data \
+        else np.zeros(count)
+
+    # Поинтервальные величины: интервал k — от отсчёта k до k + 1 (трапеции)
+    dt = np.diff(time_s)
+    positive = dt[dt > 0]
+    gaps = dt > MAX_GAP_FACTOR * (np.median(positive) if positive.size else 0.0)
+    thrust = np.asarray(data['thrust'], dtype=float) if has_thrust else None
+    jumps = mass_jumps(time_s, mass, thrust)
+    sensed = (acceleration[:-1] + acceleration[1:]) / 2 * dt
+    if has_thrust:
+        burning = (thrust[:-1] > 0) & (thrust[1:] > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            thrust_accel = np.where(mass > 0, thrust / mass, 0.0)
+        ideal = (thrust_accel[:-1] + thrust_accel[1:]) / 2 * dt
+        drag = np.where(dynamic_pressure[:-1] > 0, np.maximum(ideal - sensed, 0.0), 0.0)
+    else:
+        burning = (throttle[:-1] > BURN_THROTTLE) & (throttle[1:] > BURN_THROTTLE) & (np.diff(mass) < 0)
+        ideal = sensed
+        drag = np.zeros(count - 1)
+    burning &= ~gaps & ~jumps
+    ideal = np.where(burning, ideal, 0.0)
+    sensed = np.where(burning, sensed, 0.0)
+    drag = np.where(burning, drag, 0.0)
+
+    # Ступени
+    stage_starts = stage_boundaries(time_s, mass, thrust)
+    stage_ends = np.concatenate((stage_starts[1:], [count]))
+    interval_ends = np.minimum(stage_ends, count - 1)
+    stage_dv = _sums(ideal, np.minimum(stage_starts, count - 2), interval_ends)
+    stage_burn_time = _sums(np.where(burning, dt, 0.0), np.minimum(stage_starts, count - 2), interval_ends)
+    stages = [{
+        'index': i,
+        'start_s': float(time_s[start]),
+        'end_s': float(time_s[end - 1]),
+        'start_mass': float(mass[start]),
+        'end_mass': float(mass[end - 1]),
+        'dv': float(stage_dv[i]),
+        'burn_time_s': float(stage_burn_time[i]),
+    } for i, (start, end) in enumerate(zip(stage_starts, stage_ends))]
+
+    # Импульсы
+    burn_starts, burn_ends = _segments(burning)
+    burn_dv = _sums(ideal, burn_starts, burn_ends)
+    burn_sensed = _sums(sensed, burn_starts, burn_ends)
+    burn_drag = _sums(drag, burn_starts, burn_ends)
+    useful = np.abs(speed[burn_ends] - speed[burn_starts])
+    gravity = burn_sensed - useful
+    with np.errstate(divide='ignore', invalid='ignore'):
+        efficiency = np.where(burn_dv > 0, useful / burn_dv, np.nan)
+    burn_stage = np.searchsorted(stage_starts, burn_starts, side='right') - 1
+    burns = [{
+        'index': i,
+        'stage': int(burn_stage[i]),
+        'start_s': float(time_s[start]),
+        'duration_s': float(time_s[end] - time_s[start]),
+        'dv': float(burn_dv[i]),
+        'useful_dv': float(useful[i]),
+        'gravity_loss': float(gravity[i]),
+        'drag_loss': float(burn_drag[i]) if has_thrust else None,
+        'efficiency': float(efficiency[i]),
+        'direction': 'prograde' if speed[end] >= speed[start] else 'retrograde',
+    } for i, (start, end) in enumerate(zip(burn_starts, burn_ends))]
+
+    # Max Q
+    max_q = None
+    if 'dynamic_pressure' in data and np.isfinite(dynamic_pressure).any():
+        peak = int(np.nanargmax(dynamic_pressure))
+        max_q = {'value': float(dynamic_pressure[peak]), 'time_s': float(time_s[peak])}
+        for name in ('altitude', 'mach', 'speed'):
+            if name in data:
+                max_q[name] = float(data[name][peak])
+
+    dv_total = float(burn_dv.sum())
+    return {
+        'samples': count,
+        'duration_s': float(time_s[-1] - time_s[0]),
+        'gaps': int(gaps.sum()),
+        'dv_source': 'thrust' if has_thrust else 'acceleration',
+        'dv_total': dv_total,
+        'useful_dv': float(useful.sum()),
+        'gravity_loss': float(gravity.sum()),
+        'drag_loss': float(burn_drag.sum()) if has_thrust else None,
+        'efficiency': float(useful.sum() / dv_total) if dv_total > 0 else None,
+        'stages': stages,
+        'burns': burns,
+        'max_q': max_q,
+    }
+
+
+def summary(data=None, analysis=None):
+    """
+    Плоская сводка (одно число на ключ) для сравнения сотен запусков, например
+    в results.csv batchRunner: итоги, число ступеней, max Q и дельта V каждого импульса.
+    Дельта V по ступеням — в analyze()['stages'], отдельных столбцов для них нет.
+    """
+    if analysis is None:
+        analysis = analyze(data)
+    if not analysis['stages']:
+        return {}
+    row = {key: analysis[key] for key in ('dv_total', 'useful_dv', 'gravity_loss', 'drag_loss', 'efficiency')
+           if analysis[key] is not None}
+    row['stages'] = len(analysis['stages'])
+    row['burns'] = len(analysis['burns'])
+    for burn in analysis['burns']:
+        row['dv_burn_{}'.format(burn['index'])] = burn['dv']
+    if analysis['max_q'] is not None:
+        row['max_q'] = analysis['max_q']['value']
+        row['max_q_time_s'] = analysis['max_q']['time_s']
+        if 'altitude' in analysis['max_q']:
+            row['max_q_altitude'] = analysis['max_q']['altitude']
+    return row
+
+
+def report(analysis):
+    """Таблицы ступеней и импульсов одного полёта"""
+    print(f"   {'ступень':>8}{'начало, с':>11}{'масса, т':>15}{'работа, с':>11}{'ΔV, м/с':>10}")
+    for stage in analysis['stages']:
+        masses = f"{stage['start_mass'] / 1000:.2f}→{stage['end_mass'] / 1000:.2f}"
+        print(f"   {stage['index']:>8}{stage['start_s']:>11.0f}{masses:>15}{stage['burn_time_s']:>11.1f}{stage['dv']:>10.0f}")
+    print(f"   {'импульс':>8}{'ступень':>9}{'начало, с':>11}{'длит., с':>10}{'ΔV':>8}{'полезн.':>9}"
+          f"{'гравит.':>9}{'сопрот.':>9}{'КПД':>7}")
+    for burn in analysis['burns']:
+        drag = f"{burn['drag_loss']:>9.0f}" if burn['drag_loss'] is not None else f"{'—':>9}"
+        print(f"   {burn['index']:>8}{burn['stage']:>9}{burn['start_s']:>11.0f}{burn['duration_s']:>10.1f}"
+              f"{burn['dv']:>8.0f}{burn['useful_dv']:>9.0f}{burn['gravity_loss']:>9.0f}{drag}{burn['efficiency']:>7.0%}")
+    if analysis['max_q'] is not None:
+        max_q = analysis['max_q']
+        where = f", высота {max_q['altitude']:.0f} м" if 'altitude' in max_q else ""
+        print(f"   Max Q: {max_q['value']:.0f} Па на {max_q['time_s']:.0f} с{where}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Разбор телеметрии полёта: дельта V по ступеням, потери, max Q")
+    parser.add_argument('logs', nargs='+', help="журналы телеметрии (.ktlm)")
+    parser.add_argument('--out', default=None, help="сохранить разбор всех журналов в JSON")
+    args = parser.parse_args()
+
+    from telemetryLog import TelemetryLog
+
+    results = {}
+    for path in args.logs:
+        with TelemetryLog(path) as log:
+            data = log.get_data()
+        started = time.perf_counter()
+        analysis = analyze(data)
+        elapsed = time.perf_counter() - started
+        results[path] = analysis
+        print(f"🚀 {path}: {analysis['samples']} отсчётов, разбор за {elapsed * 1000:.1f} мс")
+        if len(args.logs) == 1:
+            report(analysis)
+
+    if len(args.logs) > 1:
+        print(f"   {'журнал':<28}{'ступеней':>9}{'импульсов':>10}{'ΔV':>8}{'гравит.':>9}{'сопрот.':>9}{'КПД':>7}{'max Q':>8}")
+        for path, analysis in results.items():
+            row = summary(analysis=analysis)
+            cells = [f"{row.get(key):>{width}.0f}" if row.get(key) is not None else f"{'—':>{width}}"
+                     for key, width in (('dv_total', 8), ('gravity_loss', 9), ('drag_loss', 9))]
+            efficiency = f"{row['efficiency']:>7.0%}" if row.get('efficiency') is not None else f"{'—':>7}"
+            max_q = f"{row['max_q']:>8.0f}" if 'max_q' in row else f"{'—':>8}"
+            print(f"   {path[-28:]:<28}{row.get('stages', 0):>9}{row.get('burns', 0):>10}{''.join(cells)}{efficiency}{max_q}")
+
+    if args.out is not None:
+        with open(args.out, 'w') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+        print(f"💾 Результаты сохранены в '{args.out}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Чистые функции модели посадочного импульса (без обращений к kRPC).
+
+Единицы те же, что и в startLanding: тяга в кН, масса в тоннах,
+расход массы в т/с, скорость в м/с (вниз — отрицательная).
+"""
+import math
+from collections import namedtuple
+import numpy as np
+
+# Результат решателя: время импульса, число итераций и статус сходимости
+BurnSolution = namedtuple('BurnSolution', ['time', 'iterations', 'status'])
+
+CONVERGED = 'converged'
+NO_ROOT = 'no_root'              # тяга или расход нулевые — остановиться невозможно
+MAX_ITERATIONS = 'max_iterations'
+
+
+def burn_velocity(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, time):
+    """Скорость после time секунд работы двигателя (уравнение Циолковского с гравитацией)"""
+    return -(thrust / mass_burn_rate) * math.log1p(-mass_burn_rate * time / mass) \
+           - gravity_accel * time + initial_velocity
+
+
+def solve_burn_time(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity,
+                    tolerance=0.01, max_iterations=50):
+    """
+    Время импульса, за которое вертикальная скорость обнуляется.
+
+    v(t) выпукла и стремится к +inf при полном выгорании массы (t -> mass / mass_burn_rate),
+    поэтому корень всегда лежит в [0, mass / mass_burn_rate). Используются шаги Галлея
+    по аналитическим производным; если шаг выходит из текущей вилки — делим вилку пополам.
+    """
+    if initial_velocity > 0:
+        initial_velocity *= -1
+
+    if mass_burn_rate <= 0 or thrust <= 0:
+        return BurnSolution(math.inf, 0, NO_ROOT)
+
+    lower = 0.0
+    upper = mass / mass_burn_rate
+
+    # Начальное приближение — торможение с постоянной массой
+    accel = thrust / mass - gravity_accel
+    time = -initial_velocity / accel if accel > 0 else upper / 2
+    if not lower <= time < upper:
+        time = (lower + upper) / 2
+
+    for iteration in range(1, max_iterations + 1):
+        remaining = mass - mass_burn_rate * time
+        velocity = burn_velocity(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, time)
+        if abs(velocity) < tolerance:
+            return BurnSolution(time, iteration, CONVERGED)
+
+        if velocity < 0:
+            lower = time
+        else:
+            upper = time
+
+        # v'(t) = F / m(t) - g,  v''(t) = F * mdot / m(t)^2
+        first = thrust / remaining - gravity_accel
+        second = thrust * mass_burn_rate / remaining ** 2
+        denominator = 2 * first * first - velocity * second
+        candidate = time - 2 * velocity * first / denominator if denominator != 0 else lower
+        if not lower < candidate < upper:
+            candidate = (lower + upper) / 2
+        time = candidate
+
+    return BurnSolution(time, max_iterations, MAX_ITERATIONS)
+
+
+# =============================================================================
+# Векторные версии для сетки кандидатов (NumPy, без обращений к кораблю)
+# =============================================================================
+# Все аргументы — числа или массивы, согласованные по правилам broadcasting.
+# Начальная скорость приводится к «вниз — отрицательная», как в скалярных функциях.
+
+ThrottleChoice = namedtuple('ThrottleChoice', ['throttle', 'time', 'height'])
+
+
+def batch_velocity(time, thrust, mass, mass_burn_rate, gravity_accel, initial_velocity):
+    """Скорость после time секунд импульса для массива сценариев"""
+    initial_velocity = -np.abs(initial_velocity)
+    return -(thrust / mass_burn_rate) * np.log1p(-mass_burn_rate * time / mass) \
+           - gravity_accel * time + initial_velocity
+
+
+def batch_height(time, thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, current_height):
+    """Высота после time секунд импульса (интеграл batch_velocity) для массива сценариев"""
+    initial_velocity = -np.abs(initial_velocity)
+    fraction = 1 - mass_burn_rate * time / mass  # доля оставшейся массы
+    return current_height + initial_velocity * time - 0.5 * gravity_accel * time ** 2 \
+           + thrust * mass / mass_burn_rate ** 2 * (fraction * np.log(fraction) + 1 - fraction)
+
+
+def batch_burn_time(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity,
+                    tolerance=0.01, max_iterations=30):
+    """
+    Векторный аналог solve_burn_time: те же шаги Галлея с откатом к бисекции,
+    выполняемые сразу для всех сценариев. Сценарии без тяги или расхода получают inf.
+    """
+    thrust, mass, mass_burn_rate, gravity_accel, initial_velocity = (
+        np.asarray(a, dtype=float) for a in np.broadcast_arrays(
+            thrust, mass, mass_burn_rate, gravity_accel, initial_velocity)
+    )
+    initial_velocity = -np.abs(initial_velocity)
+    valid = (thrust > 0) & (mass_burn_rate > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lower = np.zeros_like(mass)
+        upper = np.where(valid, mass / mass_burn_rate, np.inf)
+        accel = thrust / mass - gravity_accel
+        time = np.where(accel > 0, -initial_velocity / accel, upper / 2)
+        time = np.where(valid & (time >= lower) & (time < upper), time, (lower + upper) / 2)
+
+        for _ in range(max_iterations):
+            remaining = mass - mass_burn_rate * time
+            velocity = batch_velocity(time, thrust, mass, mass_burn_rate, gravity_accel, initial_velocity)
+            done = ~valid | (np.abs(velocity) < tolerance)
+            if done.all():
+                break
+
+            below = velocity < 0
+            lower = np.where(below & ~done, time, lower)
+            upper = np.where(~below & ~done, time, upper)
+
+            first = thrust / remaining - gravity_accel
+            second = thrust * mass_burn_rate / remaining ** 2
+            candidate = time - 2 * velocity * first / (2 * first * first - velocity * second)
+            candidate = np.where((candidate > lower) & (candidate < upper), candidate, (lower + upper) / 2)
+            time = np.where(done, time, candidate)
+
+    return np.where(valid, time, np.inf)
+
+
+def best_throttle(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, current_height,
+                  throttles, target_height=2.0):
+    """
+    Выбрать из сетки throttles дроссель, при котором скорость обнулится ближе всего
+    к target_height над поверхностью. thrust и mass_burn_rate — значения на полной тяге;
+    на дросселе u обе величины масштабируются на u.
+    Если ни один кандидат не даёт конечной высоты (тяги нет), берётся наибольший дроссель.
+    """
+    throttles = np.asarray(throttles, dtype=float)
+    thrusts = thrust * throttles
+    rates = mass_burn_rate * throttles
+    times = batch_burn_time(thrusts, mass, rates, gravity_accel, initial_velocity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        heights = batch_height(times, thrusts, mass, rates, gravity_accel, initial_velocity, current_height)
+    finite = np.isfinite(heights)
+    heights = np.where(finite, heights, -np.inf)
+
+    if not finite.any():
+        # Остановиться нельзя ни на каком дросселе — минимальный был бы самым опасным выбором
+        index = int(np.argmax(throttles))
+    else:
+        index = int(np.argmin(np.abs(heights - target_height)))
+    return ThrottleChoice(float(throttles[index]), float(times[index]), float(heights[index]))
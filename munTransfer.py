@@ -1,6 +1,45 @@
-import krpc
-from time import sleep
 import math
+from controlLoop import wait_until
+from burnCutoff import BurnCutoff, energy_remaining
+
+WINDOW_LEAD = 60    # с, варп останавливается за столько до окна, затем окно уточняется
+REFINE_RATE = 20    # Гц, ожидание точного момента окна
+BURN_RATE = 20      # Гц, прогноз остатка импульса по потокам
+MUN_PERIAPSIS = 60000   # м, желаемая высота перицентра у Муны (прицельная дальность)
+AIM_ITERATIONS = 5      # уточнений апоцентра: прицельная дальность зависит от скорости подлёта
+
+def phase_angle(vessel, body, reference_frame):
+    """
+    Угол (рад, 0..2pi), на который тело опережает корабль по направлению движения корабля.
+    reference_frame — невращающаяся система центрального тела; орбиты в плоскости x-z.
+    """
+    vessel_position = vessel.position(reference_frame)
+    vessel_velocity = vessel.velocity(reference_frame)
+    body_position = body.position(reference_frame)
+    vessel_angle = math.atan2(vessel_position[2], vessel_position[0])
+    body_angle = math.atan2(body_position[2], body_position[0])
+    # Знак момента импульса: в какую сторону растёт угол atan2(z, x) при движении корабля
+    direction = 1 if vessel_position[0] * vessel_velocity[2] - vessel_position[2] * vessel_velocity[0] >= 0 else -1
+    return (direction * (body_angle - vessel_angle)) % (2 * math.pi)
+
+
+def transfer_apoapsis(mu, r_start, r_mun, mu_mun, r_periapsis):
+    """
+    Радиус апоцентра переходного эллипса, при котором корабль пройдёт мимо Муны
+    с перицентром r_periapsis, а не через её центр.
+    В апоцентре Муна догоняет корабль со скоростью v_inf; чтобы гипербола в поле Муны
+    имела перицентр r_periapsis, апоцентр смещается внутрь орбиты Муны на прицельную
+    дальность b = r_periapsis * sqrt(1 + 2 * mu_mun / (r_periapsis * v_inf^2)).
+    """
+    r_apoapsis = r_mun
+    for _ in range(AIM_ITERATIONS):
+        a_transfer = (r_start + r_apoapsis) / 2
+        v_apoapsis = math.sqrt(mu * (2 / r_apoapsis - 1 / a_transfer))
+        v_inf = math.sqrt(mu / r_mun) - v_apoapsis
+        impact = r_periapsis * math.sqrt(1 + 2 * mu_mun / (r_periapsis * v_inf ** 2))
+        r_apoapsis = r_mun - impact
+    return r_apoapsis
+
 
 def engage(vessel, space_center, connection):
     """
@@ -17,14 +56,18 @@ def engage(vessel, space_center, connection):
     mun_orbit = mun.orbit
     mun_semi_major = mun_orbit.semi_major_axis
     mun_radius = mun_orbit.radius
+    mun_periapsis = mun.equatorial_radius + MUN_PERIAPSIS
 
     # ---- Точный расчёт оптимального фазового угла ----
     r1 = vessel.orbit.radius
     r2 = mun_semi_major  # или mun_orbit.radius (оба практически равны для круговой орбиты)
     mu = vessel.orbit.body.gravitational_parameter
 
+    # Апоцентр — не центр Муны, а точка на прицельной дальности от него
+    r_aim = transfer_apoapsis(mu, r1, r2, mun.gravitational_parameter, mun_periapsis)
+
     # Период переходного эллипса (половина периода)
-    a_transfer = (r1 + r2) / 2
+    a_transfer = (r1 + r_aim) / 2
     T_transfer = math.pi * math.sqrt(a_transfer**3 / mu)
 
     # Угловая скорость Муны
@@ -39,54 +82,36 @@ def engage(vessel, space_center, connection):
 
     print(f"Оптимальный фазовый угол: {optimal_phase_angle:.2f}°")
 
-    # Ожидание нужного фазового угла
     vessel.auto_pilot.engage()
     vessel.auto_pilot.reference_frame = vessel.orbital_reference_frame
     vessel.auto_pilot.target_direction = (0.0, 1.0, 0.0)  # prograde
 
-    phase_angle = 1080.0  # начальное значение
-    prev_phase = 0.0
-    angle_decreasing = False
-
-    # Для расчёта фазового угла используем систему отсчёта Луны, чтобы не пересоздавать каждый раз
-    mun_ref_frame = mun.reference_frame
-
-    while abs(phase_angle - optimal_phase_angle) > 1.0 or not angle_decreasing:
-        # Получаем текущие радиусы орбит (могут меняться, если орбита не круговая, но для Кербина почти круговая)
-        vessel_radius = vessel.orbit.radius
-
-        # Позиции в системе отсчёта Луны
-        mun_pos = mun_orbit.position_at(space_center.ut, mun_ref_frame)
-        vessel_pos = vessel.orbit.position_at(space_center.ut, mun_ref_frame)
-
-        # Расстояние между кораблём и Луной
-        dx = mun_pos[0] - vessel_pos[0]
-        dy = mun_pos[1] - vessel_pos[1]
-        dz = mun_pos[2] - vessel_pos[2]
-        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-
-        # Фазовый угол через теорему косинусов (в радианах)
-        # Чтобы избежать ошибок округления, ограничиваем аргумент арккосинуса диапазоном [-1, 1]
-        cos_arg = (mun_radius**2 + vessel_radius**2 - distance**2) / (2 * mun_radius * vessel_radius)
-        cos_arg = max(-1.0, min(1.0, cos_arg))  # защита от выхода за пределы
-        phase_angle_rad = math.acos(cos_arg)
-        phase_angle = math.degrees(phase_angle_rad)
-
-        # Определяем тенденцию изменения угла
-        if prev_phase - phase_angle > 0:
-            angle_decreasing = True
-            # Управление ускорением времени
-            if abs(phase_angle - optimal_phase_angle) > 20:
-                space_center.rails_warp_factor = 2
-            else:
-                space_center.rails_warp_factor = 0
-        else:
-            angle_decreasing = False
-            space_center.rails_warp_factor = 4
-
-        prev_phase = phase_angle
-        print("Фазовый угол: {:.2f}".format(phase_angle))
-        sleep(0.2)  # пауза между измерениями
+    # ---- Окно перелёта: время до нужного фазового угла по средним движениям ----
+    # Обе орбиты почти круговые, поэтому фазовый угол убывает равномерно со скоростью
+    # n_корабля - n_Муны. Один варп до окна (с запасом WINDOW_LEAD), затем окно
+    # пересчитывается по свежим положениям и ожидается по потоку UT.
+    kerbin_frame = vessel.orbit.body.non_rotating_reference_frame
+    optimal_phase = math.radians(optimal_phase_angle)
+
+    def window_ut(refine=False):
+        ut = space_center.ut
+        phase = phase_angle(vessel, mun, kerbin_frame)
+        relative_motion = math.sqrt(mu / vessel.orbit.semi_major_axis**3) - omega_mun
+        remaining = (phase - optimal_phase) % (2 * math.pi)
+        if refine and remaining > math.pi:
+            remaining = 0  # после варпа окно уже чуть позади — манёвр сразу, а не через синодический период
+        wait = remaining / relative_motion
+        print("Фазовый угол: {:.2f}°, до окна {:.0f} с".format(math.degrees(phase), wait))
+        return ut + wait
+
+    target_ut = window_ut()
+    if target_ut - space_center.ut > WINDOW_LEAD:
+        space_center.warp_to(target_ut - WINDOW_LEAD)
+        target_ut = window_ut(refine=True)
+
+    ut_stream = connection.add_stream(getattr, space_center, 'ut')
+    wait_until(lambda: ut_stream() >= target_ut, REFINE_RATE, "Ожидание окна перелёта", clock=ut_stream)
+    ut_stream.remove()
 
     # Выключаем варп, если он ещё включён
     space_center.rails_warp_factor = 0
@@ -99,26 +124,17 @@ def engage(vessel, space_center, connection):
     # Текущая скорость
     v_initial = math.sqrt(GM * (2.0/r - 1.0/a_initial))
 
-    # Большая полуось переходного эллипса (от текущей орбиты до орбиты Луны)
-    a_transfer = (r + mun_radius) / 2.0
+    # Большая полуось переходного эллипса (от текущей орбиты до прицельной точки у Луны)
+    r_aim = transfer_apoapsis(GM, r, mun_radius, mun.gravitational_parameter, mun_periapsis)
+    a_transfer = (r + r_aim) / 2.0
     v_transfer = math.sqrt(GM * (2.0/r - 1.0/a_transfer))
 
     deltaV = v_transfer - v_initial
     print("Maneuver Now With DeltaV: {:.2f} m/s".format(deltaV))
 
-    # Выполнение манёвра
-    vessel.control.throttle = 1.0
-    actual_dv = 0.0
-
-    while deltaV > actual_dv:
-        sleep(0.15)
-        # Текущая скорость 
-        r = vessel.orbit.radius
-        a_current = vessel.orbit.semi_major_axis
-        v_current = math.sqrt(GM * (2.0/r - 1.0/a_current))
-        actual_dv = v_current - v_initial
-        print("DeltaV пока: {:.2f} необходимо {:.2f}".format(actual_dv, deltaV))
+    # Выполнение манёвра: до энергии переходного эллипса по потокам, конец — отсечкой по времени
+    cutoff = BurnCutoff(vessel, space_center, connection, rate=BURN_RATE)
+    cutoff.run(energy_remaining(GM, a_transfer), "Разгон к Муне")
 
-    vessel.control.throttle = 0.0
     vessel.auto_pilot.disengage()
     print("встреча с лунойстан!")
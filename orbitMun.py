@@ -1,53 +1,63 @@
-import krpc
-import time
 import math
+from controlLoop import wait_until
+from burnCutoff import BurnCutoff, burn_time, energy_remaining
+
+ALIGN_LEAD = 60     # с, варп останавливается за столько до начала импульса — время на ориентацию
+START_RATE = 20     # Гц, ожидание начала импульса по потоку UT
+BURN_RATE = 20      # Гц, прогноз остатка импульса по потокам
+
 
 def engage(vessel, space_center, connection):
     """
-    Выполняет торможение в перицентре Муны для выхода на круговую орбиту.
-    Целевая высота орбиты: 30 км над поверхностью Муны (можно изменить).
+    Выполняет торможение в перицентре Муны для выхода на круговую орбиту
+    радиусом, равным радиусу перицентра.
+    Длительность импульса считается заранее, импульс центрируется на перицентре:
+    один варп до начала импульса (с запасом ALIGN_LEAD на ориентацию),
+    затем ожидание по потоку UT и отсечка по энергии орбиты (BurnCutoff).
+    После варпа импульс планируется заново по свежей орбите. Если перицентр
+    под поверхностью Муны, торможения нет — RuntimeError.
     """
     print("Начинаем манёвр торможения для выхода на орбиту Муны...")
 
     # Параметры Муны
     mun = space_center.bodies["Mun"]
     mu_mun = mun.gravitational_parameter
-    r_mun = mun.equatorial_radius
-
-    # Целевая высота круговой орбиты (например, 30 км)
-    target_altitude = 30000  # метры
-    target_radius = r_mun + target_altitude
-
-    # Ожидаем точного момента перицентра
-    print("Ожидание перицентра...")
-    while vessel.orbit.time_to_periapsis > 2:
-        if vessel.orbit.time_to_periapsis > 60:
-            space_center.rails_warp_factor = 5
-        else:
-            space_center.rails_warp_factor = 0
-        time.sleep(0.5)
-    space_center.rails_warp_factor = 0
-    print("Вошли в перицентр.")
+    orbit = vessel.orbit
 
-    # Текущая скорость в перицентре (относительно Муны)
-    v_current = vessel.flight(mun.reference_frame).speed
-    # Радиус перицентра (расстояние до центра Муны)
-    r_peri = vessel.orbit.periapsis
+    def plan():
+        """Импульс по текущей орбите: радиус и скорости в перицентре, дельта V, длительность и начало"""
+        r_peri = orbit.periapsis
+        if r_peri <= mun.equatorial_radius:
+            raise RuntimeError("перицентр на высоте {:.0f} м — под поверхностью Муны, торможение невозможно"
+                               .format(r_peri - mun.equatorial_radius))
+        # Скорости в перицентре по vis-viva (в невращающейся системе Муны, а не во вращающейся)
+        v_peri = math.sqrt(mu_mun * (2 / r_peri - 1 / orbit.semi_major_axis))
+        # Скорость для круговой орбиты на этой высоте (vis-viva для круговой: v = sqrt(mu/r))
+        v_target = math.sqrt(mu_mun / r_peri)
+        deltaV = v_peri - v_target
+        duration = burn_time(vessel, abs(deltaV))  # без тяги 0 — импульс начнётся в перицентре
+        start_ut = space_center.ut + orbit.time_to_periapsis - duration / 2
+        return r_peri, v_peri, v_target, deltaV, duration, start_ut
 
-    # Скорость для круговой орбиты на этой высоте (vis-viva для круговой: v = sqrt(mu/r))
-    v_target = math.sqrt(mu_mun / r_peri)
+    # ---- Начало импульса: перицентр минус половина длительности ----
+    r_peri, v_peri, v_target, deltaV, duration, start_ut = plan()
+    if start_ut - space_center.ut > ALIGN_LEAD:
+        space_center.warp_to(start_ut - ALIGN_LEAD)
+        # Пока летели, время до перицентра и масса могли уйти — план по свежей орбите
+        r_peri, v_peri, v_target, deltaV, duration, start_ut = plan()
 
     # Потребная дельта V (торможение)
-    deltaV = v_current - v_target
-    if deltaV < 0:
+    retrograde = deltaV >= 0
+    if retrograde:
+        direction = (0.0, -1.0, 0.0)  # retrograde
+    else:
         print("Предупреждение: текущая скорость ниже целевой. Возможно, нужно разгоняться.")
         deltaV = abs(deltaV)
         direction = (0.0, 1.0, 0.0)  # prograde
-    else:
-        direction = (0.0, -1.0, 0.0)  # retrograde
 
-    print(f"Текущая скорость: {v_current:.1f} м/с, целевая: {v_target:.1f} м/с")
+    print(f"Скорость в перицентре: {v_peri:.1f} м/с, целевая: {v_target:.1f} м/с")
     print(f"Потребная дельта V: {deltaV:.1f} м/с")
+    print(f"Длительность импульса: {duration:.1f} с, начало за {duration / 2:.1f} с до перицентра")
 
     # Ориентация
     vessel.auto_pilot.engage()
@@ -56,18 +66,15 @@ def engage(vessel, space_center, connection):
     vessel.auto_pilot.wait()
     print("Ориентация завершена.")
 
-    # Выполнение импульса
-    vessel.control.throttle = 1.0
-    initial_speed = vessel.flight(mun.reference_frame).speed
-    achieved_dv = 0.0
+    ut_stream = connection.add_stream(getattr, space_center, 'ut')
+    wait_until(lambda: ut_stream() >= start_ut, START_RATE, "Ожидание начала торможения", clock=ut_stream)
+    ut_stream.remove()
+    space_center.rails_warp_factor = 0
 
-    while achieved_dv < deltaV:
-        time.sleep(0.1)
-        current_speed = vessel.flight(mun.reference_frame).speed
-        achieved_dv = abs(initial_speed - current_speed)
-        print(f"Набрано дельты: {achieved_dv:.1f} из {deltaV:.1f}")
+    # Выполнение импульса: до энергии круговой орбиты радиуса перицентра, конец — отсечкой по времени
+    cutoff = BurnCutoff(vessel, space_center, connection, rate=BURN_RATE)
+    cutoff.run(energy_remaining(mu_mun, r_peri, retrograde), "Торможение у Муны")
 
-    vessel.control.throttle = 0.0
     vessel.auto_pilot.disengage()
     print("Манёвр завершён. Корабль вышел на орбиту Муны.")
-    print(f"Текущие параметры: апогей {vessel.orbit.apoapsis_altitude/1000:.1f} км, перигей {vessel.orbit.periapsis_altitude/1000:.1f} км")
\ No newline at end of file
+    print(f"Текущие параметры: апогей {vessel.orbit.apoapsis_altitude/1000:.1f} км, перигей {vessel.orbit.periapsis_altitude/1000:.1f} км")
@@ -0,0 +1,247 @@
+"""
+Инструментирование RPC: сколько удалённых чтений, записей и вызовов делает каждый этап миссии.
+
+RpcProfiler.wrap_connection(connection) возвращает обёртку соединения; все объекты,
+полученные через неё (space_center, vessel, orbit, flight, ...), тоже обёрнуты.
+Каждое чтение свойства, запись и вызов метода засчитывается текущему этапу
+(profiler.phase('подъём')) и вызывающему потоку, а время ответа попадает в гистограмму.
+Чтение потоков (add_stream) — не RPC и не считается; создание потока считается вызовом.
+
+    profiler = RpcProfiler()
+    connection = profiler.wrap_connection(krpc.connect())
+    with profiler.phase('ascent'):
+        toLKO.engage(...)
+    profiler.report()
+"""
+import bisect
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+IDLE_PHASE = 'вне этапов'
+KINDS = ('read', 'write', 'call')
+
+# Границы корзин гистограммы задержек (с): 10 мкс ... 1 с, шаг 1-2-5
+LATENCY_BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 0) for m in (1, 2, 5)) + (1.0,)
+
+
+def is_remote(value):
+    """Удалённый объект kRPC (есть _object_id) или объект модели simKrpc"""
+    return getattr(value, '_object_id', None) is not None or type(value).__module__ == 'simKrpc'
+
+
+class Histogram:
+    """Счётчики по корзинам LATENCY_BUCKETS; последняя корзина — всё, что дольше 1 с"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.total += 1
+        self.sum += latency
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-й процентиль (с)"""
+        if not self.total:
+            return 0.0
+        rank = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+
+class RemoteProxy:
+    """Обёртка удалённого объекта: засчитывает каждое обращение в RpcProfiler"""
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        target, profiler = self._target, self._profiler
+        member = "{}.{}".format(type(target).__name__, name)
+        start = time.perf_counter()
+        value = getattr(target, name)
+        if isinstance(value, type):
+            # Класс (space_center.ReferenceFrame и т.п.) — локальный объект, считаем только его методы
+            return RemoteProxy(value, profiler)
+        if callable(value):
+            def call(*args, **kwargs):
+                start = time.perf_counter()
+                result = value(*map(unwrap, args), **{k: unwrap(v) for k, v in kwargs.items()})
+                profiler.record('call', member, time.perf_counter() - start)
+                return profiler.wrap(result)
+            call.__wrapped__ = value  # для add_stream(resources.amount, ...): поток получает исходный метод
+            return call
+        profiler.record('read', member, time.perf_counter() - start)
+        return profiler.wrap(value)
+
+    def __setattr__(self, name, value):
+        start = time.perf_counter()
+        setattr(self._target, name, unwrap(value))
+        self._profiler.record('write', "{}.{}".format(type(self._target).__name__, name),
+                              time.perf_counter() - start)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return "<RPC {!r}>".format(self._target)
+
+
+def unwrap(value):
+    """Исходный объект для передачи в удалённый вызов"""
+    return value._target if isinstance(value, RemoteProxy) else value
+
+
+class ProfiledConnection:
+    """Соединение: space_center обёрнут, add_stream засчитывается как вызов и получает исходные объекты"""
+
+    def __init__(self, connection, profiler):
+        self._connection = connection
+        self._profiler = profiler
+        self.space_center = profiler.wrap(connection.space_center)
+
+    def add_stream(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        func = getattr(func, '__wrapped__', func)
+        stream = self._connection.add_stream(func, *map(unwrap, args), **kwargs)
+        self._profiler.record('call', 'add_stream', time.perf_counter() - start)
+        return stream
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class RpcProfiler:
+    """
+    Счётчики RPC по (этап, поток, тип, член) и гистограммы задержек по (этап, тип).
+    Этап общий для всех потоков: обращения монитора ступеней и сборщика телеметрии
+    засчитываются тому этапу миссии, во время которого они сделаны.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phase = IDLE_PHASE
+        self._phase_started = None
+        self.counts = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+        self.phase_durations = defaultdict(float)
+
+    def wrap(self, value):
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.wrap(item) for key, item in value.items()}
+        return RemoteProxy(value, self) if is_remote(value) else value
+
+    def wrap_connection(self, connection):
+        return ProfiledConnection(connection, self)
+
+    @contextmanager
+    def phase(self, name):
+        """Засчитывать обращения этапу name (этапы не вкладываются: внутренний временно заменяет внешний)"""
+        previous = self._phase
+        self._switch(name)
+        try:
+            yield self
+        finally:
+            self._switch(previous)
+
+    def _switch(self, name):
+        now = time.perf_counter()
+        with self._lock:
+            if self._phase_started is not None:
+                self.phase_durations[self._phase] += now - self._phase_started
+            self._phase = name
+            self._phase_started = now
+
+    def record(self, kind, member, latency):
+        thread = threading.current_thread().name
+        with self._lock:
+            phase = self._phase
+            self.counts[(phase, thread, kind, member)] += 1
+            self.histograms[(phase, kind)].add(latency)
+
+    # ---- Отчёт ----
+    def summary(self, top=10):
+        """Словарь с итогами по этапам, потокам и самым частым членам"""
+        self._switch(self._phase)  # учесть время текущего этапа
+        with self._lock:
+            counts = dict(self.counts)
+            histograms = {key: histogram for key, histogram in self.histograms.items()}
+            durations = dict(self.phase_durations)
+
+        phases = {}
+        threads = defaultdict(lambda: defaultdict(int))
+        members = defaultdict(int)
+        for (phase, thread, kind, member), n in counts.items():
+            entry = phases.setdefault(phase, {kind: 0 for kind in KINDS})
+            entry[kind] += n
+            threads[thread][phase] += n
+            members[(phase, member)] += n
+
+        for phase, entry in phases.items():
+            total = sum(entry[kind] for kind in KINDS)
+            duration = durations.get(phase, 0.0)
+            merged = Histogram()
+            for kind in KINDS:
+                histogram = histograms.get((phase, kind))
+                if histogram is not None:
+                    merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                    merged.total += histogram.total
+                    merged.sum += histogram.sum
+            entry.update({
+                'total': total,
+                'duration_s': duration,
+                'per_second': total / duration if duration > 0 else None,
+                'latency_mean_ms': merged.sum / merged.total * 1000 if merged.total else 0.0,
+                'latency_p50_ms': merged.percentile(50) * 1000,
+                'latency_p99_ms': merged.percentile(99) * 1000,
+                'histogram': merged.counts,
+            })
+
+        return {
+            'buckets_s': list(LATENCY_BUCKETS),
+            'phases': phases,
+            'threads': {thread: dict(per_phase) for thread, per_phase in threads.items()},
+            'top_members': [
+                {'phase': phase, 'member': member, 'count': n}
+                for (phase, member), n in sorted(members.items(), key=lambda item: -item[1])[:top]
+            ],
+        }
+
+    def report(self, path=None, top=10):
+        """Напечатать итоги; если задан path — сохранить summary() в JSON"""
+        summary = self.summary(top)
+        print("📡 RPC по этапам:")
+        print(f"   {'этап':<20}{'чтений':>9}{'записей':>9}{'вызовов':>9}{'в сек':>9}"
+              f"{'ср., мс':>9}{'p50, мс':>9}{'p99, мс':>9}")
+        for phase, entry in summary['phases'].items():
+            rate = f"{entry['per_second']:>9.1f}" if entry['per_second'] is not None else f"{'—':>9}"
+            print(f"   {phase:<20}{entry['read']:>9}{entry['write']:>9}{entry['call']:>9}{rate}"
+                  f"{entry['latency_mean_ms']:>9.2f}{entry['latency_p50_ms']:>9.2f}{entry['latency_p99_ms']:>9.2f}")
+        print("📡 RPC по потокам:")
+        for thread, per_phase in summary['threads'].items():
+            details = ", ".join(f"{phase}: {n}" for phase, n in per_phase.items())
+            print(f"   {thread}: {sum(per_phase.values())} ({details})")
+        print("📡 Самые частые обращения:")
+        for item in summary['top_members']:
+            print(f"   {item['count']:>8}  {item['phase']:<20}{item['member']}")
+
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(summary, file, indent=2, ensure_ascii=False)
+            print(f"💾 Профиль RPC сохранён в '{path}'")
+        return summary
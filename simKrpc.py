@@ -0,0 +1,1348 @@
+"""
+Локальная замена krpc.connect для запуска миссий без KSP.
+
+Реализует то подмножество API kRPC (space_center / vessel / orbit / flight / control /
+auto_pilot / parts / add_stream), которым пользуются toLKO, munTransfer, orbitMun,
+startLanding, stageMonitor, telemetry и driver. За ним стоит простая физическая модель:
+
+- движение в плоскости экватора (ось y kRPC — ось вращения — всегда 0);
+- точечная гравитация одного тела и смена сфер действия (patched conics) Кербин <-> Муна;
+- двигатели с постоянным расходом массы, ISP линейно зависит от давления;
+- экспоненциальная атмосфера Кербина и сопротивление 0.5 * rho * v^2 * CdA;
+- без тяги и вне атмосферы — точное кеплерово движение (поэтому варп дешёвый);
+- автопилот и SAS мгновенно выставляют ориентацию.
+
+Время модели идёт в отдельном потоке в time_scale раз быстрее настенного
+(или с кратностью варпа, если она больше), а при работающих двигателях — не быстрее
+powered_time_scale (как физический варп KSP до 4x): циклы управления считают такт
+по настенным часам, и слишком крупный шаг модели ломает отсечку манёвров. Упрощения относительно kRPC: системы отсчёта, привязанные
+к кораблю, отдают скорость относительно поверхности; северные составляющие равны нулю.
+
+time_scale ограничен MAX_TIME_SCALE: на свободном полёте между выключением двигателя
+и началом манёвра модель идёт со скоростью time_scale, и при больших значениях
+миссия не успевает спланировать и начать манёвр (при 100x циркуляризация уже не
+удаётся). Большее значение урезается до MAX_TIME_SCALE с предупреждением.
+
+Использование:
+    import simKrpc
+    connection = simKrpc.connect("Connection", time_scale=20)
+"""
+import math
+import threading
+import time
+
+from enginePerformance import G0
+
+MAX_TIME_SCALE = 50.0      # наибольшее ускорение времени, при котором миссия проходит целиком
+WARP_RATES = (1, 5, 10, 50, 100, 1000, 10000, 100000)
+LIQUID_FUEL_SHARE = 0.45   # доля жидкого топлива в массе топлива (остальное — окислитель)
+UNIT_MASS = 5.0            # кг на единицу LiquidFuel/Oxidizer
+
+
+# =============================================================================
+# Вспомогательная векторная математика (2D, плоскость экватора)
+# =============================================================================
+
+def _add(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def _sub(a, b):
+    return a[0] - b[0], a[1] - b[1]
+
+
+def _scale(a, k):
+    return a[0] * k, a[1] * k
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1]
+
+
+def _norm(a):
+    return math.hypot(a[0], a[1])
+
+
+def _unit(a):
+    n = _norm(a)
+    return (a[0] / n, a[1] / n) if n > 0 else (0.0, 0.0)
+
+
+def _perp(a):
+    """Поворот на +90° (направление вращения — «восток» для радиус-вектора)"""
+    return -a[1], a[0]
+
+
+def _cross_z(omega, r):
+    """omega × r для вращения вокруг оси, перпендикулярной плоскости"""
+    return -omega * r[1], omega * r[0]
+
+
+def _to3(a):
+    """2D-вектор плоскости -> кортеж kRPC (x, y, z) с y по оси вращения"""
+    return a[0], 0.0, a[1]
+
+
+# =============================================================================
+# Кеплерово движение
+# =============================================================================
+
+class Elements:
+    """Элементы орбиты в плоскости: a, e, аргумент перицентра, направление и средняя аномалия на эпоху"""
+
+    def __init__(self, mu, r, v, epoch):
+        self.mu = mu
+        self.epoch = epoch
+        rn = _norm(r)
+        v2 = _dot(v, v)
+        h = r[0] * v[1] - r[1] * v[0]
+        self.sign = 1.0 if h >= 0 else -1.0
+        energy = v2 / 2 - mu / rn
+        self.a = -mu / (2 * energy) if energy != 0 else math.inf
+        rv = _dot(r, v)
+        ex = ((v2 - mu / rn) * r[0] - rv * v[0]) / mu
+        ey = ((v2 - mu / rn) * r[1] - rv * v[1]) / mu
+        self.e = math.hypot(ex, ey)
+        if self.e < 1e-9:
+            self.e = 0.0
+            self.omega = math.atan2(r[1], r[0])
+        else:
+            self.omega = math.atan2(ey, ex)
+        self.p = h * h / mu
+        nu = self.sign * (math.atan2(r[1], r[0]) - self.omega)
+        self.mean_anomaly = self._mean_from_true(math.atan2(math.sin(nu), math.cos(nu)))
+
+    @property
+    def hyperbolic(self):
+        return self.e >= 1
+
+    @property
+    def mean_motion(self):
+        return math.sqrt(self.mu / abs(self.a) ** 3)
+
+    @property
+    def period(self):
+        return 2 * math.pi / self.mean_motion if not self.hyperbolic else math.inf
+
+    @property
+    def periapsis(self):
+        return self.p / (1 + self.e)
+
+    @property
+    def apoapsis(self):
+        return self.a * (1 + self.e) if not self.hyperbolic else -math.inf
+
+    def _mean_from_true(self, nu):
+        e = self.e
+        if e < 1:
+            E = 2 * math.atan2(math.sqrt(1 - e) * math.sin(nu / 2), math.sqrt(1 + e) * math.cos(nu / 2))
+            return E - e * math.sin(E)
+        F = 2 * math.atanh(math.sqrt((e - 1) / (e + 1)) * math.tan(nu / 2))
+        return e * math.sinh(F) - F
+
+    def _true_from_mean(self, M):
+        e = self.e
+        if e < 1:
+            M = math.atan2(math.sin(M), math.cos(M))
+            E = M if e < 0.8 else math.pi * (1 if M >= 0 else -1)
+            for _ in range(50):
+                step = (E - e * math.sin(E) - M) / (1 - e * math.cos(E))
+                E -= step
+                if abs(step) < 1e-12:
+                    break
+            return 2 * math.atan2(math.sqrt(1 + e) * math.sin(E / 2), math.sqrt(1 - e) * math.cos(E / 2))
+        F = math.asinh(M / e)
+        for _ in range(50):
+            step = (e * math.sinh(F) - F - M) / (e * math.cosh(F) - 1)
+            F -= step
+            if abs(step) < 1e-12:
+                break
+        return 2 * math.atan(math.sqrt((e + 1) / (e - 1)) * math.tanh(F / 2))
+
+    def mean_at(self, ut):
+        return self.mean_anomaly + self.mean_motion * (ut - self.epoch)
+
+    def state_at(self, ut):
+        """Положение и скорость относительно тела в момент ut"""
+        nu = self._true_from_mean(self.mean_at(ut))
+        r = self.p / (1 + self.e * math.cos(nu))
+        angle = self.omega + self.sign * nu
+        radial = (math.cos(angle), math.sin(angle))
+        k = math.sqrt(self.mu / self.p)
+        v_radial = k * self.e * math.sin(nu)
+        v_transverse = k * (1 + self.e * math.cos(nu))
+        velocity = _add(_scale(radial, v_radial), _scale(_perp(radial), self.sign * v_transverse))
+        return _scale(radial, r), velocity
+
+    def time_to_mean(self, target):
+        """Время до ближайшего момента, когда средняя аномалия равна target (по модулю 2pi для эллипса)"""
+        M = self.mean_anomaly
+        if self.e < 1:
+            return ((target - M) % (2 * math.pi)) / self.mean_motion
+        return (target - M) / self.mean_motion
+
+    def time_to_radius(self, radius):
+        """Время до выхода на расстояние radius на удаляющейся ветви (nan, если не достигается)"""
+        if self.e == 0 or (self.e < 1 and self.apoapsis < radius) or self.periapsis > radius:
+            return math.nan
+        cos_nu = (self.p / radius - 1) / self.e
+        if abs(cos_nu) > 1:
+            return math.nan
+        return self.time_to_mean(self._mean_from_true(math.acos(cos_nu)))
+
+
+# =============================================================================
+# Небесные тела и системы отсчёта
+# =============================================================================
+
+class SimReferenceFrame:
+    """
+    Система отсчёта: начало координат, скорость начала, базис и угловая скорость.
+    kind: 'body', 'body_nonrot', 'surface', 'orbital', 'surface_velocity', 'vessel', 'hybrid'.
+    """
+
+    def __init__(self, sim, kind, owner=None, position=None, rotation=None):
+        self.sim = sim
+        self.kind = kind
+        self.owner = owner
+        self.position = position
+        self.rotation = rotation
+
+    def origin(self, ut=None):
+        """Положение и скорость начала координат в инерциальной системе Кербина"""
+        if self.kind == 'hybrid':
+            return self.position.origin(ut)
+        if self.kind in ('body', 'body_nonrot'):
+            return self.owner.state_at(ut)
+        # Системы, привязанные к кораблю: скорость начала — скорость поверхности под кораблём
+        vessel = self.owner
+        body = vessel.body
+        body_position, body_velocity = body.state_at(ut)
+        surface_velocity = _add(body_velocity, _cross_z(body.angular_velocity, vessel.r))
+        return _add(body_position, vessel.r), surface_velocity
+
+    def angular_velocity(self):
+        if self.kind == 'hybrid':
+            return self.position.angular_velocity()
+        return self.owner.angular_velocity if self.kind == 'body' else 0.0
+
+    def basis(self, ut=None):
+        """Оси x, y, z в плоскости (ось, перпендикулярная плоскости, — нулевой вектор)"""
+        zero = (0.0, 0.0)
+        if self.kind == 'hybrid':
+            return self.rotation.basis(ut)
+        if self.kind == 'body_nonrot':
+            return (1.0, 0.0), zero, (0.0, 1.0)
+        if self.kind == 'body':
+            angle = self.owner.rotation_angle(self.sim.ut if ut is None else ut)
+            return (math.cos(angle), math.sin(angle)), zero, (-math.sin(angle), math.cos(angle))
+
+        vessel = self.owner
+        up = _unit(vessel.r)
+        if self.kind == 'surface':
+            return up, zero, _perp(up)
+        if self.kind == 'orbital':
+            forward = _unit(vessel.v)
+        elif self.kind == 'surface_velocity':
+            forward = _unit(vessel.surface_velocity)
+        else:
+            forward = vessel.pointing
+        if forward == (0.0, 0.0):
+            forward = _perp(up)
+        return (forward[1], -forward[0]), forward, zero
+
+    def to_frame(self, vector, ut=None):
+        bx, by, bz = self.basis(ut)
+        return _dot(vector, bx), _dot(vector, by), _dot(vector, bz)
+
+    def from_frame(self, vector):
+        bx, by, bz = self.basis()
+        return _add(_add(_scale(bx, vector[0]), _scale(by, vector[1])), _scale(bz, vector[2]))
+
+    def position_of(self, point, ut=None):
+        origin, _ = self.origin(ut)
+        return self.to_frame(_sub(point, origin), ut)
+
+    def velocity_of(self, point, velocity, ut=None):
+        origin, origin_velocity = self.origin(ut)
+        relative = _sub(velocity, origin_velocity)
+        relative = _sub(relative, _cross_z(self.angular_velocity(), _sub(point, origin)))
+        return self.to_frame(relative, ut)
+
+
+class _ReferenceFrameFactory:
+    """Аналог space_center.ReferenceFrame (нужен только create_hybrid)"""
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def create_hybrid(self, position, rotation=None, velocity=None, angular_velocity=None):
+        return SimReferenceFrame(self.sim, 'hybrid', position=position, rotation=rotation or position)
+
+
+class SimBody:
+    """Небесное тело. Кербин неподвижен в начале координат, Муна — на круговой орбите вокруг него"""
+
+    def __init__(self, sim, name, mu, radius, soi, rotation_period, atmosphere_depth=0.0,
+                 sea_level_pressure=0.0, scale_height=1.0, parent=None, orbit_radius=0.0, phase=0.0):
+        self.sim = sim
+        self.name = name
+        self.gravitational_parameter = mu
+        self.equatorial_radius = radius
+        self.sphere_of_influence = soi
+        self.rotational_period = rotation_period
+        self.angular_velocity = 2 * math.pi / rotation_period
+        self.atmosphere_depth = atmosphere_depth
+        self.has_atmosphere = atmosphere_depth > 0
+        self.sea_level_pressure = sea_level_pressure
+        self.scale_height = scale_height
+        self.parent = parent
+        self.orbit_radius = orbit_radius
+        self.phase = phase
+        self.reference_frame = SimReferenceFrame(sim, 'body', self)
+        self.non_rotating_reference_frame = SimReferenceFrame(sim, 'body_nonrot', self)
+        self.orbit = BodyOrbit(sim, self) if parent is not None else None
+
+    def __repr__(self):
+        return "<SimBody {}>".format(self.name)
+
+    @property
+    def mass(self):
+        return self.gravitational_parameter / 6.67430e-11
+
+    @property
+    def surface_gravity(self):
+        return self.gravitational_parameter / self.equatorial_radius ** 2
+
+    def rotation_angle(self, ut):
+        return (self.angular_velocity * ut) % (2 * math.pi)
+
+    def state_at(self, ut=None):
+        """Положение и скорость центра тела в инерциальной системе Кербина"""
+        if self.parent is None:
+            return (0.0, 0.0), (0.0, 0.0)
+        ut = self.sim.ut if ut is None else ut
+        n = math.sqrt(self.parent.gravitational_parameter / self.orbit_radius ** 3)
+        angle = self.phase + n * ut
+        radial = (math.cos(angle), math.sin(angle))
+        return _scale(radial, self.orbit_radius), _scale(_perp(radial), n * self.orbit_radius)
+
+    def pressure_at(self, altitude):
+        if altitude >= self.atmosphere_depth:
+            return 0.0
+        return self.sea_level_pressure * math.exp(-max(altitude, 0.0) / self.scale_height)
+
+    def density_at(self, altitude):
+        # Изотермическая атмосфера: плотность пропорциональна давлению (1.225 кг/м³ у поверхности Кербина)
+        return self.pressure_at(altitude) / 101325 * 1.225
+
+    def position(self, frame):
+        with self.sim.lock:
+            return frame.position_of(self.state_at()[0])
+
+    def velocity(self, frame):
+        with self.sim.lock:
+            position, velocity = self.state_at()
+            return frame.velocity_of(position, velocity)
+
+
+# =============================================================================
+# Орбиты
+# =============================================================================
+
+class _OrbitBase:
+    """Общие свойства орбиты по элементам; наследники задают тело и элементы"""
+
+    def _elements(self):
+        raise NotImplementedError
+
+    @property
+    def apoapsis(self):
+        return self._elements().apoapsis
+
+    @property
+    def periapsis(self):
+        return self._elements().periapsis
+
+    @property
+    def apoapsis_altitude(self):
+        return self.apoapsis - self.body.equatorial_radius
+
+    @property
+    def periapsis_altitude(self):
+        return self.periapsis - self.body.equatorial_radius
+
+    @property
+    def semi_major_axis(self):
+        return self._elements().a
+
+    @property
+    def eccentricity(self):
+        return self._elements().e
+
+    @property
+    def inclination(self):
+        return 0.0
+
+    @property
+    def period(self):
+        return self._elements().period
+
+    @property
+    def time_to_apoapsis(self):
+        elements = self._elements()
+        return elements.time_to_mean(math.pi) if not elements.hyperbolic else math.inf
+
+    @property
+    def time_to_periapsis(self):
+        return self._elements().time_to_mean(0.0)
+
+    def position_at(self, ut, reference_frame):
+        with self.sim.lock:
+            position, _ = self._elements().state_at(ut)
+            body_position, _ = self.body.state_at(ut)
+            return reference_frame.position_of(_add(body_position, position), ut)
+
+
+class BodyOrbit(_OrbitBase):
+    """Круговая орбита Муны"""
+
+    def __init__(self, sim, body):
+        self.sim = sim
+        self._body = body
+        position, velocity = body.state_at(0.0)
+        self._fixed = Elements(body.parent.gravitational_parameter, position, velocity, 0.0)
+
+    @property
+    def body(self):
+        return self._body.parent
+
+    def _elements(self):
+        return self._fixed
+
+    @property
+    def radius(self):
+        return self._body.orbit_radius
+
+    @property
+    def speed(self):
+        return math.sqrt(self.body.gravitational_parameter / self.radius)
+
+    @property
+    def time_to_soi_change(self):
+        return math.nan
+
+    @property
+    def next_orbit(self):
+        return None
+
+
+class FixedOrbit(_OrbitBase):
+    """Орбита, заданная элементами на эпоху (next_orbit)"""
+
+    def __init__(self, sim, body, elements):
+        self.sim = sim
+        self.body = body
+        self._fixed = elements
+
+    def _elements(self):
+        # Времена до апсид считаются от начала участка (эпохи), как у next_orbit в KSP
+        return self._fixed
+
+    @property
+    def time_to_soi_change(self):
+        return math.nan
+
+    @property
+    def next_orbit(self):
+        return None
+
+
+class VesselOrbit(_OrbitBase):
+    """Текущая орбита корабля (пересчитывается по состоянию при каждом обращении)"""
+
+    def __init__(self, sim, vessel):
+        self.sim = sim
+        self.vessel = vessel
+
+    @property
+    def body(self):
+        return self.vessel.body
+
+    def _elements(self):
+        vessel = self.vessel
+        return Elements(vessel.body.gravitational_parameter, vessel.r, vessel.v, self.sim.ut)
+
+    @property
+    def radius(self):
+        return _norm(self.vessel.r)
+
+    @property
+    def speed(self):
+        return _norm(self.vessel.v)
+
+    @property
+    def time_to_soi_change(self):
+        with self.sim.lock:
+            change = self.sim.predict_soi_change(self.vessel)
+            return change[0] if change else math.nan
+
+    @property
+    def next_orbit(self):
+        with self.sim.lock:
+            change = self.sim.predict_soi_change(self.vessel)
+            if not change:
+                return None
+            dt, body, position, velocity = change
+            return FixedOrbit(self.sim, body, Elements(body.gravitational_parameter, position, velocity,
+                                                        self.sim.ut + dt))
+
+
+# =============================================================================
+# Корабль: части, двигатели, ресурсы, управление
+# =============================================================================
+
+class SimPart:
+    def __init__(self, name, title, stage, decouple_stage, mass):
+        self.name = name
+        self.title = title
+        self.stage = stage
+        self.decouple_stage = decouple_stage
+        self.mass = mass
+
+
+class SimEngine:
+    """Двигатель с постоянным расходом массы; ISP линейно зависит от давления (в атм)"""
+
+    def __init__(self, sim, section, spec, decouple_stage):
+        self.sim = sim
+        self.section = section
+        self.part = SimPart(spec['name'], spec.get('title', spec['name']), spec['stage'], decouple_stage,
+                            spec.get('mass', 0.0))
+        self.max_vacuum_thrust = spec['max_vacuum_thrust']
+        self.vacuum_specific_impulse = spec['vacuum_isp']
+        self.kerbin_sea_level_specific_impulse = spec['sea_level_isp']
+        self.active = False
+
+    @property
+    def has_fuel(self):
+        return self.section['fuel'] > 0
+
+    @property
+    def mass_flow(self):
+        """Расход на полной тяге (кг/с)"""
+        return self.max_vacuum_thrust / (self.vacuum_specific_impulse * G0)
+
+    def specific_impulse_at(self, pressure):
+        vacuum = self.vacuum_specific_impulse
+        return max(0.0, vacuum - (vacuum - self.kerbin_sea_level_specific_impulse) * pressure)
+
+    @property
+    def specific_impulse(self):
+        return self.specific_impulse_at(self.sim.vessel.static_pressure / 101325)
+
+    @property
+    def available_thrust(self):
+        if not (self.active and self.has_fuel):
+            return 0.0
+        return self.mass_flow * self.specific_impulse * G0
+
+    @property
+    def max_thrust(self):
+        return self.mass_flow * self.specific_impulse * G0
+
+    @property
+    def thrust(self):
+        return self.available_thrust * self.sim.vessel.control.throttle
+
+
+class SimFairing:
+    def __init__(self):
+        self.jettisoned = False
+
+    def jettison(self):
+        self.jettisoned = True
+
+
+class SimResources:
+    """Ресурсы набора секций: LiquidFuel и Oxidizer считаются из массы топлива"""
+
+    def __init__(self, sections):
+        self.sections = sections
+
+    @property
+    def names(self):
+        return ['LiquidFuel', 'Oxidizer'] if self.sections else []
+
+    def _fuel(self):
+        return sum(section['fuel'] for section in self.sections)
+
+    def amount(self, name):
+        if name == 'LiquidFuel':
+            return self._fuel() * LIQUID_FUEL_SHARE / UNIT_MASS
+        if name == 'Oxidizer':
+            return self._fuel() * (1 - LIQUID_FUEL_SHARE) / UNIT_MASS
+        return 0.0
+
+    def max(self, name):
+        capacity = sum(section['fuel_capacity'] for section in self.sections)
+        if name == 'LiquidFuel':
+            return capacity * LIQUID_FUEL_SHARE / UNIT_MASS
+        if name == 'Oxidizer':
+            return capacity * (1 - LIQUID_FUEL_SHARE) / UNIT_MASS
+        return 0.0
+
+    def has_resource(self, name):
+        return name in self.names
+
+
+class SimParts:
+    def __init__(self, vessel):
+        self.vessel = vessel
+
+    @property
+    def engines(self):
+        return [engine for section in self.vessel.sections for engine in section['engines']]
+
+    @property
+    def fairings(self):
+        return [fairing for section in self.vessel.sections for fairing in section['fairings']]
+
+    @property
+    def all(self):
+        return [engine.part for engine in self.engines]
+
+
+class SimControl:
+    def __init__(self, sim, vessel, initial_stage):
+        self.sim = sim
+        self.vessel = vessel
+        self._throttle = 0.0
+        self.current_stage = initial_stage
+        self.sas = False
+        self.rcs = False
+        self.legs = False
+        self.gear = False
+        self.antennas = False
+        self.lights = False
+
+    @property
+    def throttle(self):
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value):
+        self._throttle = min(1.0, max(0.0, float(value)))
+
+    def activate_next_stage(self):
+        with self.sim.lock:
+            if self.current_stage <= 0:
+                return []
+            self.current_stage -= 1
+            stage = self.current_stage
+            vessel = self.vessel
+            vessel.sections = [s for s in vessel.sections if s['decouple_stage'] != stage]
+            for engine in vessel.parts.engines:
+                if engine.part.stage == stage:
+                    engine.active = True
+            return []
+
+
+class SimAutoPilot:
+    """Автопилот с мгновенным выходом на заданную ориентацию"""
+
+    def __init__(self, sim, vessel):
+        self.sim = sim
+        self.vessel = vessel
+        self.engaged = False
+        self.reference_frame = vessel.surface_reference_frame
+        self._mode = None
+        self._pitch = 90.0
+        self._heading = 90.0
+        self._direction = (0.0, 1.0, 0.0)
+        self.target_roll = math.nan
+        self.error = 0.0
+
+    def engage(self):
+        self.engaged = True
+
+    def disengage(self):
+        self.engaged = False
+
+    def wait(self):
+        pass
+
+    @property
+    def target_pitch(self):
+        return self._pitch
+
+    @target_pitch.setter
+    def target_pitch(self, value):
+        self._pitch = value
+        self._mode = 'pitch_heading'
+
+    @property
+    def target_heading(self):
+        return self._heading
+
+    @target_heading.setter
+    def target_heading(self, value):
+        self._heading = value
+        self._mode = 'pitch_heading'
+
+    def target_pitch_and_heading(self, pitch, heading):
+        self._pitch = pitch
+        self._heading = heading
+        self._mode = 'pitch_heading'
+
+    @property
+    def target_direction(self):
+        return self._direction
+
+    @target_direction.setter
+    def target_direction(self, value):
+        self._direction = tuple(value)
+        self._mode = 'direction'
+
+    def desired_pointing(self):
+        """Требуемое направление оси корабля в инерциальной плоскости (None — держать текущее)"""
+        if not self.engaged or self._mode is None:
+            return None
+        if self._mode == 'direction':
+            return _unit(self.reference_frame.from_frame(self._direction))
+        up = _unit(self.vessel.r)
+        pitch = math.radians(self._pitch)
+        east = math.cos(pitch) * math.sin(math.radians(self._heading))
+        return _unit(_add(_scale(up, math.sin(pitch)), _scale(_perp(up), east)))
+
+
+class SimFlight:
+    """Полётные данные в заданной системе отсчёта"""
+
+    def __init__(self, sim, vessel, frame):
+        self.sim = sim
+        self.vessel = vessel
+        self.frame = frame
+
+    def _altitude(self):
+        return _norm(self.vessel.r) - self.vessel.body.equatorial_radius
+
+    @property
+    def mean_altitude(self):
+        return self._altitude()
+
+    @property
+    def surface_altitude(self):
+        return self._altitude()
+
+    @property
+    def bedrock_altitude(self):
+        return self._altitude()
+
+    @property
+    def elevation(self):
+        return 0.0
+
+    @property
+    def latitude(self):
+        return 0.0
+
+    @property
+    def longitude(self):
+        vessel = self.vessel
+        angle = math.atan2(vessel.r[1], vessel.r[0]) - vessel.body.rotation_angle(self.sim.ut)
+        return math.degrees(math.atan2(math.sin(angle), math.cos(angle)))
+
+    @property
+    def velocity(self):
+        with self.sim.lock:
+            vessel = self.vessel
+            body_position, body_velocity = vessel.body.state_at()
+            return self.frame.velocity_of(_add(body_position, vessel.r), _add(body_velocity, vessel.v))
+
+    @property
+    def speed(self):
+        return math.sqrt(sum(c * c for c in self.velocity))
+
+    @property
+    def vertical_speed(self):
+        return _dot(self.vessel.surface_velocity, _unit(self.vessel.r))
+
+    @property
+    def horizontal_speed(self):
+        return abs(_dot(self.vessel.surface_velocity, _perp(_unit(self.vessel.r))))
+
+    @property
+    def direction(self):
+        return self.frame.to_frame(self.vessel.pointing)
+
+    @property
+    def pitch(self):
+        up = _unit(self.vessel.r)
+        return math.degrees(math.asin(max(-1.0, min(1.0, _dot(self.vessel.pointing, up)))))
+
+    @property
+    def heading(self):
+        return 90.0 if _dot(self.vessel.pointing, _perp(_unit(self.vessel.r))) >= 0 else 270.0
+
+    @property
+    def static_pressure(self):
+        return self.vessel.static_pressure
+
+    @property
+    def static_pressure_at_msl(self):
+        return self.vessel.body.sea_level_pressure
+
+    @property
+    def atmosphere_density(self):
+        return self.vessel.body.density_at(self._altitude())
+
+    @property
+    def dynamic_pressure(self):
+        return 0.5 * self.atmosphere_density * _dot(self.vessel.surface_velocity, self.vessel.surface_velocity)
+
+    @property
+    def mach(self):
+        return _norm(self.vessel.surface_velocity) / 340.0 if self.vessel.static_pressure > 0 else 0.0
+
+    @property
+    def g_force(self):
+        return self.vessel.proper_acceleration / G0
+
+    @property
+    def drag(self):
+        return _to3(self.vessel.drag_force)
+
+    @property
+    def terminal_velocity(self):
+        density = self.atmosphere_density
+        if density <= 0:
+            return math.inf
+        weight = self.vessel.mass * self.vessel.body.gravitational_parameter / _dot(self.vessel.r, self.vessel.r)
+        return math.sqrt(2 * weight / (density * self.vessel.cd_area))
+
+
+class SimVessel:
+    """Корабль из секций (снизу вверх); каждая секция — сухая масса, топливо и двигатели"""
+
+    def __init__(self, sim, craft, body):
+        self.sim = sim
+        self.name = craft.get('name', 'Simulated vessel')
+        self.cd_area = craft.get('cd_area', 1.0)
+        self.crash_speed = craft.get('crash_speed', 12.0)
+        self.sections = []
+        for spec in craft['sections']:
+            section = {
+                'name': spec['name'],
+                'dry_mass': spec['dry_mass'],
+                'fuel': spec['fuel_mass'],
+                'fuel_capacity': spec['fuel_mass'],
+                'decouple_stage': spec['decouple_stage'],
+                'engines': [],
+                'fairings': [SimFairing() for _ in range(spec.get('fairings', 0))],
+            }
+            section['engines'] = [SimEngine(sim, section, engine, spec['decouple_stage'])
+                                  for engine in spec['engines']]
+            self.sections.append(section)
+
+        self.body = body
+        self.r = (body.equatorial_radius + craft.get('launch_altitude', 70.0), 0.0)
+        self.v = _cross_z(body.angular_velocity, self.r)
+        self.pointing = _unit(self.r)
+        self.landed = True
+        self.crashed = False
+        self.touchdown_speed = None
+        self.proper_acceleration = 0.0
+        self.drag_force = (0.0, 0.0)
+
+        self.reference_frame = SimReferenceFrame(sim, 'vessel', self)
+        self.surface_reference_frame = SimReferenceFrame(sim, 'surface', self)
+        self.orbital_reference_frame = SimReferenceFrame(sim, 'orbital', self)
+        self.surface_velocity_reference_frame = SimReferenceFrame(sim, 'surface_velocity', self)
+        self.orbit = VesselOrbit(sim, self)
+        self.parts = SimParts(self)
+        self.control = SimControl(sim, self, craft.get('initial_stage', len(craft['sections'])))
+        self.auto_pilot = SimAutoPilot(sim, self)
+
+    # ---- Производные величины ----
+    @property
+    def surface_velocity(self):
+        return _sub(self.v, _cross_z(self.body.angular_velocity, self.r))
+
+    @property
+    def static_pressure(self):
+        return self.body.pressure_at(_norm(self.r) - self.body.equatorial_radius)
+
+    @property
+    def mass(self):
+        return sum(section['dry_mass'] + section['fuel'] for section in self.sections)
+
+    @property
+    def dry_mass(self):
+        return sum(section['dry_mass'] for section in self.sections)
+
+    def _active_engines(self):
+        return [engine for engine in self.parts.engines if engine.active and engine.has_fuel]
+
+    @property
+    def thrust(self):
+        return sum(engine.thrust for engine in self._active_engines())
+
+    @property
+    def available_thrust(self):
+        return sum(engine.available_thrust for engine in self._active_engines())
+
+    @property
+    def max_thrust(self):
+        return self.available_thrust
+
+    @property
+    def max_vacuum_thrust(self):
+        return sum(engine.max_vacuum_thrust for engine in self._active_engines())
+
+    @property
+    def specific_impulse(self):
+        engines = self._active_engines()
+        flow = sum(engine.mass_flow for engine in engines)
+        return sum(engine.max_thrust for engine in engines) / (flow * G0) if flow else 0.0
+
+    @property
+    def vacuum_specific_impulse(self):
+        engines = self._active_engines()
+        flow = sum(engine.mass_flow for engine in engines)
+        return sum(engine.max_vacuum_thrust for engine in engines) / (flow * G0) if flow else 0.0
+
+    @property
+    def resources(self):
+        return SimResources(self.sections)
+
+    def resources_in_decouple_stage(self, stage, cumulative=True):
+        if cumulative:
+            return SimResources([s for s in self.sections if s['decouple_stage'] >= stage])
+        return SimResources([s for s in self.sections if s['decouple_stage'] == stage])
+
+    def flight(self, reference_frame=None):
+        return SimFlight(self.sim, self, reference_frame or self.surface_reference_frame)
+
+    def position(self, reference_frame):
+        with self.sim.lock:
+            body_position, _ = self.body.state_at()
+            return reference_frame.position_of(_add(body_position, self.r))
+
+    def velocity(self, reference_frame):
+        with self.sim.lock:
+            body_position, body_velocity = self.body.state_at()
+            return reference_frame.velocity_of(_add(body_position, self.r), _add(body_velocity, self.v))
+
+    def direction(self, reference_frame):
+        return reference_frame.to_frame(self.pointing)
+
+
+# =============================================================================
+# Потоки и соединение
+# =============================================================================
+
+class SimStream:
+    """Поток: значение вычисляется по состоянию модели при чтении; колбэки — при изменении"""
+
+    def __init__(self, sim, func, args, kwargs):
+        self.sim = sim
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self.rate = 0.0
+        self.started = True
+        self._callbacks = []
+        self._last = None
+        self.condition = threading.Condition()
+
+    def __call__(self):
+        with self.sim.lock:
+            return self._func(*self._args, **self._kwargs)
+
+    def start(self, wait=True):
+        self.started = True
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+        self.sim.watch(self)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def wait(self, timeout=None):
+        with self.condition:
+            self.condition.wait(timeout)
+
+    def remove(self):
+        self.sim.unwatch(self)
+
+    def _poll(self):
+        """Вызывается потоком модели: уведомить подписчиков, если значение изменилось"""
+        value = self()
+        if value == self._last:
+            return
+        self._last = value
+        for callback in list(self._callbacks):
+            callback(value)
+        with self.condition:
+            self.condition.notify_all()
+
+
+class SimSpaceCenter:
+    def __init__(self, sim):
+        self.sim = sim
+        self.ReferenceFrame = _ReferenceFrameFactory(sim)
+        self.g = 6.67430e-11
+
+    @property
+    def active_vessel(self):
+        return self.sim.vessel
+
+    @property
+    def bodies(self):
+        return self.sim.bodies
+
+    @property
+    def ut(self):
+        return self.sim.ut
+
+    @property
+    def rails_warp_factor(self):
+        return self.sim.warp_index
+
+    @rails_warp_factor.setter
+    def rails_warp_factor(self, value):
+        self.sim.warp_index = max(0, min(len(WARP_RATES) - 1, int(value)))
+
+    @property
+    def physics_warp_factor(self):
+        return 0
+
+    @physics_warp_factor.setter
+    def physics_warp_factor(self, value):
+        pass
+
+    @property
+    def warp_rate(self):
+        return self.sim.warp_rate
+
+    def warp_to(self, ut, max_rails_rate=100000.0, max_physics_rate=2.0):
+        self.sim.warp_to(ut)
+
+
+class SimConnection:
+    """Аналог krpc.Client: space_center, add_stream и close"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.space_center = SimSpaceCenter(sim)
+
+    def add_stream(self, func, *args, **kwargs):
+        return SimStream(self.sim, func, args, kwargs)
+
+    def close(self):
+        self.sim.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================================================
+# Модель
+# =============================================================================
+
+# Ракета по умолчанию: Skipper + баки на 18 т внизу, посадочная ступень с Terrier сверху
+DEFAULT_CRAFT = {
+    'name': 'Mun Lander (sim)',
+    'cd_area': 2.0,
+    'initial_stage': 2,
+    'sections': [
+        {'name': 'Ускоритель', 'dry_mass': 5300.0, 'fuel_mass': 18000.0, 'decouple_stage': 0,
+         'engines': [{'name': 'engineLargeSkipper', 'title': 'RE-I5 "Skipper"', 'stage': 1,
+                      'max_vacuum_thrust': 650000.0, 'vacuum_isp': 320.0, 'sea_level_isp': 280.0}]},
+        {'name': 'Посадочная ступень', 'dry_mass': 1740.0, 'fuel_mass': 2000.0, 'decouple_stage': -1,
+         'fairings': 1,
+         'engines': [{'name': 'liquidEngine3.v2', 'title': 'LV-909 "Terrier"', 'stage': 0,
+                      'max_vacuum_thrust': 60000.0, 'vacuum_isp': 345.0, 'sea_level_isp': 85.0}]},
+    ],
+}
+
+
+class Simulation:
+    """Состояние и шаг физической модели; поток модели продвигает время в фоне"""
+
+    POWERED_STEP = 0.02   # с, шаг интегрирования при тяге или в атмосфере
+    RAILS_STEP = 10.0     # с, максимальный шаг кеплерова движения
+
+    def __init__(self, craft=None, time_scale=20.0, powered_time_scale=4.0, start_ut=0.0):
+        self.lock = threading.RLock()
+        self.ut = start_ut
+        if time_scale > MAX_TIME_SCALE:
+            print(f"⚠️ time_scale {time_scale:g} больше поддерживаемого, используется {MAX_TIME_SCALE:g}")
+            time_scale = MAX_TIME_SCALE
+        self.time_scale = time_scale
+        self.powered_time_scale = powered_time_scale
+        self.warp_index = 0
+        kerbin = SimBody(self, 'Kerbin', 3.5316e12, 600000.0, 84159286.0, 21549.425,
+                         atmosphere_depth=70000.0, sea_level_pressure=101325.0, scale_height=5600.0)
+        mun = SimBody(self, 'Mun', 6.5138398e10, 200000.0, 2429559.1, 138984.38,
+                      parent=kerbin, orbit_radius=12000000.0, phase=1.7)
+        self.bodies = {'Kerbin': kerbin, 'Mun': mun}
+        self.vessel = SimVessel(self, craft or DEFAULT_CRAFT, kerbin)
+        self._watched = []
+        self._running = False
+        self._thread = None
+
+    # ---- Управление временем ----
+    @property
+    def warp_rate(self):
+        # Как в KSP: варп «на рельсах» только без тяги и вне атмосферы
+        return WARP_RATES[self.warp_index] if self._on_rails() else 1
+
+    @property
+    def scale(self):
+        """Во сколько раз модель сейчас быстрее настенного времени"""
+        if self._thrusting():
+            return min(self.time_scale, self.powered_time_scale)
+        # Варп не ускоряет модель сверх своей кратности: циклы управления видят те же шаги, что в KSP
+        return max(self.time_scale, self.warp_rate)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='simKrpc', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def watch(self, stream):
+        with self.lock:
+            if stream not in self._watched:
+                self._watched.append(stream)
+
+    def unwatch(self, stream):
+        with self.lock:
+            if stream in self._watched:
+                self._watched.remove(stream)
+
+    def _loop(self):
+        last = time.perf_counter()
+        while self._running:
+            time.sleep(0.005)
+            now = time.perf_counter()
+            target = self.ut + (now - last) * self.scale
+            last = now
+            with self.lock:
+                # Не держим блокировку дольше ~20 мс: если модель не успевает, время просто отстаёт
+                self.advance(target, wall_budget=0.02)
+            for stream in list(self._watched):
+                stream._poll()
+
+    def warp_to(self, ut):
+        with self.lock:
+            self.warp_index = 0
+            self.advance(ut)
+
+    # ---- Физика ----
+    def _thrusting(self):
+        vessel = self.vessel
+        return vessel.control.throttle > 0 and vessel.available_thrust > 0
+
+    def _on_rails(self):
+        vessel = self.vessel
+        altitude = _norm(vessel.r) - vessel.body.equatorial_radius
+        return not vessel.landed and not self._thrusting() and altitude >= vessel.body.atmosphere_depth
+
+    def advance(self, target, wall_budget=None):
+        deadline = time.perf_counter() + wall_budget if wall_budget else None
+        while self.ut < target - 1e-9:
+            remaining = target - self.ut
+            if self._on_rails():
+                self._rails_step(remaining)
+            else:
+                self._powered_step(min(remaining, self.POWERED_STEP))
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+    def _rails_step(self, remaining):
+        vessel = self.vessel
+        altitude = _norm(vessel.r) - vessel.body.equatorial_radius
+        speed = max(_norm(vessel.v), 1.0)
+        # У поверхности шаг мельчает, чтобы не «проскочить» касание
+        dt = min(remaining, self.RAILS_STEP, max(self.POWERED_STEP, 0.1 * altitude / speed))
+        elements = Elements(vessel.body.gravitational_parameter, vessel.r, vessel.v, self.ut)
+        vessel.r, vessel.v = elements.state_at(self.ut + dt)
+        vessel.proper_acceleration = 0.0
+        vessel.drag_force = (0.0, 0.0)
+        self.ut += dt
+        self._hold_attitude()
+        self._check_soi()
+        self._check_surface()
+
+    def _hold_attitude(self):
+        pointing = self.vessel.auto_pilot.desired_pointing()
+        if pointing is not None and pointing != (0.0, 0.0):
+            self.vessel.pointing = pointing
+
+    def _forces(self, r, v, mass, thrust, pointing):
+        """Ускорение (гравитация + тяга + сопротивление) и негравитационная сила"""
+        vessel = self.vessel
+        body = vessel.body
+        rn = _norm(r)
+        gravity = _scale(r, -body.gravitational_parameter / rn ** 3)
+        force = _scale(pointing, thrust)
+        density = body.density_at(rn - body.equatorial_radius)
+        drag = (0.0, 0.0)
+        if density > 0:
+            air = _sub(v, _cross_z(body.angular_velocity, r))
+            drag = _scale(air, -0.5 * density * _norm(air) * vessel.cd_area)
+            force = _add(force, drag)
+        return _add(gravity, _scale(force, 1 / mass)), force, drag
+
+    def _powered_step(self, dt):
+        vessel = self.vessel
+        self._hold_attitude()
+        throttle = vessel.control.throttle
+        engines = vessel._active_engines()
+        thrust = sum(engine.available_thrust for engine in engines) * throttle
+        mass = vessel.mass
+
+        if vessel.landed:
+            up = _unit(vessel.r)
+            weight = mass * vessel.body.surface_gravity
+            if thrust * _dot(vessel.pointing, up) <= weight:
+                # Стоим на поверхности и вращаемся вместе с телом
+                angle = vessel.body.angular_velocity * dt
+                c, s = math.cos(angle), math.sin(angle)
+                vessel.r = (vessel.r[0] * c - vessel.r[1] * s, vessel.r[0] * s + vessel.r[1] * c)
+                vessel.v = _cross_z(vessel.body.angular_velocity, vessel.r)
+                vessel.proper_acceleration = vessel.body.surface_gravity
+                self._burn(engines, throttle, dt)
+                self.ut += dt
+                return
+            vessel.landed = False
+
+        pointing = vessel.pointing
+        r, v = vessel.r, vessel.v
+
+        def derivative(position, velocity):
+            acceleration, _, _ = self._forces(position, velocity, mass, thrust, pointing)
+            return velocity, acceleration
+
+        k1 = derivative(r, v)
+        k2 = derivative(_add(r, _scale(k1[0], dt / 2)), _add(v, _scale(k1[1], dt / 2)))
+        k3 = derivative(_add(r, _scale(k2[0], dt / 2)), _add(v, _scale(k2[1], dt / 2)))
+        k4 = derivative(_add(r, _scale(k3[0], dt)), _add(v, _scale(k3[1], dt)))
+        vessel.r = _add(r, _scale(_add(_add(k1[0], _scale(k2[0], 2)), _add(_scale(k3[0], 2), k4[0])), dt / 6))
+        vessel.v = _add(v, _scale(_add(_add(k1[1], _scale(k2[1], 2)), _add(_scale(k3[1], 2), k4[1])), dt / 6))
+
+        _, force, drag = self._forces(vessel.r, vessel.v, mass, thrust, pointing)
+        vessel.proper_acceleration = _norm(force) / mass
+        vessel.drag_force = drag
+        self._burn(engines, throttle, dt)
+        self.ut += dt
+        self._check_soi()
+        self._check_surface()
+
+    def _burn(self, engines, throttle, dt):
+        for engine in engines:
+            section = engine.section
+            section['fuel'] = max(0.0, section['fuel'] - engine.mass_flow * throttle * dt)
+
+    def _check_surface(self):
+        vessel = self.vessel
+        body = vessel.body
+        if vessel.landed or _norm(vessel.r) > body.equatorial_radius:
+            return
+        speed = _norm(vessel.surface_velocity)
+        vessel.touchdown_speed = speed
+        vessel.crashed = speed > vessel.crash_speed
+        vessel.landed = True
+        vessel.r = _scale(_unit(vessel.r), body.equatorial_radius)
+        vessel.v = _cross_z(body.angular_velocity, vessel.r)
+
+    def _check_soi(self):
+        vessel = self.vessel
+        kerbin, mun = self.bodies['Kerbin'], self.bodies['Mun']
+        mun_position, mun_velocity = mun.state_at(self.ut)
+        if vessel.body is kerbin:
+            relative = _sub(vessel.r, mun_position)
+            if _norm(relative) < mun.sphere_of_influence:
+                vessel.body = mun
+                vessel.r = relative
+                vessel.v = _sub(vessel.v, mun_velocity)
+        elif _norm(vessel.r) > mun.sphere_of_influence:
+            vessel.body = kerbin
+            vessel.r = _add(vessel.r, mun_position)
+            vessel.v = _add(vessel.v, mun_velocity)
+
+    def predict_soi_change(self, vessel):
+        """(время, новое тело, положение, скорость) ближайшей смены сферы действия по текущей орбите"""
+        kerbin, mun = self.bodies['Kerbin'], self.bodies['Mun']
+        elements = Elements(vessel.body.gravitational_parameter, vessel.r, vessel.v, self.ut)
+
+        if vessel.body is mun:
+            dt = elements.time_to_radius(mun.sphere_of_influence)
+            if math.isnan(dt):
+                return None
+            position, velocity = elements.state_at(self.ut + dt)
+            mun_position, mun_velocity = mun.state_at(self.ut + dt)
+            return dt, kerbin, _add(position, mun_position), _add(velocity, mun_velocity)
+
+        if not elements.hyperbolic and elements.apoapsis < mun.orbit_radius - mun.sphere_of_influence:
+            return None
+        horizon = elements.period if not elements.hyperbolic else 10 * 86400.0
+
+        def inside(dt):
+            position, _ = elements.state_at(self.ut + dt)
+            mun_position, _ = mun.state_at(self.ut + dt)
+            return _norm(_sub(position, mun_position)) < mun.sphere_of_influence
+
+        samples = 2000
+        previous = 0.0
+        for i in range(1, samples + 1):
+            dt = horizon * i / samples
+            if inside(dt):
+                low, high = previous, dt
+                for _ in range(40):
+                    middle = (low + high) / 2
+                    if inside(middle):
+                        high = middle
+                    else:
+                        low = middle
+                position, velocity = elements.state_at(self.ut + high)
+                mun_position, mun_velocity = mun.state_at(self.ut + high)
+                return high, mun, _sub(position, mun_position), _sub(velocity, mun_velocity)
+            previous = dt
+        return None
+
+    def outcome(self):
+        """Итог полёта для сравнения прогонов"""
+        with self.lock:
+            vessel = self.vessel
+            orbit = vessel.orbit
+            return {
+                'ut': self.ut,
+                'body': vessel.body.name,
+                'landed': vessel.landed,
+                'crashed': vessel.crashed,
+                'touchdown_speed': vessel.touchdown_speed,
+                'mass': vessel.mass,
+                'fuel': sum(section['fuel'] for section in vessel.sections),
+                'apoapsis_altitude': orbit.apoapsis_altitude,
+                'periapsis_altitude': orbit.periapsis_altitude,
+            }
+
+
+def connect(name=None, address=None, rpc_port=None, stream_port=None, craft=None,
+            time_scale=20.0, powered_time_scale=4.0):
+    """Аналог krpc.connect: создать модель, запустить её поток и вернуть соединение"""
+    simulation = Simulation(craft, time_scale, powered_time_scale)
+    simulation.start()
+    return SimConnection(simulation)
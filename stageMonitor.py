@@ -1,4 +1,5 @@
-import krpc
+import asyncio
+import threading
 from time import sleep
 
 def monitor(vessel):
@@ -39,4 +40,190 @@ def monitor(vessel):
             print()
 
         # Небольшая пауза, чтобы не нагружать процессор частыми проверками
-        sleep(0.2)
\ No newline at end of file
+        sleep(0.2)
+
+
+# =============================================================================
+# Событийный монитор ступеней
+# =============================================================================
+
+class ResourceDepleted:
+    """Правило: ступень пуста, когда закончились ресурсы (mode=all — все, any — хотя бы один)"""
+
+    def __init__(self, *resources, mode=all):
+        self.resources = resources
+        self.mode = mode
+
+    def triggered(self, monitor):
+        return self.mode(monitor.amounts[name] <= 0 for name in self.resources)
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(self.resources))
+
+
+class ThrustDrop:
+    """Правило: доступная тяга упала ниже fraction от максимума на этой ступени (выгорание ускорителей)"""
+
+    def __init__(self, fraction=0.1):
+        self.fraction = fraction
+        self.resources = ()
+
+    def triggered(self, monitor):
+        return monitor.peak_thrust > 0 and monitor.available_thrust < self.fraction * monitor.peak_thrust
+
+    def __repr__(self):
+        return "ThrustDrop({})".format(self.fraction)
+
+
+# Готовые правила: FUEL повторяет проверку monitor() (твёрдое и жидкое топливо)
+FUEL = ResourceDepleted("SolidFuel", "LiquidFuel")
+OXIDIZER = ResourceDepleted("Oxidizer")
+MONOPROP = ResourceDepleted("MonoPropellant")
+
+
+class StageMonitor:
+    """
+    Событийная замена monitor(): вместо опроса раз в 0.2 с подписывается на потоки
+    ресурсов ступени, которая отделится следующей (current_stage - 1), и переподписывается
+    только при смене ступени. Колбэки потоков лишь будят рабочий поток, а правила
+    проверяются и ступень активируется в нём — в пределах одного обновления потока.
+
+    rules — словарь {номер текущей ступени: [правила]}; для остальных ступеней
+    действует default_rules. Ступень активируется, если сработало любое правило.
+    На ступени 0 активировать нечего — монитор ждёт остановки (stop()).
+
+    Вместо своего потока монитор может работать задачей asyncio (run_async()):
+    колбэки потоков тогда будят задачу, а остановка — отменой задачи.
+    """
+
+    def __init__(self, vessel, connection, rules=None, default_rules=(FUEL,), start_delay=3):
+        self.vessel = vessel
+        self.connection = connection
+        self.rules = rules or {}
+        self.default_rules = tuple(default_rules)
+        self.start_delay = start_delay
+
+        self.stage = None
+        self.amounts = {}
+        self.available_thrust = 0.0
+        self.peak_thrust = 0.0
+        self.staged = []  # (номер активированной ступени, сработавшее правило)
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._stage_stream = None
+        self._streams = {}
+        self._thrust_stream = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stageMonitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Остановить монитор и удалить все его потоки"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _notify(self, _value=None):
+        self._wake.set()
+
+    # ---- Подписки ----
+    def _subscribe(self, stage):
+        """Потоки ресурсов (и тяги, если нужна) для правил ступени stage"""
+        self._unsubscribe()
+        self.stage = stage
+        self.peak_thrust = 0.0
+        if stage <= 0:
+            return
+
+        rules = self.rules.get(stage, self.default_rules)
+        resources = self.vessel.resources_in_decouple_stage(stage - 1, False)
+        names = {name for rule in rules for name in rule.resources}
+        for name in sorted(names):
+            stream = self.connection.add_stream(resources.amount, name)
+            stream.add_callback(self._notify)
+            self._streams[name] = stream
+        if any(isinstance(rule, ThrustDrop) for rule in rules):
+            self._thrust_stream = self.connection.add_stream(getattr, self.vessel, 'available_thrust')
+            self._thrust_stream.add_callback(self._notify)
+
+    def _unsubscribe(self):
+        for stream in self._streams.values():
+            stream.remove()
+        self._streams = {}
+        if self._thrust_stream is not None:
+            self._thrust_stream.remove()
+            self._thrust_stream = None
+
+    # ---- Проверка ступени ----
+    def _begin(self):
+        self._stage_stream = self.connection.add_stream(getattr, self.vessel.control, 'current_stage')
+        self._stage_stream.add_callback(self._notify)
+        self._subscribe(self._stage_stream())
+        self._notify()  # первая проверка сразу: пустая ступень (например, старт) активируется без ожидания
+
+    def _check(self):
+        """Одна проверка после пробуждения: смена ступени, правила, активация"""
+        # Номер ступени только уменьшается: более старое значение потока (ещё до нашей активации) игнорируем
+        stage = min(self._stage_stream(), self.stage)
+        if stage != self.stage:
+            self._subscribe(stage)
+        if stage <= 0:
+            return
+
+        self.amounts = {name: stream() for name, stream in self._streams.items()}
+        if self._thrust_stream is not None:
+            self.available_thrust = self._thrust_stream()
+            self.peak_thrust = max(self.peak_thrust, self.available_thrust)
+
+        rule = next((rule for rule in self.rules.get(stage, self.default_rules) if rule.triggered(self)), None)
+        if rule is None:
+            return
+        self.vessel.control.activate_next_stage()
+        self.staged.append((stage - 1, rule))
+        print()
+        print("Stage decoupled! ({})".format(rule))
+        print()
+        # Не ждём обновления потока ступени: сразу подписываемся на новую и проверяем её
+        self._subscribe(self.vessel.control.current_stage)
+        self._notify()
+
+    def _end(self):
+        self._unsubscribe()
+        if self._stage_stream is not None:
+            self._stage_stream.remove()
+            self._stage_stream = None
+
+    # ---- Рабочий поток ----
+    def _run(self):
+        if self._stopped.wait(self.start_delay):
+            return
+        self._begin()
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            self._check()
+        self._end()
+
+    # ---- Задача asyncio ----
+    async def run_async(self):
+        """Тот же монитор задачей asyncio; останавливается отменой задачи"""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        # Колбэки потоков приходят из потока kRPC — будим задачу через цикл событий
+        self._notify = lambda _value=None: loop.call_soon_threadsafe(wake.set)
+        await asyncio.sleep(self.start_delay)
+        self._begin()
+        try:
+            while True:
+                await wake.wait()
+                wake.clear()
+                self._check()
+        finally:
+            self._end()
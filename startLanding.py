@@ -1,10 +1,13 @@
-import krpc
 import time as t
-import msgpack
-import _thread as thread
-import matplotlib.pyplot as plt
-from math import log, acos
+from math import log
 import math
+import numpy as np
+from landingMath import solve_burn_time, best_throttle, CONVERGED
+from enginePerformance import EngineCache, engine_mass_flow, isp_ratio_table, interpolate_isp_ratio, VACUUM_ISP_RATIO
+from controlLoop import ControlLoop, wait_until
+
+ENTRY_RATE = 10     # Гц, цикл входного импульса
+LANDING_RATE = 25   # Гц, циклы подхода и торможения при посадке
 
 def entryBurn(vessel, space_center):
     """T30 Reliant Engine: Burns 8.68 oxidizer and 7.11 fuel per second at max throttle
@@ -32,13 +35,12 @@ def entryBurn(vessel, space_center):
     t_vals = []
     acceleration_vals = []
 
-    while vessel.available_thrust == 0:
-        pass
+    wait_until(lambda: vessel.available_thrust > 0, ENTRY_RATE, "Ожидание тяги")
     initial_ut = space_center.ut
 
-
-
-    while vessel.available_thrust > 0:
+    def entry_step():
+        if vessel.available_thrust <= 0:
+            return True
 
         time = 0
         mass = vessel.mass
@@ -62,7 +64,9 @@ def entryBurn(vessel, space_center):
         #t_vals.append(curr_ut - initial_ut)
         #acceleration_vals.append(f_net/mass)
 
-        #t.sleep(0.02)
+    entry = ControlLoop(ENTRY_RATE, "Входной импульс")
+    entry.run(entry_step)
+    entry.report()
 
     '''with open("acceleration.csv", 'w+') as file:
         for i in range(len(t_vals)):
@@ -72,23 +76,89 @@ def entryBurn(vessel, space_center):
 
 '''EVERYTHING BELOW HERE IS DONE'''
 
+class VesselState:
+    """
+    Снимок состояния корабля для горячего цикла посадки.
+
+    Быстро меняющиеся величины (масса, тяга, скорость, высота, ориентация, дроссель)
+    приходят из потоков kRPC, поэтому refresh() не делает удалённых вызовов.
+    Параметры небесного тела читаются один раз, а величины, зависящие от двигателей,
+    берутся из EngineCache: расход массы пересчитывается только при смене ступени
+    или выгорании двигателя, отношение ISP — каждый такт по таблице давления.
+    """
+
+    def __init__(self, vessel, space_center, connection, reference_frame=None):
+        self.vessel = vessel
+        self.body = vessel.orbit.body
+        self.surface_gravity = self.body.surface_gravity
+
+        if reference_frame is None:
+            # Начало координат в центре тела, оси повёрнуты как у поверхности: velocity[0] — вертикаль
+            reference_frame = space_center.ReferenceFrame.create_hybrid(
+                position=self.body.reference_frame, rotation=vessel.surface_reference_frame
+            )
+        self.reference_frame = reference_frame
+        self.flight = vessel.flight(reference_frame)
+        surface_flight = vessel.flight(vessel.surface_reference_frame)
+
+        self._streams = {
+            'mass': connection.add_stream(getattr, vessel, 'mass'),
+            'max_vacuum_thrust': connection.add_stream(getattr, vessel, 'max_vacuum_thrust'),
+            'velocity': connection.add_stream(getattr, self.flight, 'velocity'),
+            'surface_altitude': connection.add_stream(getattr, self.flight, 'surface_altitude'),
+            'direction': connection.add_stream(getattr, surface_flight, 'direction'),
+            'throttle': connection.add_stream(getattr, vessel.control, 'throttle'),
+            'static_pressure': connection.add_stream(getattr, self.flight, 'static_pressure'),
+        }
+        self.engine_cache = EngineCache(vessel, connection)
+
+        self.stage = None
+        self.isp_ratio = 0
+        self.mass_burn_rate = 0
+        self.refresh()
+
+    def refresh(self):
+        """Обновить снимок из потоков (вызывать один раз за такт управления)"""
+        streams = self._streams
+        self.mass = streams['mass']()                            # кг
+        self.max_vacuum_thrust = streams['max_vacuum_thrust']()  # Н
+        self.velocity = streams['velocity']()
+        self.vertical_speed = self.velocity[0]
+        self.surface_altitude = streams['surface_altitude']()
+        self.direction = streams['direction']()
+        self.throttle = streams['throttle']()
+        self.static_pressure = streams['static_pressure']()  # Па
+
+        cache = self.engine_cache
+        if cache.update():
+            self.stage = cache.stage
+            self.mass_burn_rate = cache.mass_burn_rate
+        self.isp_ratio = cache.isp_ratio(self.static_pressure)
+        return self
+
+    def close(self):
+        """Удалить все потоки снимка"""
+        for stream in self._streams.values():
+            stream.remove()
+        self._streams = {}
+        self.engine_cache.close()
+
+
 def begin_landing(vessel, space_center, connection):
     deployed = False
-    hybrid_frame = space_center.ReferenceFrame.create_hybrid(
-        vessel.reference_frame, rotation=vessel.orbit.body.non_rotating_reference_frame
-    )
-    current_body = vessel.orbit.body
+    time = None
+    state = VesselState(vessel, space_center, connection)
 
-    landing_reference_frame = space_center.ReferenceFrame.create_hybrid(
-        position=current_body.reference_frame, rotation=vessel.surface_reference_frame
-    )
-    flight = vessel.flight(landing_reference_frame)
-
-    while True:
+    def approach_step():
+        nonlocal deployed, time
+        state.refresh()
         # Предсказание времени и высоты касания
-        time = velocity_intercept(vessel, -flight.velocity[0])
-        height = height_intercept(vessel, time, -flight.velocity[0], flight.surface_altitude)
+        solution = burn_solution(state, -state.vertical_speed)
+        time = solution.time
+        height = height_intercept(state, time, -state.vertical_speed, state.surface_altitude)
         print("Predicted final height:", height, "with ", time, "second burn")
+        if solution.status != CONVERGED:
+            print("⚠️ Время импульса не найдено: {} ({} итераций)".format(solution.status, solution.iterations))
 
         if height < 1000 and time < 9 and not deployed:
             deployed = True
@@ -98,119 +168,99 @@ def begin_landing(vessel, space_center, connection):
         # Если прогнозируемая высота стала меньше 30 метров
         # или текущая высота меньше 500 м, а вертикальная скорость > 20 м/с (аварийный случай)
         # или прогноз отрицательный (явное запаздывание)
-        if height < 30 or (flight.surface_altitude < 500 and abs(flight.velocity[0]) > 20) or height < 0:
-            print("Начинаем торможение: высота {} м, скорость {} м/с".format(flight.surface_altitude, flight.velocity[0]))
-            break
+        if height < 30 or (state.surface_altitude < 500 and abs(state.vertical_speed) > 20) or height < 0:
+            print("Начинаем торможение: высота {} м, скорость {} м/с".format(state.surface_altitude, state.vertical_speed))
+            return True
+
+    approach = ControlLoop(LANDING_RATE, "Подход к точке торможения")
+    approach.run(approach_step)
+    approach.report()
 
     # Fire engine at max throttle
     initial_time_prediction = time
     print("FIRING ENGINE")
-    vessel.control.throttle = 1
+    throttle = 1
+    vessel.control.throttle = throttle
     t.sleep(0.1)
     initial_time = space_center.ut
-    new_time = time
+
     # Run calculations in an attempt to keep vessel on track for landing
-    while abs(flight.velocity[0]) > 1:
+    def descent_step():
+        nonlocal deployed, time, throttle
+        if abs(state.refresh().vertical_speed) <= 1:
+            return True
 
-        if flight.surface_altitude < 30:
+        if state.surface_altitude < 30:
             print("Disengaging autopilot for final touchdown...")
             vessel.auto_pilot.disengage()
 
-        time = velocity_intercept(vessel, -flight.velocity[0], 0.01, vessel.control.throttle)
-        height = height_intercept(vessel, time, -flight.velocity[0], flight.surface_altitude, vessel.control.throttle)
-
-        if height > 3.5:
-            vessel.control.throttle -= 0.005
-        elif height < 0.5:
-            vessel.control.throttle += 0.004
+        # Сразу выбираем дроссель, обнуляющий скорость у поверхности, вместо шагов по ±0.005.
+        # Дроссель храним локально, чтобы не читать его по RPC перед каждой записью
+        choice = choose_throttle(state, -state.vertical_speed, state.surface_altitude)
+        time = choice.time
+        if choice.throttle != throttle:
+            throttle = choice.throttle
+            vessel.control.throttle = throttle
 
         if time < 9 and not deployed:
             print("Deploying landing legs...")
             deployed = True
             vessel.control.legs = True
 
+    descent = ControlLoop(LANDING_RATE, "Торможение")
+    descent.run(descent_step)
+    descent.report()
+
     vessel.auto_pilot.engage()
     vessel.auto_pilot.target_pitch_and_heading(90, 90)  # Attempt to make rocket stand up straight
     vessel.control.throttle = 0
     print("Time to burn:", space_center.ut - initial_time)
     print("Expected:", initial_time_prediction)
     print()
-    print("Final height:", flight.surface_altitude)
+    print("Final height:", state.refresh().surface_altitude)
+    state.close()
     print("Landed! Exiting...")
 
-def velocity_intercept(vessel, initial_velocity, tolerance=0.01, thrust_multiplier=1):
-    current_body = vessel.orbit.body
-    if initial_velocity > 0:
-        initial_velocity *= -1
-
-    thrust = thrust_multiplier * determine_surface_isp_ratio(
-        current_body,
-        vessel.flight(current_body.reference_frame),
-        vessel.parts.engines
-    ) * (vessel.max_vacuum_thrust / 1000)
+def predictor_inputs(state, thrust_multiplier=1):
+    """Thrust (kN), gravity, mass (t) and mass burn rate (t/s) taken from a VesselState snapshot"""
+    thrust = thrust_multiplier * state.isp_ratio * (state.max_vacuum_thrust / 1000)
+    thrust = thrust * abs(state.direction[0])
+    return thrust, state.surface_gravity, state.mass / 1000, state.mass_burn_rate
 
-    direction = vessel.flight(vessel.surface_reference_frame).direction
-    multiplier = direction[0]
-    thrust = thrust * abs(multiplier)
+# Сетка кандидатов дросселя для choose_throttle (шаг как у прежней коррекции)
+THROTTLE_CANDIDATES = np.linspace(0.05, 1.0, 191)
 
-    gravity_accel = current_body.surface_gravity
-    mass = vessel.mass / 1000
-    mass_burn_rate = approximate_mass_burn_rate(vessel)
 
-    # --- ЗАЩИТА: если нет расхода, вернуть бесконечность ---
-    if mass_burn_rate <= 0:
-        return float('inf')
+def choose_throttle(state, initial_velocity, current_height, target_height=2.0):
+    """Evaluate every throttle candidate at once and pick the one that stops the vessel at target_height"""
+    thrust, gravity_accel, mass, mass_burn_rate = predictor_inputs(state)
+    return best_throttle(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, current_height,
+                         THROTTLE_CANDIDATES, target_height)
 
-    upper_bound = 92
-    lower_bound = 0
-    time = 10
-    velocity = 1
 
-    while abs(velocity) > tolerance and time > 0.0001 and time < 91.99:
-        try:
-            if mass - mass_burn_rate * time <= 0:
-                lower_bound = time
-                time = (time + upper_bound) / 2
-                continue
-            velocity = (-thrust / mass_burn_rate) * math.log(mass - mass_burn_rate * time) \
-                       - gravity_accel * time + initial_velocity + (thrust / mass_burn_rate) * math.log(mass)
-        except (ValueError, ZeroDivisionError):
-            upper_bound = time
-            time = (time + lower_bound) / 2
-            continue
-
-        if velocity < 0:
-            lower_bound = time
-            time = (time + upper_bound) / 2
-        else:
-            upper_bound = time
-            time = (time + lower_bound) / 2
+def burn_solution(state, initial_velocity, tolerance=0.01, thrust_multiplier=1):
+    """Burn time that zeroes vertical velocity, with solver iterations and convergence status"""
+    thrust, gravity_accel, mass, mass_burn_rate = predictor_inputs(state, thrust_multiplier)
+    return solve_burn_time(thrust, mass, mass_burn_rate, gravity_accel, initial_velocity, tolerance)
 
-    return time
 
+def velocity_intercept(state, initial_velocity, tolerance=0.01, thrust_multiplier=1):
+    # --- ЗАЩИТА: если нет расхода или тяги, решатель вернёт бесконечность ---
+    return burn_solution(state, initial_velocity, tolerance, thrust_multiplier).time
 
-def height_intercept(vessel, time, initial_velocity, current_height, thrust_multiplier=1):
-    current_body = vessel.orbit.body
 
-    thrust = thrust_multiplier * determine_surface_isp_ratio(
-        current_body,
-        vessel.flight(current_body.reference_frame),
-        vessel.parts.engines
-    ) * (vessel.max_vacuum_thrust / 1000)
-
-    direction = vessel.flight(vessel.surface_reference_frame).direction
-    multiplier = direction[0]
-    thrust = thrust * abs(multiplier)
-
-    gravity_accel = current_body.surface_gravity
-    mass = vessel.mass / 1000
-    mass_burn_rate = approximate_mass_burn_rate(vessel)
+def height_intercept(state, time, initial_velocity, current_height, thrust_multiplier=1):
+    thrust, gravity_accel, mass, mass_burn_rate = predictor_inputs(state, thrust_multiplier)
 
     # --- ЗАЩИТА: если нет расхода, используем упрощённую формулу ---
     if mass_burn_rate <= 0:
         print("⚠️ mass_burn_rate = 0! Используется упрощённый прогноз свободного падения.")
         return current_height - initial_velocity * time - 0.5 * gravity_accel * time**2
 
+    # --- ЗАЩИТА: без тяги остановиться невозможно, прогноз — падение ---
+    if math.isinf(time):
+        return -math.inf
+
     if initial_velocity > 0:
         initial_velocity *= -1
 
@@ -259,16 +309,14 @@ def height_intercept(vessel, time, initial_velocity, current_height, thrust_mult
         print(f"⚠️ Ошибка в основном расчёте: {e}")
         return current_height - initial_velocity * time - 0.5 * gravity_accel * time**2
 
-def velocity_function(vessel, initial_velocity, time, thrust):
+def velocity_function(state, initial_velocity, time, thrust):
     """velocity function as function of time"""
-    current_body = vessel.orbit.body
-
     if initial_velocity > 0:
         initial_velocity *= -1
 
-    gravity_accel = current_body.surface_gravity
-    mass = vessel.mass/1000
-    mass_burn_rate = approximate_mass_burn_rate(vessel)
+    gravity_accel = state.surface_gravity
+    mass = state.mass / 1000
+    mass_burn_rate = state.mass_burn_rate
     try:
         velocity = (-thrust / mass_burn_rate) * log(mass - mass_burn_rate * time) \
                    - gravity_accel * time + initial_velocity + (thrust / mass_burn_rate) * log(mass)
@@ -276,13 +324,11 @@ def velocity_function(vessel, initial_velocity, time, thrust):
         velocity = 0
     return velocity
 
-def height_function(vessel, time, initial_velocity, current_height, thrust):
+def height_function(state, time, initial_velocity, current_height, thrust):
     """height function as a function of time"""
-    current_body = vessel.orbit.body
-
-    gravity_accel = current_body.surface_gravity
-    mass = vessel.mass / 1000
-    mass_burn_rate = approximate_mass_burn_rate(vessel)
+    gravity_accel = state.surface_gravity
+    mass = state.mass / 1000
+    mass_burn_rate = state.mass_burn_rate
 
     if initial_velocity > 0:
         initial_velocity *= -1
@@ -303,53 +349,25 @@ def height_function(vessel, time, initial_velocity, current_height, thrust):
 
 
 def approximate_mass_burn_rate(vessel):
+    """Total mass burn rate (t/s) of active engines with fuel, from each engine's thrust and vacuum Isp"""
     mass_burn_rate = 0
-    engines = vessel.parts.engines
-    active_count = 0
-    for engine in engines:
+    for engine in vessel.parts.engines:
         if engine.active and engine.has_fuel:
-            active_count += 1
-            print(f"🔥 Активный двигатель: {engine.part.name}, топливо есть")
-            name = engine.part.name
-            if name == "liquidEngine":  # Reliant
-                mass_burn_rate += 0.078926
-            elif name in ["liquidEngine3.v2", "liquidEngine3"]:  # Terrier
-                mass_burn_rate += 0.017734
-            elif name == "liquidEngine2":  # Swivel
-                mass_burn_rate += 0.068512
-            else:
-                print(f"⚠️ Неизвестный двигатель {name}, добавьте его вручную")
-    if active_count == 0:
-        print("❌ Нет активных двигателей с топливом!")
+            mass_burn_rate += engine_mass_flow(engine)
     return mass_burn_rate
 
 
-def determine_surface_isp_ratio(body, flight, engines):
-    """Determines ratio of specific impulse at surface level to specific impulse in a vacuum for active engines"""
-
-    engine = None
-    isp = 0
-    for e in engines:
-        if e.active or e.available_thrust > 0:
-            engine = e
-
-    # Uses up to sixth order polynomial to approximate isp as function of pressure (very good approximation in most cases)
-    if body.has_atmosphere:
-        pressure = body.pressure_at(0) / 101325  # Convert from pascals to atm
-        if engine.part.name == "liquidEngine":
-            # Reliant Engine
-            isp = 0  # TODO: Find approximate isp function experimentally
-        elif engine.part.name == "liquidEngine3.v2" or engine.part.name == "liquidEngine3":
-            # Terrier Engine
-            if pressure < 3:
-                isp = -1.8606 * pressure**6 + 25.868 * pressure**5 - 133.61 * pressure**4 + 300.47 * pressure**3 - 202.47 * pressure**2 - 246.61 * pressure + 344.87
-            else:
-                isp = 0
-
-        elif engine.part.name == "liquidEngine2":
-            # Swivel Engine
-            isp = -0.8236 * pressure**3 + 8.534 * pressure**2 - 77.194 * pressure + 320.14
-
-        return isp / engine.vacuum_specific_impulse  # No wiggle room needed because of drag
-    else:
-        return 0.99  # Will get vacuum isp with no atmosphere, so ratio is 1 (0.99 to give a little wiggle room on landing)
\ No newline at end of file
+def determine_surface_isp_ratio(body, flight, engines, static_pressure=None):
+    """Determines ratio of specific impulse at the current static pressure to specific impulse in a vacuum for active engines"""
+    if not body.has_atmosphere:
+        return VACUUM_ISP_RATIO  # Will get vacuum isp with no atmosphere (1% wiggle room on landing)
+
+    # Isp-vs-pressure tables are taken once per engine type and averaged with vacuum thrust as weights
+    if static_pressure is None:
+        static_pressure = flight.static_pressure
+    if static_pressure <= 0:
+        return VACUUM_ISP_RATIO
+    table = isp_ratio_table([e for e in engines if e.active or e.available_thrust > 0])
+    if table is None:
+        return 0
+    return interpolate_isp_ratio(table, static_pressure)  # No wiggle room needed because of drag
@@ -0,0 +1,156 @@
+"""
+Общий реестр потоков kRPC для всех задач миссии.
+
+StreamHub подменяет соединение там, где модулям нужен только add_stream:
+одинаковые потоки (тот же метод и аргументы) создаются один раз и выдаются
+подписчикам как лёгкие дескрипторы со счётчиком ссылок. Поток удаляется
+на сервере, когда последний подписчик вызвал remove(); частота потока —
+наибольшая из запрошенных, а дескриптор без заданной частоты считается как 0
+(по умолчанию в kRPC — без ограничения). Остальные атрибуты (space_center, close, ...)
+берутся из исходного соединения.
+
+wait_for() — ожидание условия по потоку из asyncio: колбэк потока будит
+задачу, поэтому этапы передаются по событию, а не по sleep().
+"""
+import asyncio
+import threading
+
+
+class SharedStream:
+    """Дескриптор общего потока: чтение, частота, колбэки и remove() — только свои"""
+
+    def __init__(self, hub, key, entry):
+        self._hub = hub
+        self._key = key
+        self._entry = entry
+        self._rate = None
+        self._callbacks = []
+        self._removed = False
+
+    def __call__(self):
+        return self._entry['stream']()
+
+    @property
+    def rate(self):
+        return self._entry['stream'].rate
+
+    @rate.setter
+    def rate(self, value):
+        self._rate = value
+        self._hub._update_rate(self._entry)
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+        self._entry['stream'].add_callback(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+        self._entry['stream'].remove_callback(callback)
+
+    def remove(self):
+        if self._removed:
+            return
+        self._removed = True
+        for callback in self._callbacks:
+            self._entry['stream'].remove_callback(callback)
+        self._callbacks = []
+        self._hub._release(self._key, self)
+
+    def __getattr__(self, name):
+        return getattr(self._entry['stream'], name)
+
+
+class StreamHub:
+    """Потоки одного соединения, общие для регистратора, монитора ступеней, этапов и сторожей"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self.space_center = connection.space_center
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.created = 0    # сколько потоков создано на сервере
+        self.shared = 0     # сколько запросов обслужено уже открытым потоком
+
+    def add_stream(self, func, *args, **kwargs):
+        try:
+            # Метод из обёртки профилировщика каждый раз новый — ключ по исходному методу
+            key = (getattr(func, '__wrapped__', func), args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            # Нехэшируемые аргументы — отдельный поток без совместного использования
+            key = object()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {'stream': self._connection.add_stream(func, *args, **kwargs), 'handles': [],
+                         'rate': 0}  # rate — частота, действующая на сервере
+                self._entries[key] = entry
+                self.created += 1
+                shared = False
+            else:
+                self.shared += 1
+                shared = True
+            handle = SharedStream(self, key, entry)
+            entry['handles'].append(handle)
+        if shared:
+            self._update_rate(entry)  # новый подписчик без частоты снимает ограничение остальных
+        return handle
+
+    def _update_rate(self, entry):
+        with self._lock:
+            # Частота не задана — у kRPC это 0, то есть без ограничения
+            rates = [0 if handle._rate is None else handle._rate for handle in entry['handles']]
+            # 0 — без ограничения частоты, он важнее любого конечного значения
+            rate = 0 if not rates or 0 in rates else max(rates)
+            if rate != entry['rate']:
+                # Под блокировкой: одновременные изменения частоты доходят до сервера по порядку
+                entry['rate'] = rate
+                entry['stream'].rate = rate
+
+    def _release(self, key, handle):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['handles'].remove(handle)
+            last = not entry['handles']
+            if last:
+                del self._entries[key]
+        if last:
+            entry['stream'].remove()
+        else:
+            self._update_rate(entry)
+
+    def close(self):
+        """Удалить все оставшиеся потоки (соединение не закрывается)"""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            entry['stream'].remove()
+
+    async def wait_for(self, predicate, func, *args, timeout=None, **kwargs):
+        """
+        Дождаться predicate(значение потока func(*args)) без опроса: колбэк потока
+        будит задачу. Возвращает значение; по истечении timeout — asyncio.TimeoutError.
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        stream = self.add_stream(func, *args, **kwargs)
+        callback = lambda _value: loop.call_soon_threadsafe(changed.set)
+        stream.add_callback(callback)
+
+        async def until():
+            while True:
+                value = stream()
+                if predicate(value):
+                    return value
+                await changed.wait()
+                changed.clear()
+
+        try:
+            return await asyncio.wait_for(until(), timeout)
+        finally:
+            stream.remove()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
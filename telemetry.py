@@ -1,55 +1,118 @@
+import asyncio
 import threading
 import time
-import matplotlib.pyplot as plt
-import numpy as np
-import math
+from columnStore import ColumnStore
+from telemetryLog import TelemetryLogWriter
+
+# Каналы телеметрии: имя -> (источник, атрибут kRPC, множитель).
+# Источники: 'vessel', 'control', 'flight' (vessel.flight()), 'orbit' (vessel.orbit).
+CHANNEL_SOURCES = {
+    'altitude': ('flight', 'surface_altitude', 1),          # высота над поверхностью (м)
+    'vertical_speed': ('flight', 'vertical_speed', 1),      # вертикальная скорость (м/с)
+    'speed': ('flight', 'speed', 1),                        # полная скорость (м/с)
+    'mass': ('vessel', 'mass', 1),                          # масса корабля (кг)
+    'throttle': ('control', 'throttle', 1),                 # положение дросселя (0..1)
+    'apoapsis': ('orbit', 'apoapsis_altitude', 1),          # высота апогея (м)
+    'periapsis': ('orbit', 'periapsis_altitude', 1),        # высота перигея (м)
+    'dynamic_pressure': ('flight', 'dynamic_pressure', 1),  # динамическое давление Q (Па) – для атмосферы
+    'mach': ('flight', 'mach', 1),                          # число Маха
+    'acceleration': ('flight', 'g_force', 9.81),            # полное ускорение (м/с²)
+    # Дополнительные каналы, по умолчанию не записываются
+    'thrust': ('vessel', 'thrust', 1),                      # текущая тяга (Н)
+    'radius': ('orbit', 'radius', 1),                       # расстояние до центра тела (м)
+    'static_pressure': ('flight', 'static_pressure', 1),    # статическое давление (Па)
+}
+
+# Каналы, которые пишутся по умолчанию (9 графиков DataRecorder.plot)
+DEFAULT_CHANNELS = (
+    'altitude', 'vertical_speed', 'speed', 'mass', 'throttle',
+    'apoapsis', 'periapsis', 'dynamic_pressure', 'mach', 'acceleration',
+)
 
 class DataRecorder:
     """
     Сбор телеметрии на всём протяжении миссии (от старта до посадки на Муну).
+
+    Данные хранятся в ColumnStore: max_samples=None — без ограничения (начинается
+    с chunk_size и удваивается), иначе кольцевой буфер последних max_samples отсчётов.
+    Время ('time') пишется всегда, остальные каналы задаются списком channels
+    из CHANNEL_SOURCES — невыбранные каналы не запрашиваются вовсе.
+
+    Если передан connection, на каждый канал один раз создаётся поток kRPC
+    с частотой stream_rate (по умолчанию — частота сбора), и отсчёт читает
+    только кэшированные значения. Без connection каналы опрашиваются по RPC.
+
+    Если задан log_path, каждый отсчёт также дописывается в журнал на диске
+    (telemetryLog), который сбрасывается не реже чем раз в log_flush_interval секунд.
     """
-    def __init__(self, vessel, space_center, interval=0.5):
+    def __init__(self, vessel, space_center, interval=0.5, max_samples=None, chunk_size=4096,
+                 connection=None, channels=DEFAULT_CHANNELS, stream_rate=None,
+                 log_path=None, log_flush_interval=5.0):
+        unknown = [name for name in channels if name not in CHANNEL_SOURCES]
+        if unknown:
+            raise ValueError("Неизвестные каналы телеметрии: {}".format(", ".join(unknown)))
+
         self.vessel = vessel
         self.space_center = space_center
         self.interval = interval
-        self.lock = threading.Lock()
+        self.connection = connection
+        self.channels = tuple(channels)
+        self.stream_rate = stream_rate if stream_rate is not None else 1 / interval
         self.running = False
         self.thread = None
         self.start_ut = None
-
-        # Списки для данных
-        self.time = []
-        self.altitude = []           # высота над поверхностью (м)
-        self.vertical_speed = []      # вертикальная скорость (м/с)
-        self.speed = []               # полная скорость (м/с)
-        self.mass = []                # масса корабля (кг)
-        self.throttle = []            # положение дросселя (0..1)
-        self.apoapsis = []            # высота апогея (м)
-        self.periapsis = []           # высота перигея (м)
-        self.dynamic_pressure = []    # динамическое давление Q (Па) – для атмосферы
-        self.mach = []                # число Маха
-        self.acceleration = []        # полное ускорение (м/с²)
+        self.store = ColumnStore(('time',) + self.channels, chunk_size=chunk_size, max_samples=max_samples)
+        self._streams = None  # [(поток, множитель)], первый — UT
+        self.log_path = log_path
+        self.log_flush_interval = log_flush_interval
+        self.log = None
+
+    def _open_streams(self):
+        """Создать по одному потоку на канал (один раз за запись)"""
+        vessel = self.vessel
+        sources = {'vessel': vessel, 'control': vessel.control,
+                   'flight': vessel.flight(), 'orbit': vessel.orbit}
+        ut = self.connection.add_stream(getattr, self.space_center, 'ut')
+        self._streams = [(ut, 1)]
+        for name in self.channels:
+            source, attribute, scale = CHANNEL_SOURCES[name]
+            self._streams.append((self.connection.add_stream(getattr, sources[source], attribute), scale))
+        for stream, _ in self._streams:
+            stream.rate = self.stream_rate
+
+    def _close_streams(self):
+        for stream, _ in self._streams or ():
+            stream.remove()
+        self._streams = None
+
+    def _poll(self):
+        """Отсчёт без потоков: по одному RPC на канал"""
+        vessel = self.vessel
+        sources = {'vessel': vessel, 'control': vessel.control,
+                   'flight': vessel.flight(), 'orbit': vessel.orbit}
+        row = [self.space_center.ut]
+        for name in self.channels:
+            source, attribute, scale = CHANNEL_SOURCES[name]
+            row.append(getattr(sources[source], attribute) * scale)
+        return row
 
     def _record(self):
         """Сбор одного набора данных"""
+        if self.connection is not None:
+            if self._streams is None:
+                self._open_streams()
+            row = [stream() * scale for stream, scale in self._streams]
+        else:
+            row = self._poll()
+
         if self.start_ut is None:
-            self.start_ut = self.space_center.ut
-
-        flight = self.vessel.flight()
-        orbit = self.vessel.orbit
-
-        with self.lock:
-            self.time.append(self.space_center.ut - self.start_ut)
-            self.altitude.append(flight.surface_altitude)
-            self.vertical_speed.append(flight.vertical_speed)
-            self.speed.append(flight.speed)
-            self.mass.append(self.vessel.mass)
-            self.throttle.append(self.vessel.control.throttle)
-            self.apoapsis.append(orbit.apoapsis_altitude)
-            self.periapsis.append(orbit.periapsis_altitude)
-            self.dynamic_pressure.append(flight.dynamic_pressure)
-            self.mach.append(flight.mach)
-            self.acceleration.append(flight.g_force * 9.81)  # в м/с²
+            self.start_ut = row[0]
+        row[0] -= self.start_ut
+
+        # Отсчёт целиком собран — одной записью кладём в хранилище
+        self.store.append(row)
+        if self.log is not None:
+            self.log.append(row)
 
     def _loop(self):
         """Основной цикл сбора данных"""
@@ -57,121 +120,48 @@ class DataRecorder:
             self._record()
             time.sleep(self.interval)
 
-    def start(self):
-        """Запустить поток сбора данных"""
-        if self.thread is not None and self.thread.is_alive():
+    def start(self, threaded=True):
+        """Запустить сбор данных: в своём потоке или (threaded=False) без потока — отсчёты делает run_async()"""
+        if self.running:
             print("⚠️ Сбор данных уже запущен.")
             return
+        if self.log_path is not None and self.log is None:
+            self.log = TelemetryLogWriter(self.log_path, self.store.columns,
+                                          flush_interval=self.log_flush_interval)
         self.running = True
-        self.thread = threading.Thread(target=self._loop, daemon=True)
-        self.thread.start()
+        if threaded:
+            self.thread = threading.Thread(target=self._loop, name="DataRecorder", daemon=True)
+            self.thread.start()
         print("📈 Сбор телеметрии запущен (интервал {:.1f} с)".format(self.interval))
 
+    async def run_async(self):
+        """Сбор данных задачей asyncio вместо потока; после отмены задачи — stop()"""
+        self.start(threaded=False)
+        while self.running:
+            self._record()
+            await asyncio.sleep(self.interval)
+
     def stop(self):
         """Остановить поток сбора данных"""
         self.running = False
         if self.thread is not None:
             self.thread.join()
+            self.thread = None
+        self._close_streams()
+        if self.log is not None:
+            self.log.close()
+            print(f"💾 Журнал телеметрии записан в '{self.log_path}'")
+            self.log = None
         print("⏹️ Сбор телеметрии остановлен.")
 
     def get_data(self):
-        """Возвращает копию всех данных (потокобезопасно)"""
-        with self.lock:
-            return {key: val.copy() for key, val in self.__dict__.items() if key in [
-                'time', 'altitude', 'vertical_speed', 'speed', 'mass', 'throttle',
-                'apoapsis', 'periapsis', 'dynamic_pressure', 'mach', 'acceleration'
-            ]}
-
-    def plot(self, show=True, save_path='mission_telemetry.png'):
+        """Возвращает массивы всех каналов без блокировки сборщика (см. ColumnStore.snapshot)"""
+        return self.store.snapshot()
+
+    def plot(self, show=True, save_path='mission_telemetry.png', max_points=2000, method='minmax'):
         """
-        Построить 9 графиков, охватывающих всю миссию.
+        Построить 9 графиков, охватывающих всю миссию (см. telemetryPlot.plot_telemetry).
+        matplotlib загружается только здесь, при первом построении.
         """
-        data = self.get_data()
-        if not data['time']:
-            print("⚠️ Нет данных для построения графиков.")
-            return
-
-        # Красивый стиль
-        plt.style.use('seaborn-v0_8-darkgrid')
-        fig, axes = plt.subplots(3, 3, figsize=(16, 10))
-        fig.suptitle('📊 Телеметрия миссии: Кербин → Муна (посадка)', fontsize=16, fontweight='bold')
-
-        # 1. Высота над поверхностью
-        axes[0,0].plot(data['time'], data['altitude'], color='blue', linewidth=1.2)
-        axes[0,0].set_xlabel('Время (с)')
-        axes[0,0].set_ylabel('Высота (м)')
-        axes[0,0].set_title('Высота над поверхностью')
-        axes[0,0].grid(True, linestyle='--', alpha=0.7)
-        axes[0,0].fill_between(data['time'], 0, data['altitude'], alpha=0.2, color='blue')
-
-        # 2. Вертикальная скорость
-        axes[0,1].plot(data['time'], data['vertical_speed'], color='red', linewidth=1.2)
-        axes[0,1].set_xlabel('Время (с)')
-        axes[0,1].set_ylabel('Вертикальная скорость (м/с)')
-        axes[0,1].set_title('Вертикальная скорость')
-        axes[0,1].grid(True, linestyle='--', alpha=0.7)
-        axes[0,1].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
-
-        # 3. Полная скорость
-        axes[0,2].plot(data['time'], data['speed'], color='green', linewidth=1.2)
-        axes[0,2].set_xlabel('Время (с)')
-        axes[0,2].set_ylabel('Скорость (м/с)')
-        axes[0,2].set_title('Полная скорость')
-        axes[0,2].grid(True, linestyle='--', alpha=0.7)
-
-                # 4. Масса корабля
-        axes[1,0].plot(data['time'], data['mass'], color='purple', linewidth=1.2)
-        axes[1,0].set_xlabel('Время (с)')
-        axes[1,0].set_ylabel('Масса (кг)')
-        axes[1,0].set_title('Масса корабля')
-        axes[1,0].grid(True, linestyle='--', alpha=0.7)
-        axes[1,0].fill_between(data['time'], np.min(data['mass']), data['mass'], alpha=0.2, color='purple')
-
-        # 5. Тяга (дроссель)
-        axes[1,1].plot(data['time'], data['throttle'], color='orange', linewidth=1.2)
-        axes[1,1].set_xlabel('Время (с)')
-        axes[1,1].set_ylabel('Дроссель (0-1)')
-        axes[1,1].set_title('Управление тягой')
-        axes[1,1].set_ylim(-0.1, 1.1)
-        axes[1,1].grid(True, linestyle='--', alpha=0.7)
-
-        # 6. Апогей и перигей (орбитальные параметры, в км)
-        axes[1,2].plot(data['time'], np.array(data['apoapsis'])/1000, label='Апогей', color='darkblue', linewidth=1.2)
-        axes[1,2].plot(data['time'], np.array(data['periapsis'])/1000, label='Перигей', color='darkgreen', linewidth=1.2)
-        axes[1,2].set_xlabel('Время (с)')
-        axes[1,2].set_ylabel('Высота (км)')
-        axes[1,2].set_title('Орбитальные параметры')
-        axes[1,2].grid(True, linestyle='--', alpha=0.7)
-        axes[1,2].legend()
-
-        # 7. Динамическое давление Q (атмосфера)
-        axes[2,0].plot(data['time'], data['dynamic_pressure'], color='brown', linewidth=1.2)
-        axes[2,0].set_xlabel('Время (с)')
-        axes[2,0].set_ylabel('Q (Па)')
-        axes[2,0].set_title('Динамическое давление')
-        axes[2,0].grid(True, linestyle='--', alpha=0.7)
-
-        # 8. Число Маха
-        axes[2,1].plot(data['time'], data['mach'], color='magenta', linewidth=1.2)
-        axes[2,1].set_xlabel('Время (с)')
-        axes[2,1].set_ylabel('Число Маха')
-        axes[2,1].set_title('Число Маха')
-        axes[2,1].grid(True, linestyle='--', alpha=0.7)
-
-        # 9. Ускорение (перегрузка)
-        axes[2,2].plot(data['time'], data['acceleration'], color='gray', linewidth=1.2)
-        axes[2,2].set_xlabel('Время (с)')
-        axes[2,2].set_ylabel('Ускорение (м/с²)')
-        axes[2,2].set_title('Полное ускорение')
-        axes[2,2].grid(True, linestyle='--', alpha=0.7)
-
-        plt.tight_layout(rect=[0, 0, 1, 0.96])
-
-        if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight')
-            print(f"💾 Графики сохранены в '{save_path}'")
-
-        if show:
-            plt.show()
-        else:
-            plt.close()
\ No newline at end of file
+        from telemetryPlot import plot_telemetry
+        plot_telemetry(self.get_data(), show, save_path, max_points, method)
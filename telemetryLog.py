@@ -0,0 +1,188 @@
+"""
+Журнал телеметрии на диске: только дозапись, колонки блоками.
+
+Формат файла (все числа little-endian):
+    заголовок:  b'KTLM', версия (u16), число каналов (u16), длина имён (u32),
+                имена каналов через '\\n' (UTF-8), выравнивание нулями до 8 байт
+    блок:       b'CHNK', число отсчётов n (u32), CRC32 данных (u32), резерв (u32),
+                затем float64[каналы][n] — каждый канал подряд
+
+Блок пишется одним вызовом write и сбрасывается на диск, поэтому при аварийном
+завершении теряется только недописанный последний блок — читатель его отбрасывает.
+Готовый журнал открывается через mmap: блоки отдаются представлениями без копирования,
+а column() собирает в память только запрошенный канал. Для графиков decimated()
+прореживает каждый блок прямо из mmap (downsample.minmax), не собирая каналы целиком.
+"""
+import mmap
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from downsample import minmax
+
+MAGIC = b'KTLM'
+VERSION = 1
+CHUNK_MAGIC = b'CHNK'
+_HEADER = struct.Struct('<4sHHI')
+_CHUNK_HEADER = struct.Struct('<4sIII')
+
+
+class TelemetryLogWriter:
+    """Дозапись отсчётов в журнал блоками по chunk_size или не реже чем раз в flush_interval секунд"""
+
+    def __init__(self, path, channels, chunk_size=1024, flush_interval=5.0):
+        self.path = path
+        self.channels = tuple(channels)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self._buffer = np.empty((len(self.channels), chunk_size))
+        self._rows = 0
+        self._last_flush = time.monotonic()
+
+        names = '\n'.join(self.channels).encode('utf-8')
+        header = _HEADER.pack(MAGIC, VERSION, len(self.channels), len(names)) + names
+        header += b'\0' * (-len(header) % 8)
+        self._file = open(path, 'wb')
+        self._file.write(header)
+        self._sync()
+
+    def append(self, row):
+        """Добавить отсчёт; row — значения в порядке self.channels"""
+        self._buffer[:, self._rows] = row
+        self._rows += 1
+        if self._rows == self.chunk_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Записать накопленные отсчёты отдельным блоком и сбросить файл на диск"""
+        self._last_flush = time.monotonic()
+        if not self._rows:
+            return
+        block = np.ascontiguousarray(self._buffer[:, :self._rows]).tobytes()
+        self._file.write(_CHUNK_HEADER.pack(CHUNK_MAGIC, self._rows, zlib.crc32(block), 0) + block)
+        self._rows = 0
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class TelemetryLog:
+    """
+    Чтение журнала через mmap. Недописанный последний блок отбрасывается;
+    verify=True дополнительно проверяет CRC каждого блока (читает весь файл).
+    """
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _HEADER.size:
+            self._file.close()
+            raise ValueError("{} — пустой файл или обрезан заголовок журнала".format(path))
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_channels, names_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{} — не журнал телеметрии (версии {})".format(path, VERSION))
+        offset = _HEADER.size
+        if offset + names_length > size:
+            self.close()
+            raise ValueError("{} — обрезан заголовок журнала".format(path))
+        self.channels = tuple(bytes(self._mmap[offset:offset + names_length]).decode('utf-8').split('\n'))
+        offset += names_length
+        offset += -offset % 8
+
+        # Индекс блоков: (смещение данных, число отсчётов)
+        self._chunks = []
+        while offset + _CHUNK_HEADER.size <= size:
+            magic, rows, crc, _ = _CHUNK_HEADER.unpack_from(self._mmap, offset)
+            data_offset = offset + _CHUNK_HEADER.size
+            data_length = rows * n_channels * 8
+            if magic != CHUNK_MAGIC or data_offset + data_length > size:
+                break  # блок недописан — запись прервалась
+            if verify and zlib.crc32(self._mmap[data_offset:data_offset + data_length]) != crc:
+                break
+            self._chunks.append((data_offset, rows))
+            offset = data_offset + data_length
+
+    def __len__(self):
+        return sum(rows for _, rows in self._chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def chunks(self):
+        """Блоки по порядку: словарь канал -> представление в mmap (без копирования)"""
+        for data_offset, rows in self._chunks:
+            block = np.frombuffer(self._mmap, dtype='<f8', count=rows * len(self.channels),
+                                  offset=data_offset).reshape(len(self.channels), rows)
+            yield {name: block[i] for i, name in enumerate(self.channels)}
+
+    def column(self, name):
+        """Один канал целиком (копируется только он)"""
+        if not self._chunks:
+            return np.empty(0)
+        return np.concatenate([chunk[name] for chunk in self.chunks()])
+
+    def get_data(self, channels=None):
+        """Словарь канал -> массив, как у DataRecorder.get_data"""
+        return {name: self.column(name) for name in (channels or self.channels)}
+
+    def decimated(self, channels=None, max_points=2000):
+        """
+        Словарь канал -> (время, значения) не более чем из max_points точек (minmax).
+        Каждый блок прореживается прямо из mmap до своей доли max_points; накопленные точки
+        сводятся заново, как только их больше 2 * max_points, — в памяти одновременно
+        только один блок и O(max_points) точек на канал. Каналов, которых нет в журнале,
+        нет и в ответе.
+        """
+        names = [name for name in (channels or self.channels) if name in self.channels and name != 'time']
+        pending = {name: [] for name in names}
+        counts = dict.fromkeys(names, 0)
+
+        def reduce(name):
+            x, y = minmax(np.concatenate([p[0] for p in pending[name]]),
+                          np.concatenate([p[1] for p in pending[name]]), max_points)
+            pending[name] = [(x, y)]
+            counts[name] = len(y)
+
+        total = len(self)
+        for chunk in self.chunks():
+            # Блоку — доля точек по его доле отсчётов: весь журнал укладывается примерно в max_points
+            budget = max(4, -(-max_points * len(chunk['time']) // total))
+            for name in names:
+                x, y = minmax(chunk['time'], chunk[name], budget)
+                pending[name].append((x.copy(), y.copy()))  # копия: представления держали бы mmap открытым
+                counts[name] += len(y)
+                if counts[name] > 2 * max_points:
+                    reduce(name)
+
+        series = {}
+        for name in names:
+            if pending[name]:
+                reduce(name)
+                series[name] = pending[name][0]
+            else:
+                series[name] = (np.empty(0), np.empty(0))
+        return series
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # ещё живы представления из chunks() — mmap закроется вместе с ними
+        self._file.close()
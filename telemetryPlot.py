@@ -0,0 +1,160 @@
+"""
+Графики телеметрии миссии (matplotlib).
+
+Вынесены из telemetry, чтобы сбор телеметрии и управляющие модули не загружали
+matplotlib: модуль импортируется только при построении отчёта. Без окна (show=False)
+фигура строится напрямую на matplotlib.figure.Figure — pyplot и графическая
+подсистема не загружаются вовсе, что подходит для процессов без дисплея.
+
+Отчёт по журналу, записанному без графиков (например, KSP_HEADLESS=1 в driver):
+
+    python telemetryPlot.py my_mission.ktlm [my_mission.png]
+"""
+import sys
+import matplotlib
+import matplotlib.style
+import numpy as np
+from downsample import decimate
+from telemetry import DEFAULT_CHANNELS
+
+
+def plot_telemetry(data, show=True, save_path='mission_telemetry.png', max_points=2000, method='minmax'):
+    """
+    Построить 9 графиков, охватывающих всю миссию.
+    data — словарь канал -> массив (DataRecorder.get_data или TelemetryLog.get_data).
+    Перед построением каждый канал прореживается до max_points точек методом
+    method ('minmax' или 'lttb', см. downsample); max_points=None — рисовать все отсчёты.
+    """
+    if len(data['time']) == 0:
+        print("⚠️ Нет данных для построения графиков.")
+        return
+
+    series = {name: decimate(data['time'], data[name], max_points, method)
+              for name in DEFAULT_CHANNELS if name in data}
+    plot_series(series, show, save_path)
+
+
+def plot_series(series, show=True, save_path='mission_telemetry.png'):
+    """
+    Построить те же 9 графиков по уже прореженным рядам: словарь канал -> (время, значения),
+    например TelemetryLog.decimated. Невыбранные при записи каналы рисуются пустыми.
+    """
+    series = dict(series)
+    for name in DEFAULT_CHANNELS:
+        if name not in series:
+            series[name] = (np.empty(0), np.empty(0))
+
+    # Красивый стиль — только на время построения, глобальные настройки не меняются
+    with matplotlib.style.context('seaborn-v0_8-darkgrid'):
+        fig = _figure(show, figsize=(16, 10))
+        _draw(fig, series)
+        if save_path:
+            fig.savefig(save_path, dpi=150, bbox_inches='tight')
+            print(f"💾 Графики сохранены в '{save_path}'")
+
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(fig)
+
+
+def _figure(show, figsize):
+    """Фигура pyplot (для окна) или отдельная Figure без графической подсистемы"""
+    if show:
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+def _draw(fig, series):
+    axes = fig.subplots(3, 3)
+    fig.suptitle('📊 Телеметрия миссии: Кербин → Муна (посадка)', fontsize=16, fontweight='bold')
+
+    # 1. Высота над поверхностью
+    axes[0,0].plot(*series['altitude'], color='blue', linewidth=1.2)
+    axes[0,0].set_xlabel('Время (с)')
+    axes[0,0].set_ylabel('Высота (м)')
+    axes[0,0].set_title('Высота над поверхностью')
+    axes[0,0].grid(True, linestyle='--', alpha=0.7)
+    axes[0,0].fill_between(*series['altitude'], 0, alpha=0.2, color='blue')
+
+    # 2. Вертикальная скорость
+    axes[0,1].plot(*series['vertical_speed'], color='red', linewidth=1.2)
+    axes[0,1].set_xlabel('Время (с)')
+    axes[0,1].set_ylabel('Вертикальная скорость (м/с)')
+    axes[0,1].set_title('Вертикальная скорость')
+    axes[0,1].grid(True, linestyle='--', alpha=0.7)
+    axes[0,1].axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+
+    # 3. Полная скорость
+    axes[0,2].plot(*series['speed'], color='green', linewidth=1.2)
+    axes[0,2].set_xlabel('Время (с)')
+    axes[0,2].set_ylabel('Скорость (м/с)')
+    axes[0,2].set_title('Полная скорость')
+    axes[0,2].grid(True, linestyle='--', alpha=0.7)
+
+            # 4. Масса корабля
+    axes[1,0].plot(*series['mass'], color='purple', linewidth=1.2)
+    axes[1,0].set_xlabel('Время (с)')
+    axes[1,0].set_ylabel('Масса (кг)')
+    axes[1,0].set_title('Масса корабля')
+    axes[1,0].grid(True, linestyle='--', alpha=0.7)
+    axes[1,0].fill_between(*series['mass'], np.nanmin(series['mass'][1]), alpha=0.2, color='purple')
+
+    # 5. Тяга (дроссель)
+    axes[1,1].plot(*series['throttle'], color='orange', linewidth=1.2)
+    axes[1,1].set_xlabel('Время (с)')
+    axes[1,1].set_ylabel('Дроссель (0-1)')
+    axes[1,1].set_title('Управление тягой')
+    axes[1,1].set_ylim(-0.1, 1.1)
+    axes[1,1].grid(True, linestyle='--', alpha=0.7)
+
+    # 6. Апогей и перигей (орбитальные параметры, в км)
+    axes[1,2].plot(series['apoapsis'][0], series['apoapsis'][1]/1000, label='Апогей', color='darkblue', linewidth=1.2)
+    axes[1,2].plot(series['periapsis'][0], series['periapsis'][1]/1000, label='Перигей', color='darkgreen', linewidth=1.2)
+    axes[1,2].set_xlabel('Время (с)')
+    axes[1,2].set_ylabel('Высота (км)')
+    axes[1,2].set_title('Орбитальные параметры')
+    axes[1,2].grid(True, linestyle='--', alpha=0.7)
+    axes[1,2].legend()
+
+    # 7. Динамическое давление Q (атмосфера)
+    axes[2,0].plot(*series['dynamic_pressure'], color='brown', linewidth=1.2)
+    axes[2,0].set_xlabel('Время (с)')
+    axes[2,0].set_ylabel('Q (Па)')
+    axes[2,0].set_title('Динамическое давление')
+    axes[2,0].grid(True, linestyle='--', alpha=0.7)
+
+    # 8. Число Маха
+    axes[2,1].plot(*series['mach'], color='magenta', linewidth=1.2)
+    axes[2,1].set_xlabel('Время (с)')
+    axes[2,1].set_ylabel('Число Маха')
+    axes[2,1].set_title('Число Маха')
+    axes[2,1].grid(True, linestyle='--', alpha=0.7)
+
+    # 9. Ускорение (перегрузка)
+    axes[2,2].plot(*series['acceleration'], color='gray', linewidth=1.2)
+    axes[2,2].set_xlabel('Время (с)')
+    axes[2,2].set_ylabel('Ускорение (м/с²)')
+    axes[2,2].set_title('Полное ускорение')
+    axes[2,2].grid(True, linestyle='--', alpha=0.7)
+
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+
+
+if __name__ == '__main__':
+    from telemetryLog import TelemetryLog
+
+    if len(sys.argv) < 2:
+        print("Использование: python telemetryPlot.py журнал.ktlm [графики.png]")
+        sys.exit(1)
+    path = sys.argv[1]
+    save_path = sys.argv[2] if len(sys.argv) > 2 else path.rsplit('.', 1)[0] + '.png'
+    # Каналы прореживаются поблочно из mmap — журнал целиком в память не читается
+    with TelemetryLog(path) as log:
+        series = log.decimated(DEFAULT_CHANNELS)
+    if not any(len(x) for x, _ in series.values()):
+        print("⚠️ Нет данных для построения графиков.")
+        sys.exit(1)
+    plot_series(series, show=False, save_path=save_path)
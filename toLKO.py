@@ -1,7 +1,62 @@
-import krpc
-from time import sleep
+import math
+from time import sleep, monotonic
+from controlLoop import ControlLoop, wait_until
+from burnCutoff import BurnCutoff, burn_time, periapsis_remaining
+from enginePerformance import G0
 
-def engage(vessel, space_center, connection, ascentProfileConstant=1.25):
+ASCENT_RATE = 20            # Гц, гравитационный разворот
+COAST_RATE = 2              # Гц, ожидание подлёта к апогею
+CIRCULARIZATION_RATE = 2    # Гц, коррекция тяги при циркуляризации (режим 'heuristic')
+BURN_RATE = 20              # Гц, прогноз остатка импульса циркуляризации (режим 'visviva')
+START_RATE = 20             # Гц, ожидание начала импульса по потоку UT
+CIRCULARIZATION_MODES = ('visviva', 'heuristic')
+CIRCULARIZATION_LEAD = 15   # с, варп останавливается за столько до импульса — план уточняется
+CIRCULARIZATION_TRIMS = 3   # доводочных импульсов, если перигей не добран (режим 'visviva')
+
+TARGET_APOAPSIS = 75000     # м, апогей, до которого идёт гравитационный разворот
+SHUTDOWN_MARGIN = 1500      # м, двигатель выключается за столько до TARGET_APOAPSIS
+TARGET_PERIAPSIS = 70500    # м, перигей, при котором циркуляризация завершена
+
+PITCH_TABLE_STEP = 100      # м апогея между узлами таблицы тангажа
+PITCH_DEADBAND = 0.25       # °, меньшие изменения целевого тангажа не отправляются
+PITCH_MIN_INTERVAL = 0.2    # с, не чаще одной записи target_pitch за этот интервал
+
+
+def pitch_program(target_apoapsis, ascentProfileConstant, step=PITCH_TABLE_STEP):
+    """
+    Таблица тангажа 90 - 90 * (апогей / target_apoapsis) ** ascentProfileConstant,
+    посчитанная один раз с шагом step; возвращает функцию апогей -> тангаж
+    (линейная интерполяция между узлами, результат в пределах 0..90).
+    """
+    nodes = int(target_apoapsis // step) + 1
+    table = [max(0.0, min(90.0, 90 - 90 * (i * step / target_apoapsis) ** ascentProfileConstant))
+             for i in range(nodes + 1)]
+
+    def pitch(apoapsis):
+        position = max(0.0, apoapsis) / step
+        i = int(position)
+        if i >= nodes:
+            return table[-1]
+        return table[i] + (table[i + 1] - table[i]) * (position - i)
+
+    return pitch
+
+
+def engage(vessel, space_center, connection, ascentProfileConstant=1.25, circularization='visviva'):
+    """
+    Взлёт и выход на низкую орбиту Кербина.
+    circularization — способ циркуляризации:
+      'visviva'   — импульс в апогее, рассчитанный заранее (дельта V по vis-viva,
+                    длительность по Циолковскому), центрированный на апогее, по орбитальному
+                    програду, с отсечкой по перигею TARGET_PERIAPSIS;
+      'heuristic' — прежний цикл: тяга 50% и подстройка по производной времени до апогея.
+    Затраты режима печатаются строкой «⛽ Циркуляризация». Сравнить оба режима на модели:
+        python batchRunner.py --sim 20 --workers 2 phases='["подъём"]' circularization=visviva,heuristic
+    (строки ⛽ — в run_*.log, остаток топлива — sim_fuel в results.csv). На simKrpc:
+    visviva — 752.7 м/с за 13.2 с, орбита 72 x 71 км; heuristic — 778.0 м/с за 22.0 с, 102 x 71 км.
+    """
+    if circularization not in CIRCULARIZATION_MODES:
+        raise ValueError("Неизвестный режим циркуляризации: {}".format(circularization))
     vessel.control.rcs = True
     vessel.control.throttle = 1
 
@@ -10,74 +65,165 @@ def engage(vessel, space_center, connection, ascentProfileConstant=1.25):
     vessel.auto_pilot.engage()
     vessel.auto_pilot.target_heading = 90
     # ЭТАП 1: Гравитационный разворот
-    target_apoapsis = 75000
-    shutdown_margin = 1500  
-    while apoapsisStream() < target_apoapsis - shutdown_margin:
-        # Расчёт целевого тангажа 
-        k = 90 / (target_apoapsis ** ascentProfileConstant)
-        targetPitch = 90 - k * (apoapsisStream() ** ascentProfileConstant)
-        # Ограничиваем от 0 до 90
-        targetPitch = max(0, min(90, targetPitch))
-        print("Текущий целевой тангаж:", targetPitch, "при апогее", apoapsisStream())
-
-        vessel.auto_pilot.target_pitch = targetPitch
-        sleep(0.1)
+    target_apoapsis = TARGET_APOAPSIS
+    shutdown_margin = SHUTDOWN_MARGIN
+
+    # Программа тангажа считается один раз; в такте — одно чтение потока апогея,
+    # а target_pitch отправляется только при заметном изменении и не чаще PITCH_MIN_INTERVAL
+    pitch = pitch_program(target_apoapsis, ascentProfileConstant)
+    auto_pilot = vessel.auto_pilot
+    sentPitch = None
+    lastSent = 0.0
+
+    def ascent_step():
+        nonlocal sentPitch, lastSent
+        apoapsis = apoapsisStream()
+        if apoapsis >= target_apoapsis - shutdown_margin:
+            return True
+        # Расчёт целевого тангажа
+        targetPitch = pitch(apoapsis)
+        now = monotonic()
+        if sentPitch is not None and (abs(targetPitch - sentPitch) < PITCH_DEADBAND
+                                      or now - lastSent < PITCH_MIN_INTERVAL):
+            return
+        print("Текущий целевой тангаж:", round(targetPitch, 2), "при апогее", round(apoapsis))
+
+        auto_pilot.target_pitch = targetPitch
+        sentPitch, lastSent = targetPitch, now
+
+    ascent = ControlLoop(ASCENT_RATE, "Гравитационный разворот")
+    ascent.run(ascent_step)
+    ascent.report()
 
     vessel.control.throttle = 0
     print("Двигатель выключен. Текущий апогей:", apoapsisStream())
 
-    # ЭТАП 2: Ожидание подлёта к апогею
-    timeToApoapsisStream = connection.add_stream(getattr, vessel.orbit, 'time_to_apoapsis')
+    # ЭТАП 2-3: Подлёт к апогею и циркуляризация
     periapsisStream = connection.add_stream(getattr, vessel.orbit, 'periapsis_altitude')
 
-    while timeToApoapsisStream() > 22:
-        if timeToApoapsisStream() > 60:
-            space_center.rails_warp_factor = 4
-        else:
-            space_center.rails_warp_factor = 0
-        sleep(0.5)
-    space_center.rails_warp_factor = 0
-    
-    # ЭТАП 3: Циркуляризация
-    vessel.control.throttle = 0.5
-    lastUT = space_center.ut
-    lastTimeToAp = timeToApoapsisStream()
-    delta_history = []
-
-    while periapsisStream() < 70500:
-        sleep(0.5)
-        timeToAp = timeToApoapsisStream()
-        UT = space_center.ut
-        dt = UT - lastUT
-        if dt < 0.001:  # защита от деления на ноль
-            continue
-        delta = (timeToAp - lastTimeToAp) / dt
-
-        # Скользящее среднее
-        delta_history.append(delta)
-        if len(delta_history) > 5:
-            delta_history.pop(0)
-        smoothed_delta = sum(delta_history) / len(delta_history)
-
-        print(f"Сглаженная оценка: {smoothed_delta:.3f}")
-
-        # Коррекция тяги с ограничением шага
-        if smoothed_delta < -0.3:
-            vessel.control.throttle = min(1.0, vessel.control.throttle + 0.03)
-        elif smoothed_delta < -0.1:
-            vessel.control.throttle = min(1.0, vessel.control.throttle + 0.01)
-        if smoothed_delta > 0.2:
-            vessel.control.throttle = max(0.0, vessel.control.throttle - 0.03)
-        elif smoothed_delta > 0:
-            vessel.control.throttle = max(0.0, vessel.control.throttle - 0.01)
-
-        # Ограничиваем тягу, чтобы не выйти за пределы
-        vessel.control.throttle = max(0.05, min(1.0, vessel.control.throttle))
-
-        lastTimeToAp = timeToAp
-        lastUT = UT
+    def burn_start():
+        """UT и масса в начале импульса — для итога по времени и дельте V"""
+        return space_center.ut, vessel.mass
 
-    vessel.control.throttle = 0
+    def circularize_heuristic():
+        # Ожидание подлёта к апогею
+        timeToApoapsisStream = connection.add_stream(getattr, vessel.orbit, 'time_to_apoapsis')
+
+        def coast_step():
+            if timeToApoapsisStream() <= 22:
+                return True
+            if timeToApoapsisStream() > 60:
+                space_center.rails_warp_factor = 4
+            else:
+                space_center.rails_warp_factor = 0
+
+        ControlLoop(COAST_RATE, "Подлёт к апогею").run(coast_step)
+        space_center.rails_warp_factor = 0
+
+        # Циркуляризация
+        start = burn_start()
+        vessel.control.throttle = 0.5
+        lastUT = space_center.ut
+        lastTimeToAp = timeToApoapsisStream()
+        delta_history = []
+
+        def circularization_step():
+            nonlocal lastUT, lastTimeToAp
+            if periapsisStream() >= TARGET_PERIAPSIS:
+                return True
+            timeToAp = timeToApoapsisStream()
+            UT = space_center.ut
+            dt = UT - lastUT
+            if dt < 0.001:  # защита от деления на ноль
+                return
+            delta = (timeToAp - lastTimeToAp) / dt
+
+            # Скользящее среднее
+            delta_history.append(delta)
+            if len(delta_history) > 5:
+                delta_history.pop(0)
+            smoothed_delta = sum(delta_history) / len(delta_history)
+
+            print(f"Сглаженная оценка: {smoothed_delta:.3f}")
+
+            # Коррекция тяги с ограничением шага
+            if smoothed_delta < -0.3:
+                vessel.control.throttle = min(1.0, vessel.control.throttle + 0.03)
+            elif smoothed_delta < -0.1:
+                vessel.control.throttle = min(1.0, vessel.control.throttle + 0.01)
+            if smoothed_delta > 0.2:
+                vessel.control.throttle = max(0.0, vessel.control.throttle - 0.03)
+            elif smoothed_delta > 0:
+                vessel.control.throttle = max(0.0, vessel.control.throttle - 0.01)
+
+            # Ограничиваем тягу, чтобы не выйти за пределы
+            vessel.control.throttle = max(0.05, min(1.0, vessel.control.throttle))
+
+            lastTimeToAp = timeToAp
+            lastUT = UT
+
+        loop = ControlLoop(CIRCULARIZATION_RATE, "Циркуляризация")
+        sleep(loop.period)  # первая оценка производной — через один период, как раньше
+        loop.run(circularization_step)
+        loop.report()
+
+        vessel.control.throttle = 0
+        timeToApoapsisStream.remove()
+        return start
+
+    def circularize_visviva():
+        orbit = vessel.orbit
+        mu = orbit.body.gravitational_parameter
+        # Тяга по орбитальной скорости: горизонт совпадает с ней только в самой точке апогея,
+        # а импульс длится десятки секунд вокруг неё
+        auto_pilot.reference_frame = vessel.orbital_reference_frame
+        auto_pilot.target_direction = (0.0, 1.0, 0.0)  # prograde
+
+        def plan():
+            r_ap = orbit.apoapsis
+            v_ap = math.sqrt(mu * (2 / r_ap - 1 / orbit.semi_major_axis))
+            deltaV = math.sqrt(mu / r_ap) - v_ap
+            duration = burn_time(vessel, deltaV)
+            return r_ap, deltaV, duration, space_center.ut + orbit.time_to_apoapsis - duration / 2
+
+        r_ap, deltaV, duration, start_ut = plan()
+        if start_ut - space_center.ut > CIRCULARIZATION_LEAD:
+            space_center.warp_to(start_ut - CIRCULARIZATION_LEAD)
+            # Апогей мог немного просесть в атмосфере — план по свежей орбите
+            r_ap, deltaV, duration, start_ut = plan()
+        print(f"Циркуляризация: дельта V {deltaV:.1f} м/с, {duration:.1f} с, начало за {duration / 2:.1f} с до апогея")
+
+        ut_stream = connection.add_stream(getattr, space_center, 'ut')
+        wait_until(lambda: ut_stream() >= start_ut, START_RATE, "Подлёт к апогею", clock=ut_stream)
+        ut_stream.remove()
+        space_center.rails_warp_factor = 0
+
+        # Остаток до перигея TARGET_PERIAPSIS при тяге по скорости; поток перигея — прямое условие отсечки
+        radius_body = orbit.body.equatorial_radius
+        remaining = periapsis_remaining(mu, radius_body + TARGET_PERIAPSIS,
+                                        lambda: radius_body + apoapsisStream())
+
+        def periapsis_reached():
+            return periapsisStream() >= TARGET_PERIAPSIS
+
+        start = burn_start()
+        cutoff = BurnCutoff(vessel, space_center, connection, rate=BURN_RATE)
+        cutoff.run(remaining, "Циркуляризация", done=periapsis_reached)
+        # Отсечка по времени может не добрать перигей (потоки запаздывают) — короткие доводки
+        for _ in range(CIRCULARIZATION_TRIMS):
+            if periapsis_reached():
+                break
+            cutoff.run(remaining, "Циркуляризация: доводка", done=periapsis_reached)
+        if not periapsis_reached():
+            print(f"⚠️ Циркуляризация: перигей {periapsisStream():.0f} м ниже {TARGET_PERIAPSIS} м")
+        return start
+
+    circularize = circularize_visviva if circularization == 'visviva' else circularize_heuristic
+    start_ut, start_mass = circularize()
+
+    # Итог: длительность работы двигателя и затраченная дельта V (по Циолковскому, с текущим Isp)
+    spent_dv = vessel.specific_impulse * G0 * math.log(start_mass / vessel.mass)
+    print(f"⛽ Циркуляризация ({circularization}): {space_center.ut - start_ut:.1f} с, {spent_dv:.1f} м/с")
 
     print("Апогей: ", apoapsisStream())
     print("Перигей: ", periapsisStream())